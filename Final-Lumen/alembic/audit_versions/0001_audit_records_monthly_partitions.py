@@ -0,0 +1,84 @@
+"""Partition audit_records by month on timestamp (PostgreSQL)
+
+Run against the audit database: alembic -n audit upgrade head
+
+Revision ID: audit_0001_monthly_partitions
+Revises:
+Create Date: 2026-10-19
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.models.audit import AuditRecord
+from app.services.audit_retention import add_months, create_month_partition, is_partitioned, month_start
+
+
+# revision identifiers, used by Alembic.
+revision = "audit_0001_monthly_partitions"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Indexes on the partitioned table (created on every partition)
+PARTITIONED_INDEXES = [
+    ("ix_audit_records_user_timestamp", ["user_id", "timestamp"]),
+    ("ix_audit_records_transaction_id", ["transaction_id"]),
+    ("ix_audit_records_action", ["action"]),
+    ("ix_audit_records_timestamp", ["timestamp"]),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    AuditRecord.__table__.create(bind, checkfirst=True)
+    # Other databases (SQLite in development) stay unpartitioned; retention deletes rows there
+    if bind.dialect.name != "postgresql" or is_partitioned(bind):
+        return
+
+    op.execute("ALTER TABLE audit_records RENAME TO audit_records_unpartitioned")
+    # Keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE audit_records_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE audit_records (LIKE audit_records_unpartitioned INCLUDING DEFAULTS) "
+        'PARTITION BY RANGE ("timestamp")'
+    )
+    # The partition key must be part of the primary key
+    op.execute('ALTER TABLE audit_records ADD PRIMARY KEY (id, "timestamp")')
+    op.execute("CREATE TABLE audit_records_default PARTITION OF audit_records DEFAULT")
+
+    oldest = bind.execute(sa.text('SELECT min("timestamp") FROM audit_records_unpartitioned')).scalar()
+    month = month_start(oldest or datetime.utcnow())
+    last = add_months(month_start(datetime.utcnow()), settings.AUDIT_PARTITION_PREMAKE_MONTHS)
+    while month <= last:
+        create_month_partition(bind, month)
+        month = add_months(month, 1)
+
+    op.execute("INSERT INTO audit_records SELECT * FROM audit_records_unpartitioned")
+    op.execute("DROP TABLE audit_records_unpartitioned")
+    op.execute("ALTER SEQUENCE audit_records_id_seq OWNED BY audit_records.id")
+
+    for name, columns in PARTITIONED_INDEXES:
+        op.create_index(name, "audit_records", columns)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not is_partitioned(bind):
+        return
+
+    op.execute("ALTER TABLE audit_records RENAME TO audit_records_partitioned")
+    op.execute("ALTER SEQUENCE audit_records_id_seq OWNED BY NONE")
+    op.execute("CREATE TABLE audit_records (LIKE audit_records_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE audit_records ADD PRIMARY KEY (id)")
+    op.execute("INSERT INTO audit_records SELECT * FROM audit_records_partitioned ORDER BY id")
+    # Drops the partitions and their indexes
+    op.execute("DROP TABLE audit_records_partitioned CASCADE")
+    op.execute("ALTER SEQUENCE audit_records_id_seq OWNED BY audit_records.id")
+
+    op.create_index("ix_audit_records_id", "audit_records", ["id"])
+    op.create_index("ix_audit_records_user_id", "audit_records", ["user_id"])
+    for name, columns in PARTITIONED_INDEXES:
+        op.create_index(name, "audit_records", columns)
@@ -0,0 +1,42 @@
+"""Add the operator-approved legacy anchor to audit_checkpoints
+
+Run against the audit database: alembic -n audit upgrade head
+
+Revision ID: audit_0002_legacy_anchor
+Revises: audit_0001_monthly_partitions
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.audit import AuditCheckpoint
+
+
+# revision identifiers, used by Alembic.
+revision = "audit_0002_legacy_anchor"
+down_revision = "audit_0001_monthly_partitions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("audit_checkpoints"):
+        AuditCheckpoint.__table__.create(bind)
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("audit_checkpoints")}
+    if "legacy" not in columns:
+        op.add_column(
+            "audit_checkpoints",
+            sa.Column("legacy", sa.Boolean(), nullable=False, server_default=sa.false())
+        )
+    if "approved_by" not in columns:
+        op.add_column("audit_checkpoints", sa.Column("approved_by", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("audit_checkpoints") as batch:
+        batch.drop_column("approved_by")
+        batch.drop_column("legacy")
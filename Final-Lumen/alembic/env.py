@@ -12,7 +12,7 @@ from app.core.database import Base, AuditBase
 from app.core.config import settings
 
 # Import all models to ensure they're registered
-from app.models import user, transaction, merchant, source, pattern, chat, rag, audit
+from app.models import user, transaction, merchant, source, pattern, rollup, chat, rag, audit
 
 # this is the Alembic Config object
 config = context.config
@@ -21,12 +21,16 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# The [audit] section (alembic -n audit ...) migrates the audit database
+# with its own revisions in alembic/audit_versions
+audit_section = config.config_ini_section == "audit"
+
 # Set SQLAlchemy URL from settings - escape % for ConfigParser
-db_url = settings.DATABASE_URL.replace('%', '%%')
+db_url = (settings.DATABASE_AUDIT_URL if audit_section else settings.DATABASE_URL).replace('%', '%%')
 config.set_main_option('sqlalchemy.url', db_url)
 
 # add your model's MetaData object here
-target_metadata = Base.metadata
+target_metadata = AuditBase.metadata if audit_section else Base.metadata
 
 
 def run_migrations_offline() -> None:
@@ -0,0 +1,33 @@
+"""Add incremental statistics buckets to patterns
+
+Revision ID: 0001_pattern_buckets
+Revises: 0000_baseline_schema
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001_pattern_buckets"
+down_revision = "0000_baseline_schema"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Already present when the baseline revision created the table
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("patterns")}
+    for column in (
+        sa.Column("window_days", sa.Integer(), nullable=True),
+        sa.Column("weekly_buckets", sa.JSON(), nullable=True),
+        sa.Column("monthly_buckets", sa.JSON(), nullable=True),
+    ):
+        if column.name not in existing:
+            op.add_column("patterns", column)
+
+
+def downgrade() -> None:
+    op.drop_column("patterns", "monthly_buckets")
+    op.drop_column("patterns", "weekly_buckets")
+    op.drop_column("patterns", "window_days")
@@ -0,0 +1,81 @@
+"""Add indexed duplicate_key to transactions
+
+Revision ID: 0002_transaction_duplicate_key
+Revises: 0001_pattern_buckets
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.transaction import compute_duplicate_key
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_transaction_duplicate_key"
+down_revision = "0001_pattern_buckets"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # Already present (and the table empty) when the baseline revision created the table
+    if "duplicate_key" in {column["name"] for column in inspector.get_columns("transactions")}:
+        if "ix_transactions_duplicate_key" not in {index["name"] for index in inspector.get_indexes("transactions")}:
+            op.create_index("ix_transactions_duplicate_key", "transactions", ["duplicate_key"])
+        return
+
+    op.add_column("transactions", sa.Column("duplicate_key", sa.String(length=64), nullable=True))
+
+    # Backfill keys for rows that have an invoice number
+    transactions = sa.table(
+        "transactions",
+        sa.column("id", sa.Integer),
+        sa.column("user_consumer_id", sa.Integer),
+        sa.column("user_business_id", sa.Integer),
+        sa.column("invoice_no", sa.String),
+        sa.column("merchant_name_raw", sa.Text),
+        sa.column("amount", sa.Float),
+        sa.column("duplicate_key", sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                transactions.c.id,
+                transactions.c.user_consumer_id,
+                transactions.c.user_business_id,
+                transactions.c.invoice_no,
+                transactions.c.merchant_name_raw,
+                transactions.c.amount,
+            )
+            .where(transactions.c.id > last_id, transactions.c.invoice_no.isnot(None))
+            .order_by(transactions.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = [
+            {"row_id": row.id, "key": compute_duplicate_key(
+                row.user_consumer_id, row.user_business_id, row.invoice_no, row.merchant_name_raw, row.amount
+            )}
+            for row in rows
+        ]
+        bind.execute(
+            transactions.update()
+            .where(transactions.c.id == sa.bindparam("row_id"))
+            .values(duplicate_key=sa.bindparam("key")),
+            updates
+        )
+        last_id = rows[-1].id
+
+    op.create_index("ix_transactions_duplicate_key", "transactions", ["duplicate_key"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_duplicate_key", table_name="transactions")
+    op.drop_column("transactions", "duplicate_key")
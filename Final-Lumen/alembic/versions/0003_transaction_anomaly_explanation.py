@@ -0,0 +1,26 @@
+"""Add precomputed anomaly_explanation to transactions
+
+Revision ID: 0003_transaction_anomaly_explanation
+Revises: 0002_transaction_duplicate_key
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_transaction_anomaly_explanation"
+down_revision = "0002_transaction_duplicate_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "anomaly_explanation" in {column["name"] for column in sa.inspect(op.get_bind()).get_columns("transactions")}:
+        return
+    # Existing flagged transactions are explained on first view
+    op.add_column("transactions", sa.Column("anomaly_explanation", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("transactions", "anomaly_explanation")
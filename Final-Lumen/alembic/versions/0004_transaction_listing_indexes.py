@@ -0,0 +1,36 @@
+"""Add composite listing indexes to transactions
+
+Revision ID: 0004_transaction_listing_indexes
+Revises: 0003_transaction_anomaly_explanation
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_transaction_listing_indexes"
+down_revision = "0003_transaction_anomaly_explanation"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_transactions_consumer_date_id": ["user_consumer_id", "date", "id"],
+    "ix_transactions_business_date_id": ["user_business_id", "date", "id"],
+    "ix_transactions_consumer_flagged_date_id": ["user_consumer_id", "flagged", "date", "id"],
+    "ix_transactions_business_flagged_date_id": ["user_business_id", "flagged", "date", "id"],
+    "ix_transactions_consumer_category_date": ["user_consumer_id", "category", "date"],
+    "ix_transactions_business_category_date": ["user_business_id", "category", "date"],
+}
+
+
+def upgrade() -> None:
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("transactions")}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "transactions", columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="transactions")
@@ -0,0 +1,50 @@
+"""Add transaction_daily_rollups for dashboard statistics
+
+Revision ID: 0005_transaction_daily_rollups
+Revises: 0004_transaction_listing_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.rollup import rebuild_rollups
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_transaction_daily_rollups"
+down_revision = "0004_transaction_listing_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Created by the baseline revision on databases that predate it; backfill it if still empty
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table("transaction_daily_rollups"):
+        if bind.execute(sa.text("SELECT 1 FROM transaction_daily_rollups LIMIT 1")).first() is None:
+            rebuild_rollups(bind)
+        return
+
+    op.create_table(
+        "transaction_daily_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_type", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("dimension", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("transaction_count", sa.Integer(), nullable=False),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.Column("flagged_count", sa.Integer(), nullable=False),
+        sa.Column("confirmed_count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("user_type", "user_id", "day", "dimension", "key", name="uq_transaction_daily_rollups_row"),
+    )
+    op.create_index("ix_transaction_daily_rollups_id", "transaction_daily_rollups", ["id"])
+
+    # Backfill from existing transactions
+    rebuild_rollups(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transaction_daily_rollups_id", table_name="transaction_daily_rollups")
+    op.drop_table("transaction_daily_rollups")
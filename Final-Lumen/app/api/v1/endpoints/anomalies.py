@@ -1,32 +1,49 @@
-"""Anomaly detection endpoints - stub implementation"""
-from fastapi import APIRouter, Depends, Query
+"""Anomaly detection endpoints"""
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from sqlalchemy.orm import Session
+from typing import Optional
 
 from app.core.database import get_db
 from app.utils.auth import get_current_user
 from app.models.transaction import Transaction
+from app.schemas.transaction import FlaggedTransactionsResponse
+from app.services.anomaly_explainer import anomaly_explainer
+from app.services.response_cache import response_cache, TRANSACTIONS
+from app.utils.pagination import paginate, count_rows, LISTING_COLUMNS
 
 router = APIRouter()
 
-@router.get("/flagged")
+@router.get("/flagged", response_model=FlaggedTransactionsResponse)
 async def get_flagged_transactions(
+    request: Request,
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
     limit: int = Query(50, le=200),
     offset: int = 0,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides offset)"),
+    total: str = Query("exact", pattern="^(exact|estimated|none)$", description="How to compute totals"),
     unconfirmed_only: bool = True
 ):
-    """Get flagged transactions requiring review"""
+    """Get flagged transactions requiring review, newest first"""
     user = current_user["user"]
     user_type = current_user["user_type"]
     
+    cache_key = response_cache.key(
+        "anomalies.flagged", TRANSACTIONS, user.id, user_type,
+        limit=limit, offset=offset, cursor=cursor, total=total, unconfirmed_only=unconfirmed_only
+    )
+    cached = response_cache.lookup(request, cache_key)
+    if cached is not None:
+        return cached
+    
+    # List columns only
     if user_type == "consumer":
-        query = db.query(Transaction).filter(
+        query = db.query(*LISTING_COLUMNS).filter(
             Transaction.user_consumer_id == user.id,
             Transaction.flagged == True
         )
     else:
-        query = db.query(Transaction).filter(
+        query = db.query(*LISTING_COLUMNS).filter(
             Transaction.user_business_id == user.id,
             Transaction.flagged == True
         )
@@ -34,15 +51,24 @@ async def get_flagged_transactions(
     if unconfirmed_only:
         query = query.filter(Transaction.confirmed == None)
     
-    flagged = query.offset(offset).limit(limit).all()
-    total = query.count()
-    pending = query.filter(Transaction.confirmed == None).count()
+    try:
+        flagged, next_cursor = paginate(query, limit, cursor=cursor, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {
-        "flagged_transactions": flagged,
-        "total": total,
-        "pending_review": pending
-    }
+    total_count = count_rows(db, query, total)
+    if unconfirmed_only:
+        pending = total_count
+    else:
+        pending = count_rows(db, query.filter(Transaction.confirmed == None), total)
+    
+    return response_cache.store(request, cache_key, FlaggedTransactionsResponse(
+        flagged_transactions=flagged,
+        total=total_count,
+        pending_review=pending,
+        total_estimated=total == "estimated",
+        next_cursor=next_cursor
+    ))
 
 @router.get("/{transaction_id}/explain")
 async def explain_anomaly(
@@ -50,5 +76,37 @@ async def explain_anomaly(
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get human-readable explanation for anomaly"""
-    return {"message": "Anomaly explanation endpoint - to be implemented"}
+    """
+    Get human-readable explanation for anomaly
+    
+    Explanations are precomputed when the transaction is flagged and served
+    from cache; the optional narrative is filled in asynchronously.
+    """
+    user = current_user["user"]
+    user_type = current_user["user_type"]
+    
+    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    # Verify ownership
+    if user_type == "consumer" and transaction.user_consumer_id != user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    elif user_type == "business" and transaction.user_business_id != user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    if not transaction.flagged:
+        return {
+            "transaction_id": transaction.id,
+            "flagged": False,
+            "explanation": None
+        }
+    
+    return {
+        "transaction_id": transaction.id,
+        "flagged": True,
+        "anomaly_score": transaction.anomaly_score,
+        "reason": transaction.anomaly_reason,
+        "explanation": anomaly_explainer.get(db, transaction, user.id, user_type)
+    }
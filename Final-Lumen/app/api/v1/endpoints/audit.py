@@ -0,0 +1,48 @@
+"""Audit trail endpoints"""
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.database import get_audit_db
+from app.utils.auth import get_current_user
+from app.models.audit import AuditRecord
+
+router = APIRouter()
+
+@router.get("/records")
+async def get_audit_records(
+    current_user=Depends(get_current_user),
+    audit_db: Session = Depends(get_audit_db),
+    days: int = Query(30, ge=1, le=366, description="Look back this many days"),
+    limit: int = Query(100, le=500)
+):
+    """
+    The current user's audit trail, newest first
+    
+    Always bounded by time, so only the matching monthly partitions are read.
+    """
+    user = current_user["user"]
+    since = datetime.utcnow() - timedelta(days=days)
+    
+    records = audit_db.query(AuditRecord).filter(
+        AuditRecord.user_id == user.id,
+        AuditRecord.user_type == current_user["user_type"],
+        AuditRecord.timestamp >= since
+    ).order_by(AuditRecord.timestamp.desc()).limit(limit).all()
+    
+    return {
+        "records": [
+            {
+                "id": record.id,
+                "timestamp": record.timestamp.isoformat(),
+                "actor": record.actor.value,
+                "action": record.action.value,
+                "transaction_id": record.transaction_id,
+                "outcome": record.outcome,
+                "reason": record.reason
+            }
+            for record in records
+        ],
+        "days": days,
+        "count": len(records)
+    }
@@ -3,17 +3,19 @@ Authentication Endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 import logging
 
-from app.core.database import get_db, get_audit_db
+from app.core.database import get_async_db
 from app.core.config import settings
 from app.schemas.auth import LoginRequest, RegisterRequest, Token
 from app.schemas.user import UserConsumerResponse, UserBusinessResponse
 from app.models.user import UserConsumer, UserBusiness
 from app.utils.auth import (
-    authenticate_user,
+    authenticate_user_async,
     create_access_token,
     get_password_hash,
     get_current_user
@@ -29,8 +31,7 @@ router = APIRouter()
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def register(
     request: RegisterRequest,
-    db: Session = Depends(get_db),
-    audit_db: Session = Depends(get_audit_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Register a new user (Consumer or Business)
@@ -47,15 +48,17 @@ async def register(
     try:
         # Check if user already exists
         if request.user_type == "consumer":
-            existing = db.query(UserConsumer).filter(UserConsumer.email == request.email).first()
+            existing = (await db.execute(
+                select(UserConsumer.id).where(UserConsumer.email == request.email)
+            )).first()
             if existing:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Email already registered"
                 )
             
-            # Create consumer user
-            hashed_password = get_password_hash(request.password)
+            # Create consumer user (bcrypt off the event loop)
+            hashed_password = await run_in_threadpool(get_password_hash, request.password)
             user = UserConsumer(
                 email=request.email,
                 name=request.name,
@@ -65,12 +68,13 @@ async def register(
                 personal_category_set=settings.DEFAULT_CONSUMER_CATEGORIES
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
             user_id = user.id
         
         elif request.user_type == "business":
-            existing = db.query(UserBusiness).filter(UserBusiness.email == request.email).first()
+            existing = (await db.execute(
+                select(UserBusiness.id).where(UserBusiness.email == request.email)
+            )).first()
             if existing:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -83,8 +87,8 @@ async def register(
                     detail="business_name and contact_person are required for business users"
                 )
             
-            # Create business user
-            hashed_password = get_password_hash(request.password)
+            # Create business user (bcrypt off the event loop)
+            hashed_password = await run_in_threadpool(get_password_hash, request.password)
             user = UserBusiness(
                 email=request.email,
                 business_name=request.business_name,
@@ -96,8 +100,7 @@ async def register(
                 business_category_set=settings.DEFAULT_BUSINESS_CATEGORIES
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
             user_id = user.id
         
         else:
@@ -115,7 +118,6 @@ async def register(
         
         # Log to audit
         AuditLogger.log_action(
-            db=audit_db,
             actor=AuditActor.USER,
             action=AuditAction.USER_REGISTERED,
             user_id=user_id,
@@ -145,8 +147,7 @@ async def register(
 @router.post("/login", response_model=Token)
 async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db),
-    audit_db: Session = Depends(get_audit_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Login with email and password
@@ -160,11 +161,10 @@ async def login(
     """
     try:
         # Authenticate user
-        user = authenticate_user(db, request.email, request.password, request.user_type)
+        user = await authenticate_user_async(db, request.email, request.password, request.user_type)
         
         if not user:
             AuditLogger.log_action(
-                db=audit_db,
                 actor=AuditActor.USER,
                 action=AuditAction.USER_LOGIN,
                 user_id=None,
@@ -187,7 +187,6 @@ async def login(
         
         # Log to audit
         AuditLogger.log_action(
-            db=audit_db,
             actor=AuditActor.USER,
             action=AuditAction.USER_LOGIN,
             user_id=user.id,
@@ -216,8 +215,7 @@ async def login(
 
 @router.post("/logout")
 async def logout(
-    current_user=Depends(get_current_user),
-    audit_db: Session = Depends(get_audit_db)
+    current_user=Depends(get_current_user)
 ):
     """
     Logout current user
@@ -230,7 +228,6 @@ async def logout(
         
         # Log to audit
         AuditLogger.log_action(
-            db=audit_db,
             actor=AuditActor.USER,
             action=AuditAction.USER_LOGOUT,
             user_id=user.id,
@@ -1,12 +1,19 @@
 """Chat and RAG endpoints"""
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.utils.auth import get_current_user
 from app.services.rag_service import rag_service
 from app.services.gemini_service import gemini_service
+from app.services.semantic_cache import semantic_cache
+from app.services.query_engine import query_engine
+from app.services.prompt_builder import prompt_builder
+from app.services.intent_classifier import intent_classifier
 from app.schemas.chat import ChatMessageRequest
 from app.models.chat import ChatMessage
 
@@ -15,29 +22,37 @@ router = APIRouter()
 @router.post("/session")
 async def create_chat_session(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create new chat session"""
     user = current_user["user"]
     user_type = current_user["user_type"]
     
-    session = rag_service.get_or_create_session(db, user.id, user_type)
+    session = await db.run_sync(rag_service.get_or_create_session, user.id, user_type)
     return {"session_id": session.id, "started_at": session.started_at}
 
 @router.post("/message")
 async def send_message(
     request: ChatMessageRequest,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Send chat message and get AI response"""
+    """
+    Send chat message and get AI response
+    
+    Database work runs on the async session (sync services through
+    db.run_sync, which still executes them on the event loop thread);
+    CPU-bound steps - query parsing, embedding, semantic cache and vector
+    search - and Gemini calls run in the thread pool so they do not hold
+    up other requests.
+    """
     user = current_user["user"]
     user_type = current_user["user_type"]
     
     try:
         # Get or create session
-        session = rag_service.get_or_create_session(
-            db, user.id, user_type, request.session_id
+        session = await db.run_sync(
+            rag_service.get_or_create_session, user.id, user_type, request.session_id
         )
         
         # Save user message
@@ -47,23 +62,68 @@ async def send_message(
             content=request.message
         )
         db.add(user_message)
-        db.flush()
+        await db.flush()
         
-        # Retrieve context
-        context = rag_service.retrieve_context(
-            request.message, user.id, user_type, db
-        )
-        
-        # Get persistent memory
-        persistent_memory = rag_service.get_persistent_memory(db, user.id, user_type)
+        # Conversational turns are answered locally without retrieval or Gemini
+        classification = intent_classifier.classify(request.message)
+        cached = None
+        aggregates = None
         
-        # Generate response
-        response = gemini_service.generate_chat_response(
-            request.message,
-            context,
-            session.ephemeral_memory,
-            persistent_memory
-        )
+        if classification["fast_path"]:
+            persistent_memory = await db.run_sync(rag_service.get_persistent_memory, user.id, user_type)
+            response = intent_classifier.respond(classification, session.ephemeral_memory, persistent_memory)
+            context = []
+        else:
+            # Aggregate questions are answered with SQL, open-ended ones with vector search
+            plan = await run_in_threadpool(
+                query_engine.parse,
+                request.message,
+                await db.run_sync(query_engine.user_categories, user.id, user_type)
+            )
+            
+            # Serve near-duplicate questions from the semantic cache; aggregate answers
+            # only for the same plan, since "this month" and "last month" embed alike
+            plan_key = query_engine.plan_key(plan) if plan else None
+            query_embedding = await run_in_threadpool(rag_service.embed_query, request.message)
+            data_version = semantic_cache.data_version(user.id, user_type)
+            cached = await run_in_threadpool(semantic_cache.lookup, user.id, user_type, query_embedding, key=plan_key)
+            
+            if cached:
+                response = cached["response"]
+                context = cached["context"]
+            else:
+                if plan:
+                    aggregates = await db.run_sync(
+                        lambda sync_db: query_engine.execute(plan, sync_db, user.id, user_type)
+                    )
+                    context = aggregates.pop("transactions")
+                else:
+                    # Retrieve context: vector search in the thread pool, row lookups on the session
+                    hits = await run_in_threadpool(
+                        rag_service.search, request.message, user.id, user_type,
+                        query_embedding=query_embedding
+                    )
+                    context = await db.run_sync(rag_service.fetch_context, hits)
+                
+                # Get persistent memory
+                persistent_memory = await db.run_sync(rag_service.get_persistent_memory, user.id, user_type)
+                
+                # Generate response
+                response = await run_in_threadpool(
+                    gemini_service.generate_chat_response,
+                    request.message,
+                    context,
+                    session.ephemeral_memory,
+                    persistent_memory,
+                    aggregates=aggregates
+                )
+                
+                # Conversational answers depend on session facts, fallbacks are degraded
+                if response.get("intent") not in ("conversational", "unknown") and not response.get("fallback"):
+                    semantic_cache.store(
+                        user.id, user_type, query_embedding, response, context,
+                        version=data_version, key=plan_key
+                    )
         
         # Determine if we should show transactions
         should_show_transactions = response.get("should_show_transactions", False)
@@ -90,17 +150,23 @@ async def send_message(
             provenance={
                 "transaction_ids": response.get("provenance", []),
                 "confidence": response.get("confidence"),
-                "should_show_transactions": should_show_transactions
+                "should_show_transactions": should_show_transactions,
+                "cached": cached is not None,
+                "usage": None if cached else response.get("usage")
             },
             retrieved_docs=context if should_show_transactions else []
         )
         db.add(assistant_message)
         
-        # Update session memory
-        session.ephemeral_memory["last_query"] = request.message
-        session.ephemeral_memory["last_intent"] = response.get("intent")
+        # Update session memory (each turn keeps a summary of the answer; older turns move to a log)
+        session_memory = dict(session.ephemeral_memory or {})
+        session_memory.update(response.get("memory_updates") or {})
+        session.ephemeral_memory = prompt_builder.update_session_memory(
+            session_memory, request.message, response.get("intent"),
+            answer=prompt_builder.summarize_answer(response, aggregates)
+        )
         
-        db.commit()
+        await db.commit()
         
         return {
             "session_id": session.id,
@@ -109,11 +175,12 @@ async def send_message(
             "confidence": response.get("confidence"),
             "should_show_transactions": should_show_transactions,
             "provenance": {"transaction_ids": response.get("provenance", [])},
-            "retrieved_docs": transactions_to_show
+            "retrieved_docs": transactions_to_show,
+            "cached": cached is not None
         }
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 @router.get("/session/{session_id}/history")
@@ -121,7 +188,7 @@ async def get_chat_history(
     session_id: int,
     limit: int = 50,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get chat history for a session"""
     user = current_user["user"]
@@ -129,7 +196,9 @@ async def get_chat_history(
     
     # Verify session belongs to user
     from app.models.chat import ChatSession
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    session = (await db.execute(
+        select(ChatSession).where(ChatSession.id == session_id)
+    )).scalar_one_or_none()
     
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -141,9 +210,11 @@ async def get_chat_history(
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Get messages
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.timestamp.asc()).limit(limit).all()
+    messages = (await db.execute(
+        select(ChatMessage).where(
+            ChatMessage.session_id == session_id
+        ).order_by(ChatMessage.created_at.asc()).limit(limit)
+    )).scalars().all()
     
     return {
         "session_id": session_id,
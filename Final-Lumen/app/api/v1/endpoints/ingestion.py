@@ -7,10 +7,12 @@ from datetime import datetime
 
 from app.core.database import get_db
 from app.utils.auth import get_current_user
+from app.services.user_cache import load_user
 from app.core.config import settings
 from app.services.ocr_service import ocr_service
 from app.services.gemini_service import gemini_service
 from app.services.rag_service import rag_service
+from app.services.anomaly_pipeline import anomaly_pipeline
 from app.models.transaction import Transaction, PaymentChannel, SourceType as TransactionSourceType
 from app.models.source import Source
 from app.models.merchant import Merchant
@@ -166,6 +168,10 @@ async def upload_receipt(
         
         db.commit()
         
+        # Score for anomalies off the request path
+        if transaction_id:
+            anomaly_pipeline.enqueue(user.id, user_type, [transaction_id])
+        
         return {
             "status": "success",
             "source_id": source.id,
@@ -218,8 +224,8 @@ async def connect_gmail(
         success = gmail_service.authenticate(user.id)
         
         if success:
-            # Enable consent
-            user.consent_gmail_ingest = True
+            # Enable consent (current_user is a read-only snapshot)
+            load_user(db, user.id, user_type).consent_gmail_ingest = True
             db.commit()
             
             return {
@@ -262,6 +268,7 @@ async def sync_gmail(
         
         # Process and save transactions
         saved_count = 0
+        saved_ids = []
         for tx_data in transactions:
             try:
                 # Create Source record
@@ -350,6 +357,7 @@ async def sync_gmail(
                     pass
                 
                 saved_count += 1
+                saved_ids.append(transaction.id)
             
             except Exception as e:
                 logger.error(f"Error saving Gmail transaction: {e}")
@@ -357,6 +365,9 @@ async def sync_gmail(
         
         db.commit()
         
+        # Score for anomalies off the request path
+        anomaly_pipeline.enqueue(user.id, user_type, saved_ids)
+        
         return {
             "success": True,
             "fetched": len(transactions),
@@ -563,6 +574,9 @@ async def add_consumer_transaction(
         db.commit()
         db.refresh(transaction)
         
+        # Score for anomalies off the request path
+        anomaly_pipeline.enqueue(user.id, user_type, [transaction.id])
+        
         return {
             "success": True,
             "transaction": {
@@ -718,6 +732,9 @@ async def add_business_transaction(
         db.commit()
         db.refresh(transaction)
         
+        # Score for anomalies off the request path
+        anomaly_pipeline.enqueue(user.id, user_type, [transaction.id])
+        
         return {
             "success": True,
             "transaction": {
@@ -1,53 +1,83 @@
 """Transaction endpoints - stub implementation"""
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.utils.auth import get_current_user
 from app.models.transaction import Transaction, SourceType, PaymentChannel
 from app.models.source import Source
 from app.models.merchant import Merchant
+from app.schemas.transaction import TransactionListResponse
+from app.services.stats_service import stats_service
+from app.services.pattern_engine import pattern_engine
+from app.services.response_cache import response_cache, TRANSACTIONS
+from app.utils.pagination import paginate, count_rows, LISTING_COLUMNS
+from app.utils.audit import log_audit
+from app.models.audit import AuditActor, AuditAction
 
 router = APIRouter()
 
-@router.get("/")
+@router.get("/", response_model=TransactionListResponse)
 async def get_transactions(
+    request: Request,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = Query(100, le=1000),
     offset: int = 0,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (overrides offset)"),
+    total: str = Query("exact", pattern="^(exact|estimated|none)$", description="How to compute total"),
     flagged_only: bool = False
 ):
-    """Get user transactions with filters"""
+    """Get user transactions with filters, newest first"""
     user = current_user["user"]
     user_type = current_user["user_type"]
     
-    # Build query based on user type
-    if user_type == "consumer":
-        query = db.query(Transaction).filter(Transaction.user_consumer_id == user.id)
-    else:
-        query = db.query(Transaction).filter(Transaction.user_business_id == user.id)
-    
-    if flagged_only:
-        query = query.filter(Transaction.flagged == True)
+    cache_key = response_cache.key(
+        "transactions.list", TRANSACTIONS, user.id, user_type,
+        limit=limit, offset=offset, cursor=cursor, total=total, flagged_only=flagged_only
+    )
+    cached = response_cache.lookup(request, cache_key)
+    if cached is not None:
+        return cached
+    
+    def load_page(session: Session):
+        # Build query based on user type (list columns only)
+        if user_type == "consumer":
+            query = session.query(*LISTING_COLUMNS).filter(Transaction.user_consumer_id == user.id)
+        else:
+            query = session.query(*LISTING_COLUMNS).filter(Transaction.user_business_id == user.id)
+        
+        if flagged_only:
+            query = query.filter(Transaction.flagged == True)
+        
+        transactions, next_cursor = paginate(query, limit, cursor=cursor, offset=offset)
+        return transactions, next_cursor, count_rows(session, query, total)
     
-    transactions = query.offset(offset).limit(limit).all()
-    total = query.count()
-    
-    return {
-        "transactions": transactions,
-        "total": total,
-        "limit": limit,
-        "offset": offset
-    }
+    try:
+        transactions, next_cursor, total_count = await db.run_sync(load_page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return response_cache.store(request, cache_key, TransactionListResponse(
+        transactions=transactions,
+        total=total_count,
+        total_estimated=total == "estimated",
+        limit=limit,
+        offset=offset,
+        next_cursor=next_cursor
+    ))
 
 @router.get("/stats")
 async def get_transaction_stats(
+    request: Request,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
-    days: int = Query(30, description="Number of days to analyze")
+    db: AsyncSession = Depends(get_async_db),
+    days: int = Query(30, description="Number of days to analyze"),
+    source: str = Query("rollup", pattern="^(rollup|live)$", description="rollup: whole days from daily rollups; live: exact window")
 ):
     """
     Get transaction statistics and insights
@@ -61,99 +91,36 @@ async def get_transaction_stats(
     
     **AI Integration**: Stats feed into anomaly detection by establishing baselines
     """
-    from sqlalchemy import func
-    from datetime import timedelta
-    
     user = current_user["user"]
     user_type = current_user["user_type"]
     
-    # Date range
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    cache_key = response_cache.key("transactions.stats", TRANSACTIONS, user.id, user_type, days=days, source=source)
+    cached = response_cache.lookup(request, cache_key)
+    if cached is not None:
+        return cached
     
-    # Build base query
-    if user_type == "consumer":
-        base_query = db.query(Transaction).filter(
-            Transaction.user_consumer_id == user.id,
-            Transaction.date >= cutoff_date
-        )
+    # One query either way: daily rollups (whole days) or a single pass over transactions
+    if source == "live":
+        stats = await db.run_sync(stats_service.live, user.id, user_type, days)
     else:
-        base_query = db.query(Transaction).filter(
-            Transaction.user_business_id == user.id,
-            Transaction.date >= cutoff_date
-        )
-    
-    # Total transactions
-    total_count = base_query.count()
-    
-    # Total amount (sum of all transactions)
-    total_amount = base_query.with_entities(
-        func.sum(Transaction.amount)
-    ).scalar() or 0.0
-    
-    # Category breakdown
-    category_stats = base_query.with_entities(
-        Transaction.category,
-        func.count(Transaction.id).label('count'),
-        func.sum(Transaction.amount).label('total')
-    ).group_by(Transaction.category).all()
-    
-    categories = [
-        {
-            "category": cat,
-            "count": count,
-            "total": float(total),
-            "percentage": (float(total) / total_amount * 100) if total_amount > 0 else 0
-        }
-        for cat, count, total in category_stats
-    ]
-    
-    # Top merchants
-    top_merchants = base_query.with_entities(
-        Transaction.merchant_name_raw,
-        func.count(Transaction.id).label('count'),
-        func.sum(Transaction.amount).label('total')
-    ).group_by(Transaction.merchant_name_raw)\
-     .order_by(func.sum(Transaction.amount).desc())\
-     .limit(10).all()
-    
-    merchants = [
-        {
-            "merchant": merchant,
-            "transaction_count": count,
-            "total_spent": float(total)
-        }
-        for merchant, count, total in top_merchants
-    ]
-    
-    # Flagged transactions (anomalies)
-    flagged_count = base_query.filter(Transaction.flagged == True).count()
-    confirmed_count = base_query.filter(Transaction.confirmed == True).count()
-    
-    # Payment channel breakdown
-    channel_stats = base_query.with_entities(
-        Transaction.payment_channel,
-        func.count(Transaction.id).label('count')
-    ).group_by(Transaction.payment_channel).all()
-    
-    channels = {
-        str(channel.value): count 
-        for channel, count in channel_stats
-    }
+        stats = await db.run_sync(stats_service.from_rollups, user.id, user_type, days)
+    total_count = stats["total_count"]
+    total_amount = stats["total_amount"]
     
     # Average transaction amount
     avg_amount = total_amount / total_count if total_count > 0 else 0
     
-    return {
+    return response_cache.store(request, cache_key, {
         "period_days": days,
         "total_transactions": total_count,
         "total_amount": round(total_amount, 2),
         "average_amount": round(avg_amount, 2),
-        "flagged_count": flagged_count,
-        "confirmed_count": confirmed_count,
-        "unconfirmed_count": total_count - confirmed_count,
-        "categories": sorted(categories, key=lambda x: x['total'], reverse=True),
-        "top_merchants": merchants,
-        "payment_channels": channels,
+        "flagged_count": stats["flagged_count"],
+        "confirmed_count": stats["confirmed_count"],
+        "unconfirmed_count": total_count - stats["confirmed_count"],
+        "categories": sorted(stats["categories"], key=lambda x: x['total'], reverse=True),
+        "top_merchants": stats["top_merchants"],
+        "payment_channels": stats["channels"],
         "purpose": {
             "description": "Statistics provide baseline data for AI anomaly detection",
             "features": [
@@ -163,16 +130,18 @@ async def get_transaction_stats(
                 "Payment channel patterns detect unusual payment methods"
             ]
         }
-    }
+    })
 
 @router.get("/{transaction_id}")
 async def get_transaction(
     transaction_id: int,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get specific transaction"""
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    transaction = (await db.execute(
+        select(Transaction).where(Transaction.id == transaction_id)
+    )).scalar_one_or_none()
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return transaction
@@ -198,8 +167,6 @@ async def confirm_transaction(
     - Helps calibrate anomaly detection thresholds
     - Builds user-specific spending patterns
     """
-    from app.utils.audit import log_audit
-    
     user = current_user["user"]
     user_type = current_user["user_type"]
     
@@ -225,6 +192,12 @@ async def confirm_transaction(
         # If rejecting, flag it
         transaction.flagged = True
     
+    # Keep learned spending patterns in sync with the user's decision
+    if confirmed and old_confirmed is False:
+        pattern_engine.observe(db, transaction, user.id, user_type)
+    elif not confirmed and old_confirmed is not False:
+        pattern_engine.forget(db, transaction, user.id, user_type)
+    
     # Add notes to parsed_fields
     if notes:
         if not transaction.parsed_fields:
@@ -237,12 +210,11 @@ async def confirm_transaction(
     # Log audit trail
     try:
         log_audit(
-            db=db,
+            action=AuditAction.CONFIRMED if confirmed else AuditAction.REJECTED,
+            actor=AuditActor.USER,
             user_id=user.id,
             user_type=user_type,
             transaction_id=transaction_id,
-            action="CONFIRMED" if confirmed else "REJECTED",
-            actor="user",
             reason={
                 "previous_state": {
                     "confirmed": old_confirmed,
@@ -1,10 +1,11 @@
 """User endpoints - stub implementation"""
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.utils.auth import get_current_user
 from app.models.user import UserConsumer, UserBusiness
 from app.schemas.user import UserConsumerUpdate, UserBusinessUpdate
+from app.services.response_cache import response_cache, PROFILE
 from datetime import datetime
 import os
 import uuid
@@ -48,6 +49,7 @@ async def upload_avatar(
 
 @router.get("/me")
 async def get_current_user_profile(
+    request: Request,
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -55,6 +57,11 @@ async def get_current_user_profile(
     user = current_user["user"]
     user_type = current_user.get("user_type", "consumer")
     
+    cache_key = response_cache.key("users.me", PROFILE, user.id, user_type)
+    cached = response_cache.lookup(request, cache_key)
+    if cached is not None:
+        return cached
+    
     # Get name based on user type
     if user_type == "business":
         name = getattr(user, 'business_name', None) or getattr(user, 'contact_person', None)
@@ -81,7 +88,7 @@ async def get_current_user_profile(
             "gstin": getattr(user, 'gstin', None),
         })
     
-    return user_data
+    return response_cache.store(request, cache_key, user_data)
 
 @router.put("/me")
 @router.patch("/me")
@@ -92,13 +99,13 @@ async def update_user_profile(
 ):
     """Update user profile"""
     user_data = current_user["user"]
-    user_type = current_user.get("user_type", "CONSUMER")
+    user_type = current_user.get("user_type", "consumer")
     
     try:
-        if user_type == "CONSUMER":
-            user = db.query(UserConsumer).filter(UserConsumer.id == user_data["id"]).first()
+        if user_type == "consumer":
+            user = db.query(UserConsumer).filter(UserConsumer.id == user_data.id).first()
         else:
-            user = db.query(UserBusiness).filter(UserBusiness.id == user_data["id"]).first()
+            user = db.query(UserBusiness).filter(UserBusiness.id == user_data.id).first()
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
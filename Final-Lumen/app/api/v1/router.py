@@ -4,7 +4,7 @@ API Router - Main router for all v1 endpoints
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, users, transactions, chat, ingestion, anomalies
+from app.api.v1.endpoints import auth, users, transactions, chat, ingestion, anomalies, audit
 
 api_router = APIRouter()
 
@@ -15,3 +15,4 @@ api_router.include_router(transactions.router, prefix="/transactions", tags=["Tr
 api_router.include_router(chat.router, prefix="/chat", tags=["Chat & RAG"])
 api_router.include_router(ingestion.router, prefix="/ingest", tags=["Data Ingestion"])
 api_router.include_router(anomalies.router, prefix="/anomalies", tags=["Anomaly Detection"])
+api_router.include_router(audit.router, prefix="/audit", tags=["Audit"])
@@ -5,7 +5,7 @@ Loads settings from environment variables
 
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import List, Union
+from typing import List, Optional, Union
 import os
 
 
@@ -17,10 +17,26 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
     LOG_LEVEL: str = "INFO"
+    WEB_CONCURRENCY: int = 1  # Worker processes; uvicorn and gunicorn read the same variable for their default
     
     # Database
     DATABASE_URL: str
     DATABASE_AUDIT_URL: str
+    DATABASE_ASYNC_URL: Optional[str] = None  # Defaults to DATABASE_URL with the asyncpg/aiosqlite driver
+    
+    # Database connection pools (per process: multiply by uvicorn workers)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    ASYNC_DB_POOL_SIZE: int = 10
+    ASYNC_DB_MAX_OVERFLOW: int = 20
+    AUDIT_DB_POOL_SIZE: int = 5
+    AUDIT_DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 30  # Wait for a free connection before failing
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # Replace connections older than this (-1 never)
+    DB_POOL_PRE_PING: bool = True  # Test each checkout with a round trip (survives PG restarts and idle timeouts)
+    METRICS_TOKEN: str = ""  # Bearer token for /metrics/*; if empty only loopback clients are served
+    DB_QUERY_CACHE_SIZE: int = 500  # Compiled SQL statements cached per engine
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100  # asyncpg server-side prepared statements per connection (0 behind PgBouncer)
     
     # JWT
     SECRET_KEY: str
@@ -53,6 +69,76 @@ class Settings(BaseSettings):
     SIGMA_THRESHOLD: float = 3.0
     HIGH_CONFIDENCE_SIGMA: float = 6.0
     ANOMALY_CONFIDENCE_THRESHOLD: float = 0.85
+    PATTERN_WINDOW_DAYS: int = 90  # Rolling window for learned spending patterns
+    
+    # Anomaly model retraining
+    ANOMALY_RETRAIN_MIN_NEW_TRANSACTIONS: int = 50
+    ANOMALY_RETRAIN_DRIFT_FACTOR: float = 3.0  # Retrain when outlier rate > contamination * factor
+    ANOMALY_RETRAIN_DRIFT_WINDOW: int = 200  # Recent scores considered for drift
+    ANOMALY_TRAINING_MAX_CONCURRENT: int = 1  # Training jobs running at once
+    ANOMALY_TRAINING_WINDOW_DAYS: int = 365
+    
+    # Anomaly model registry
+    ANOMALY_MODEL_CACHE_MAX_MB: int = 256  # Memory budget for loaded models
+    ANOMALY_MODEL_CACHE_MAX_ENTRIES: int = 1000
+    ANOMALY_MODEL_MISS_TTL_SECONDS: int = 300  # Cache "no model" results this long
+    ANOMALY_MODEL_KEEP_VERSIONS: int = 3
+    
+    # Post-commit anomaly scoring pipeline
+    ANOMALY_QUEUE_MAX_SIZE: int = 10000  # Queued ingest batches before new ones are dropped
+    ANOMALY_BATCH_SIZE: int = 500  # Transactions scored per pipeline batch
+    ANOMALY_BATCH_MAX_WAIT_SECONDS: float = 0.5
+    ANOMALY_RESCORE_LOOKBACK_DAYS: int = 30  # Startup sweep re-queues unscored transactions this recent (0 = off)
+    
+    # Duplicate detection
+    NEAR_DUPLICATE_WINDOW_HOURS: int = 24  # Same merchant and amount within this window
+    DUPLICATE_BLOOM_MAX_USERS: int = 10000
+    DUPLICATE_BLOOM_TTL_SECONDS: int = 600
+    
+    # Streaming velocity detection
+    VELOCITY_BUFFER_SIZE: int = 1024  # Ring buffer entries per user
+    VELOCITY_MAX_USERS: int = 10000  # Users kept in memory
+    VELOCITY_MIN_HISTORY: int = 20  # Transactions before novelty/spike rules apply
+    VELOCITY_MAX_PER_HOUR: int = 8
+    VELOCITY_SMALL_AMOUNT: float = 100.0
+    VELOCITY_SMALL_BURST_COUNT: int = 4  # Small payments per hour that suggest card testing
+    VELOCITY_DAILY_SPIKE_FACTOR: float = 4.0
+    
+    # Anomaly explanations
+    ANOMALY_EXPLANATION_LLM_ENABLED: bool = True  # Add a Gemini narrative in the background
+    ANOMALY_EXPLANATION_LLM_MAX_CONCURRENT: int = 2
+    ANOMALY_EXPLANATION_CACHE_MAX_ENTRIES: int = 5000
+    ANOMALY_EXPLANATION_CACHE_TTL_SECONDS: int = 600
+    
+    # Audit log writer
+    AUDIT_QUEUE_MAX_SIZE: int = 50000  # Queued records before callers write synchronously
+    AUDIT_BATCH_SIZE: int = 500  # Records inserted per batch
+    AUDIT_BATCH_MAX_WAIT_SECONDS: float = 0.2
+    
+    # Audit chain verification
+    AUDIT_CHECKPOINT_INTERVAL: int = 10000  # Records per verified segment and checkpoint
+    AUDIT_CHECKPOINT_KEY: str = ""  # HMAC key for checkpoint signatures (defaults to SECRET_KEY)
+    AUDIT_VERIFY_WORKERS: int = 0  # Verifier processes (0 = CPU count)
+    
+    # Audit partitioning and retention
+    AUDIT_PARTITION_PREMAKE_MONTHS: int = 3  # Monthly partitions created ahead of time
+    AUDIT_PARTITION_CHECK_INTERVAL_SECONDS: int = 6 * 3600  # How often the server re-checks partitions
+    AUDIT_RETENTION_MONTHS: int = 24  # Months kept in the database; older ones go to Parquet
+    AUDIT_ARCHIVE_DIR: str = "data/audit_archive"
+    AUDIT_ARCHIVE_COMPRESSION: str = "zstd"
+    
+    # Authenticated user cache
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60  # How long a user snapshot is trusted
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10000
+    LAST_ACTIVE_FLUSH_INTERVAL_SECONDS: int = 30  # last_active writes are batched this often
+    
+    # Dashboard response cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: str = "none"  # none / local: single-process only, off when WEB_CONCURRENCY > 1 | redis: shared by all workers
+    RESPONSE_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    RESPONSE_CACHE_TTL_SECONDS: int = 60
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000
+    RESPONSE_CACHE_MAX_MB: int = 64  # In-process memory budget for cached bodies
     
     # RAG
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
@@ -60,6 +146,21 @@ class Settings(BaseSettings):
     FAISS_INDEX_PATH: str = "data/faiss_index"
     RAG_TOP_K: int = 5
     
+    # Chat semantic response cache
+    CHAT_CACHE_ENABLED: bool = True
+    CHAT_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    CHAT_CACHE_TTL_SECONDS: int = 3600
+    CHAT_CACHE_MAX_ENTRIES_PER_USER: int = 50
+    CHAT_CACHE_MAX_USERS: int = 1000
+    
+    # Chat prompt budgets (estimated tokens)
+    CHAT_PROMPT_TOKEN_BUDGET: int = 3000
+    CHAT_SESSION_TOKEN_BUDGET: int = 500
+    CHAT_MEMORY_TOKEN_BUDGET: int = 400
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 1200
+    CHAT_DIGEST_TOKEN_BUDGET: int = 250  # Log of turns older than CHAT_RECENT_TURNS (question + answer summary)
+    CHAT_RECENT_TURNS: int = 6
+    
     # File Upload
     MAX_UPLOAD_SIZE_MB: int = 10
     UPLOAD_DIR: str = "data/uploads"
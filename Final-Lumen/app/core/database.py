@@ -2,30 +2,168 @@
 Database configuration and session management
 """
 
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
 
+
+def async_database_url(url: str) -> str:
+    """The same database with its async driver (asyncpg for PostgreSQL, aiosqlite for SQLite)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    elif backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+class PoolStats:
+    """Time spent obtaining connections from one engine's pool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=1000)  # Recent checkouts, for percentiles
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.total_wait += seconds
+                self._waits.append(seconds)
+            self.max_wait = max(self.max_wait, seconds)
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_ms_p95": round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0.0,
+                "wait_ms_max": round(self.max_wait * 1000, 3)
+            }
+
+
+def _timed_pool(pool_class, stats: PoolStats):
+    """pool_class whose checkouts (including pre-ping and new connections) record their wait in stats"""
+    
+    class TimedPool(pool_class):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                stats.record(time.perf_counter() - started, timed_out=True)
+                raise
+            stats.record(time.perf_counter() - started)
+            return connection
+    
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def engine_options(url: str, pool_size: int, max_overflow: int, stats: PoolStats) -> Dict:
+    """create_engine/create_async_engine arguments for url from the pool settings"""
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "query_cache_size": settings.DB_QUERY_CACHE_SIZE
+    }
+    parsed = make_url(url)
+    # SQLite keeps SQLAlchemy's default pool (per-thread or NullPool) and takes no pool sizes
+    if parsed.get_backend_name() != "sqlite":
+        pool_class = AsyncAdaptedQueuePool if parsed.get_dialect().is_async else QueuePool
+        options.update(
+            poolclass=_timed_pool(pool_class, stats),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS
+        )
+    return options
+
+
+def with_statement_cache(url: str) -> str:
+    """Async URL with asyncpg's server-side prepared statement cache sized from settings"""
+    parsed = make_url(url)
+    if parsed.drivername == "postgresql+asyncpg" and "prepared_statement_cache_size" not in parsed.query:
+        parsed = parsed.update_query_dict(
+            {"prepared_statement_cache_size": str(settings.DB_PREPARED_STATEMENT_CACHE_SIZE)}
+        )
+    return parsed.render_as_string(hide_password=False)
+
+
+pool_stats = {"main": PoolStats(), "audit": PoolStats(), "async": PoolStats()}
+
 # Main database engine
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+    **engine_options(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, pool_stats["main"])
 )
 
 # Audit database engine (separate for compliance)
 audit_engine = create_engine(
     settings.DATABASE_AUDIT_URL,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10
+    **engine_options(
+        settings.DATABASE_AUDIT_URL, settings.AUDIT_DB_POOL_SIZE, settings.AUDIT_DB_MAX_OVERFLOW, pool_stats["audit"]
+    )
+)
+
+# Async engine for endpoints that use get_async_db (same database as engine)
+ASYNC_DATABASE_URL = with_statement_cache(settings.DATABASE_ASYNC_URL or async_database_url(settings.DATABASE_URL))
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_options(
+        ASYNC_DATABASE_URL, settings.ASYNC_DB_POOL_SIZE, settings.ASYNC_DB_MAX_OVERFLOW, pool_stats["async"]
+    )
 )
 
+
+def pool_metrics() -> Dict:
+    """
+    Pool occupancy and checkout wait times for this process
+    
+    Each uvicorn worker has its own pools: the database sees up to
+    max_connections per engine times the number of workers.
+    """
+    engines = {"main": engine, "audit": audit_engine, "async": async_engine.sync_engine}
+    metrics = {}
+    for name, pool_engine in engines.items():
+        pool = pool_engine.pool
+        entry = {"pool": type(pool).__name__, "dialect": pool_engine.dialect.name}
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                max_connections=pool.size() + max(pool._max_overflow, 0),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=pool.overflow()
+            )
+        entry.update(pool_stats[name].snapshot())
+        metrics[name] = entry
+    return {"pid": os.getpid(), "engines": metrics}
+
 # Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 AuditSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=audit_engine)
+# Attributes stay loaded after commit: lazy loads are not possible outside the event loop's greenlet
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
@@ -41,6 +179,20 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency for getting an async database session
+    
+    Use await db.execute(...) for new queries; existing sync helpers and
+    services run unchanged through await db.run_sync(fn, *args), which
+    calls fn(sync_session, *args). run_sync only awaits the database round
+    trips: fn itself runs on the event loop thread, so keep CPU-heavy work
+    out of it and send that to run_in_threadpool instead.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def get_audit_db():
     """Dependency for getting audit database session"""
     db = AuditSessionLocal()
@@ -8,6 +8,7 @@ from app.models.merchant import Merchant
 from app.models.source import Source
 from app.models.transaction import Transaction, SourceType, PaymentChannel
 from app.models.pattern import Pattern
+from app.models.rollup import TransactionRollup
 from app.models.chat import ChatSession, ChatMessage, ChatMemory
 from app.models.rag import RAGIndex
 from app.models.audit import AuditRecord, AuditActor, AuditAction
@@ -27,6 +28,8 @@ __all__ = [
     "PaymentChannel",
     # Pattern
     "Pattern",
+    # Rollups
+    "TransactionRollup",
     # Chat
     "ChatSession",
     "ChatMessage",
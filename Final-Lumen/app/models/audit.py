@@ -2,7 +2,7 @@
 Audit Model - comprehensive audit trail (separate schema)
 """
 
-from sqlalchemy import Column, Float, Integer, String, DateTime, JSON, Text, Enum as SQLEnum
+from sqlalchemy import Boolean, Column, Date, Float, Index, Integer, String, DateTime, JSON, Text, Enum as SQLEnum
 from datetime import datetime
 import enum
 
@@ -70,3 +70,43 @@ class AuditRecord(AuditBase):
     
     # Additional metadata (renamed from 'metadata' to avoid SQLAlchemy reserved word)
     audit_metadata = Column(JSON, default=dict)
+    
+    # Per-user history by time; on PostgreSQL the table is partitioned by
+    # month on timestamp (audit migration 0001), so time bounds prune partitions
+    __table_args__ = (
+        Index("ix_audit_records_user_timestamp", "user_id", "timestamp"),
+    )
+
+
+class AuditCheckpoint(AuditBase):
+    """Signed hash of the audit chain up to a record, verified when written"""
+    __tablename__ = "audit_checkpoints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    record_id = Column(Integer, nullable=False, unique=True)  # Last audit record covered
+    record_hash = Column(String, nullable=False)  # That record's record_hash
+    record_count = Column(Integer, nullable=False)  # Records verified from the start of the chain
+    signature = Column(String, nullable=False)  # HMAC-SHA256 of record_id, record_hash and record_count
+    # Operator-approved anchor after records written before hashed timestamps were stored;
+    # the records up to it are accepted as they are (legacy and approved_by are signed too)
+    legacy = Column(Boolean, default=False, nullable=False)
+    approved_by = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AuditArchive(AuditBase):
+    """A month of audit records offloaded to a Parquet file and removed from audit_records"""
+    __tablename__ = "audit_archives"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(Date, nullable=False, unique=True)  # First day of the archived month
+    first_record_id = Column(Integer, nullable=False)
+    last_record_id = Column(Integer, nullable=False, index=True)  # Chain resumes after this record
+    record_count = Column(Integer, nullable=False)
+    first_previous_hash = Column(String, nullable=True)  # Link to the previous archive's last_hash
+    last_hash = Column(String, nullable=False)
+    chain_count = Column(Integer, nullable=False)  # Records in the chain up to last_record_id
+    path = Column(String, nullable=False)
+    file_sha256 = Column(String, nullable=False)
+    signature = Column(String, nullable=False)  # HMAC-SHA256 of the fields above
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -43,6 +43,11 @@ class Pattern(Base):
     # Sample count (for confidence)
     sample_count = Column(Integer, default=0)
     
+    # Incremental statistics (see app/services/pattern_engine.py)
+    window_days = Column(Integer, default=90)
+    weekly_buckets = Column(JSON, default=dict)  # {week_start: {n, mean, m2, dow, hours, merchants}}
+    monthly_buckets = Column(JSON, default=dict)  # {YYYY-MM: {n, total}}
+    
     # Timestamps
     last_update = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,238 @@
+"""
+Transaction Rollup Model - daily aggregates for dashboard statistics
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import (
+    Column, Integer, String, Float, Date, UniqueConstraint, event,
+    insert, select, update, and_, or_, case, cast, func, literal
+)
+from sqlalchemy.orm import Session, attributes
+
+from app.core.database import Base
+from app.models.transaction import Transaction
+
+# Dimensions a transaction is rolled up by (one row per dimension per day)
+DIMENSIONS = ("category", "merchant", "channel")
+
+# Transaction attributes that move a transaction between rollup rows
+_TRACKED = (
+    "user_consumer_id", "user_business_id", "date", "amount",
+    "category", "merchant_name_raw", "payment_channel", "flagged", "confirmed",
+)
+
+
+class TransactionRollup(Base):
+    """
+    Daily totals per user and (category | merchant | channel)
+
+    Every transaction contributes to exactly one row of each dimension per
+    day, so summing the channel rows gives the overall totals. NULL category
+    or merchant is stored as an empty key.
+    """
+    __tablename__ = "transaction_daily_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Owner ('consumer' or 'business', as in audit records)
+    user_type = Column(String, nullable=False)
+    user_id = Column(Integer, nullable=False)
+
+    day = Column(Date, nullable=False)
+    dimension = Column(String, nullable=False)  # category | merchant | channel
+    key = Column(String, nullable=False)
+
+    # Aggregates
+    transaction_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    flagged_count = Column(Integer, nullable=False, default=0)
+    confirmed_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_type", "user_id", "day", "dimension", "key", name="uq_transaction_daily_rollups_row"),
+    )
+
+
+def _contribution(values: Dict) -> List[Tuple[Tuple, Tuple]]:
+    """Rollup rows a transaction with these attribute values adds to"""
+    if values["date"] is None or values["amount"] is None:
+        return []
+    if values["user_consumer_id"] is not None:
+        owner = ("consumer", values["user_consumer_id"])
+    elif values["user_business_id"] is not None:
+        owner = ("business", values["user_business_id"])
+    else:
+        return []
+
+    channel = values["payment_channel"]
+    keys = {
+        "category": values["category"] or "",
+        "merchant": values["merchant_name_raw"] or "",
+        "channel": getattr(channel, "value", channel) or "",
+    }
+    measures = (1, float(values["amount"]), int(bool(values["flagged"])), int(values["confirmed"] is True))
+    day = values["date"].date()
+    return [((*owner, dimension, day, keys[dimension]), measures) for dimension in DIMENSIONS]
+
+
+def _current_values(target: Transaction) -> Dict:
+    return {name: getattr(target, name) for name in _TRACKED}
+
+
+def _stored_values(session: Session, ids: List[int]) -> Dict[int, Dict]:
+    """Tracked attributes as currently stored, for transactions about to change"""
+    columns = [getattr(Transaction, name) for name in _TRACKED]
+    rows = session.connection().execute(
+        select(Transaction.id, *columns).where(Transaction.id.in_(ids))
+    ).all()
+    return {row[0]: dict(zip(_TRACKED, row[1:])) for row in rows}
+
+
+def apply_rollup_deltas(connection, deltas: Dict[Tuple, List]):
+    """
+    Add measure deltas to rollup rows, creating them as needed
+
+    Uses one INSERT .. ON CONFLICT DO UPDATE for PostgreSQL and SQLite, and
+    update-then-insert on other databases. Rows are written in key order so
+    concurrent flushes lock them in the same order.
+    """
+    rows = [
+        {
+            "user_type": key[0], "user_id": key[1], "dimension": key[2], "day": key[3], "key": key[4],
+            "transaction_count": delta[0], "total_amount": delta[1], "flagged_count": delta[2], "confirmed_count": delta[3],
+        }
+        for key, delta in sorted(deltas.items(), key=lambda item: tuple(str(part) for part in item[0]))
+        if any(delta)
+    ]
+    if not rows:
+        return
+
+    table = TransactionRollup.__table__
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_type", "user_id", "day", "dimension", "key"],
+            set_={
+                "transaction_count": table.c.transaction_count + statement.excluded.transaction_count,
+                "total_amount": table.c.total_amount + statement.excluded.total_amount,
+                "flagged_count": table.c.flagged_count + statement.excluded.flagged_count,
+                "confirmed_count": table.c.confirmed_count + statement.excluded.confirmed_count,
+            }
+        )
+        connection.execute(statement, rows)
+        return
+
+    for row in rows:
+        result = connection.execute(
+            update(table).where(and_(
+                table.c.user_type == row["user_type"],
+                table.c.user_id == row["user_id"],
+                table.c.dimension == row["dimension"],
+                table.c.day == row["day"],
+                table.c.key == row["key"],
+            )).values(
+                transaction_count=table.c.transaction_count + row["transaction_count"],
+                total_amount=table.c.total_amount + row["total_amount"],
+                flagged_count=table.c.flagged_count + row["flagged_count"],
+                confirmed_count=table.c.confirmed_count + row["confirmed_count"],
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**row))
+
+
+def rebuild_rollups(connection, user_type: Optional[str] = None, user_id: Optional[int] = None):
+    """
+    Recompute rollups from the transactions table with INSERT .. SELECT
+
+    For backfills and for rows written without the ORM (bulk inserts, raw
+    SQL), which bypass the flush hook. Limited to one owner when given.
+    """
+    table = TransactionRollup.__table__
+    delete = table.delete()
+    owner_filter = []
+    if user_type is not None:
+        delete = delete.where(table.c.user_type == user_type)
+        owner_column = Transaction.user_consumer_id if user_type == "consumer" else Transaction.user_business_id
+        owner_filter.append(owner_column.isnot(None))
+        if user_id is not None:
+            delete = delete.where(table.c.user_id == user_id)
+            owner_filter.append(owner_column == user_id)
+    connection.execute(delete)
+
+    owner_type = case((Transaction.user_consumer_id.isnot(None), "consumer"), else_="business")
+    owner_id = func.coalesce(Transaction.user_consumer_id, Transaction.user_business_id)
+    day = func.date(Transaction.date)
+    keys = {
+        "category": func.coalesce(Transaction.category, ""),
+        "merchant": func.coalesce(Transaction.merchant_name_raw, ""),
+        "channel": cast(Transaction.payment_channel, String),
+    }
+    for dimension, key in keys.items():
+        source = select(
+            owner_type,
+            owner_id,
+            literal(dimension),
+            day,
+            key,
+            func.count(Transaction.id),
+            func.sum(Transaction.amount),
+            func.sum(case((Transaction.flagged == True, 1), else_=0)),
+            func.sum(case((Transaction.confirmed == True, 1), else_=0)),
+        ).where(
+            or_(Transaction.user_consumer_id.isnot(None), Transaction.user_business_id.isnot(None)),
+            *owner_filter
+        ).group_by(owner_type, owner_id, day, key)
+        connection.execute(table.insert().from_select(
+            ["user_type", "user_id", "dimension", "day", "key",
+             "transaction_count", "total_amount", "flagged_count", "confirmed_count"],
+            source
+        ))
+
+
+@event.listens_for(Session, "before_flush")
+def _maintain_rollups(session, flush_context, instances):
+    """
+    Fold inserted, updated and deleted transactions into the daily rollups
+
+    Previous values are read from the database rather than attribute history,
+    which is incomplete for attributes set while expired.
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0, 0])
+
+    def add(values: Dict, sign: int):
+        for key, measures in _contribution(values):
+            delta = deltas[key]
+            for i, measure in enumerate(measures):
+                delta[i] += sign * measure
+
+    with session.no_autoflush:
+        changed = [
+            target for target in session.dirty
+            if isinstance(target, Transaction) and any(
+                attributes.get_history(target, name, passive=attributes.PASSIVE_NO_INITIALIZE).has_changes()
+                for name in _TRACKED
+            )
+        ]
+        deleted = [target for target in session.deleted if isinstance(target, Transaction)]
+
+        if changed or deleted:
+            stored = _stored_values(session, [target.id for target in changed + deleted])
+            for target in changed + deleted:
+                if target.id in stored:
+                    add(stored[target.id], -1)
+
+        for target in changed:
+            add(_current_values(target), 1)
+        for target in session.new:
+            if isinstance(target, Transaction):
+                add(_current_values(target), 1)
+
+    if deltas:
+        apply_rollup_deltas(session.connection(), deltas)
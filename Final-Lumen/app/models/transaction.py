@@ -2,10 +2,13 @@
 Transaction Model
 """
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, JSON, ForeignKey, Enum as SQLEnum, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, JSON, ForeignKey, Enum as SQLEnum, Text, Index, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import Optional
 import enum
+import hashlib
+import re
 
 from app.core.database import Base
 
@@ -61,6 +64,7 @@ class Transaction(Base):
     
     # Invoice details
     invoice_no = Column(String, nullable=True)  # Encrypted
+    duplicate_key = Column(String(64), nullable=True, index=True)  # Hash of (user, invoice_no, merchant, amount)
     payment_channel = Column(SQLEnum(PaymentChannel), nullable=False)
     source_type = Column(SQLEnum(SourceType), nullable=False)
     
@@ -76,6 +80,7 @@ class Transaction(Base):
     flagged = Column(Boolean, default=False)
     anomaly_score = Column(Float, nullable=True)
     anomaly_reason = Column(Text, nullable=True)
+    anomaly_explanation = Column(JSON, nullable=True)  # Precomputed by anomaly_explainer
     
     # Human in the loop
     confirmed = Column(Boolean, nullable=True)  # None=pending, True=confirmed, False=rejected
@@ -95,3 +100,50 @@ class Transaction(Base):
     user_business = relationship("UserBusiness", back_populates="transactions", foreign_keys=[user_business_id])
     source = relationship("Source", back_populates="transactions")
     merchant = relationship("Merchant", back_populates="transactions")
+    
+    # Listing indexes per owner column: newest-first pages, flagged review
+    # queue and category filters (keyset pagination orders by date, id)
+    __table_args__ = (
+        Index("ix_transactions_consumer_date_id", "user_consumer_id", "date", "id"),
+        Index("ix_transactions_business_date_id", "user_business_id", "date", "id"),
+        Index("ix_transactions_consumer_flagged_date_id", "user_consumer_id", "flagged", "date", "id"),
+        Index("ix_transactions_business_flagged_date_id", "user_business_id", "flagged", "date", "id"),
+        Index("ix_transactions_consumer_category_date", "user_consumer_id", "category", "date"),
+        Index("ix_transactions_business_category_date", "user_business_id", "category", "date"),
+    )
+
+
+def compute_duplicate_key(
+    user_consumer_id: Optional[int],
+    user_business_id: Optional[int],
+    invoice_no: Optional[str],
+    merchant_name: Optional[str],
+    amount: Optional[float]
+) -> Optional[str]:
+    """
+    SHA-256 over normalized (user, invoice_no, merchant, amount)
+    
+    Only transactions with an invoice number get a key; without one, equal
+    merchant and amount is too common to mean "duplicate".
+    """
+    invoice = re.sub(r"[^a-z0-9]", "", (invoice_no or "").lower())
+    if not invoice or amount is None:
+        return None
+    
+    owner = f"c{user_consumer_id}" if user_consumer_id is not None else f"b{user_business_id}"
+    merchant = re.sub(r"\s+", " ", (merchant_name or "").lower()).strip()
+    normalized = f"{owner}|{invoice}|{merchant}|{float(amount):.2f}"
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+@event.listens_for(Transaction, "before_insert")
+@event.listens_for(Transaction, "before_update")
+def _set_duplicate_key(mapper, connection, target):
+    """Keep duplicate_key in sync on every write path"""
+    target.duplicate_key = compute_duplicate_key(
+        target.user_consumer_id,
+        target.user_business_id,
+        target.invoice_no,
+        target.merchant_name_raw,
+        target.amount
+    )
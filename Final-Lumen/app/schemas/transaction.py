@@ -44,6 +44,51 @@ class TransactionResponse(TransactionBase):
         from_attributes = True
 
 
+class TransactionListItem(BaseModel):
+    """Row of a transaction listing - list columns only, no encrypted or parser blobs"""
+    id: int
+    user_type: str
+    source_id: int
+    merchant_id: Optional[int] = None
+    merchant_name_raw: Optional[str] = None
+    amount: float
+    currency: Optional[str] = None
+    date: datetime
+    invoice_no: Optional[str] = None
+    payment_channel: str
+    source_type: str
+    category: Optional[str] = None
+    ocr_confidence: Optional[float] = None
+    classification_confidence: Optional[float] = None
+    flagged: Optional[bool] = None
+    anomaly_score: Optional[float] = None
+    anomaly_reason: Optional[str] = None
+    confirmed: Optional[bool] = None
+    confirmed_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class TransactionListResponse(BaseModel):
+    transactions: List[TransactionListItem]
+    total: Optional[int]
+    total_estimated: bool
+    limit: int
+    offset: int
+    next_cursor: Optional[str]
+
+
+class FlaggedTransactionsResponse(BaseModel):
+    flagged_transactions: List[TransactionListItem]
+    total: Optional[int]
+    pending_review: Optional[int]
+    total_estimated: bool
+    next_cursor: Optional[str]
+
+
 class TransactionUpdate(BaseModel):
     category: Optional[str] = None
     confirmed: Optional[bool] = None
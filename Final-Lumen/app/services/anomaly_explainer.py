@@ -0,0 +1,283 @@
+"""
+Anomaly Explanations
+Local feature attributions computed when a transaction is flagged, with an
+optional LLM narrative generated in the background
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.transaction import Transaction
+from app.services.anomaly_service import anomaly_detector, FEATURE_NAMES
+from app.services.gemini_service import gemini_service
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+EXPLANATION_VERSION = 1
+MAX_FACTORS = 3
+
+FEATURE_LABELS = {
+    "amount": "amount",
+    "hour": "time of day",
+    "day_of_week": "day of the week",
+    "day_of_month": "day of the month",
+    "is_upi": "payment channel (UPI)",
+    "is_card": "payment channel (card)",
+    "is_cash": "payment channel (cash)",
+    "ocr_confidence": "receipt scan confidence",
+}
+
+
+class AnomalyExplainer:
+    """
+    Builds and serves explanations for flagged transactions
+
+    The scoring pipeline calls explain_batch for flagged rows, so each
+    explanation reflects the model and patterns the transaction was scored
+    against. Isolation Forest attributions are computed by resetting one
+    scaled feature at a time to the training mean and measuring how much
+    the outlier score recovers (one score_samples call per batch).
+
+    Explanations are stored in Transaction.anomaly_explanation and cached
+    per transaction id. When ANOMALY_EXPLANATION_LLM_ENABLED is set, a short
+    Gemini narrative is added afterwards on a small thread pool; until then
+    narrative_status is "pending".
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(
+            max_entries=settings.ANOMALY_EXPLANATION_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.ANOMALY_EXPLANATION_CACHE_TTL_SECONDS
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _attributions(self, model_pair, features: np.ndarray) -> np.ndarray:
+        """
+        Per-feature contribution to each row's Isolation Forest outlier score
+
+        Returns: (rows, features) array; positive values pushed the row
+        towards being an outlier
+        """
+        model, scaler = model_pair
+        scaled = scaler.transform(features)
+        rows, width = scaled.shape
+
+        # Row block 0 is the original, block j+1 has feature j neutralized
+        probes = np.repeat(scaled[np.newaxis, :, :], width + 1, axis=0)
+        for j in range(width):
+            probes[j + 1, :, j] = 0.0
+        scores = model.score_samples(probes.reshape(-1, width)).reshape(width + 1, rows)
+        return (scores[1:] - scores[0]).T
+
+    def explain_batch(
+        self,
+        db: Session,
+        user_id: int,
+        user_type: str,
+        frame: pd.DataFrame,
+        results: List[Dict]
+    ) -> Dict[int, Dict]:
+        """
+        Explanations for the flagged rows of a detect_anomalies_batch result
+
+        Args:
+            frame: The frame that was scored (rows align with results)
+            results: Scoring results, after any velocity merge
+
+        Returns: {transaction_id: explanation}
+        """
+        flagged = [i for i, result in enumerate(results) if result["is_anomaly"]]
+        if not flagged:
+            return {}
+
+        rows = frame.iloc[flagged]
+        model_pair = anomaly_detector.get_model(f"{user_type}_{user_id}")
+        patterns = anomaly_detector._user_patterns(db, user_id, user_type)
+
+        contributions = None
+        features = anomaly_detector._frame_features(rows)
+        if model_pair:
+            contributions = self._attributions(model_pair, features)
+
+        explanations = {}
+        for position, i in enumerate(flagged):
+            result = results[i]
+            row = rows.iloc[position]
+
+            factors = []
+            if contributions is not None:
+                scaler = model_pair[1]
+                for j in np.argsort(-contributions[position])[:MAX_FACTORS]:
+                    if contributions[position, j] <= 0:
+                        break
+                    factors.append({
+                        "feature": FEATURE_NAMES[j],
+                        "label": FEATURE_LABELS[FEATURE_NAMES[j]],
+                        "value": round(float(features[position, j]), 2),
+                        "typical": round(float(scaler.mean_[j]), 2),
+                        "contribution": round(float(contributions[position, j]), 4)
+                    })
+
+            sigma = None
+            pattern = patterns.get(row["category"])
+            if pattern and pattern.avg_monthly_spend and pattern.std_monthly_spend:
+                sigma = {
+                    "category": row["category"],
+                    "amount": round(float(row["amount"]), 2),
+                    "typical_amount": round(pattern.avg_monthly_spend, 2),
+                    "std_amount": round(pattern.std_monthly_spend, 2),
+                    "z_score": round(result["z_score"], 2),
+                    "threshold": settings.SIGMA_THRESHOLD
+                }
+
+            explanations[int(row["id"])] = {
+                "version": EXPLANATION_VERSION,
+                "generated_at": datetime.utcnow().isoformat(),
+                "anomaly_score": result["anomaly_score"],
+                "summary": self._summary(row, result, sigma, factors),
+                "rules": result["reason"].split("; "),
+                "factors": factors,
+                "sigma": sigma,
+                "velocity": result.get("velocity"),
+                "narrative": None,
+                "narrative_status": "pending" if settings.ANOMALY_EXPLANATION_LLM_ENABLED else "disabled"
+            }
+
+        return explanations
+
+    @staticmethod
+    def _summary(row, result: Dict, sigma: Optional[Dict], factors: List[Dict]) -> str:
+        """One or two plain sentences built from the strongest signals"""
+        sentences = []
+        if sigma and sigma["z_score"] > sigma["threshold"]:
+            sentences.append(
+                f"₹{sigma['amount']:,.0f} is {sigma['z_score']:.1f}σ above your typical "
+                f"₹{sigma['typical_amount']:,.0f} for {sigma['category']}."
+            )
+        if factors:
+            labels = [factor["label"] for factor in factors]
+            listed = labels[0] if len(labels) == 1 else f"{', '.join(labels[:-1])} and {labels[-1]}"
+            sentences.append(f"Compared with your usual transactions, the {listed} stood out.")
+        if not sentences:
+            sentences.append(result["reason"].split("; ")[0] + ".")
+        return " ".join(sentences)
+
+    def publish(self, explanations: Dict[int, Dict]):
+        """Cache committed explanations and queue their narratives"""
+        for transaction_id, explanation in explanations.items():
+            if explanation["narrative_status"] == "pending":
+                self._narrative_executor().submit(self._add_narrative, transaction_id)
+            else:
+                self._cache.set(transaction_id, explanation)
+
+    def get(self, db: Session, transaction: Transaction, user_id: int, user_type: str) -> Optional[Dict]:
+        """
+        Explanation for a flagged transaction: cache, then the stored column,
+        then (for transactions flagged before explanations existed) computed now
+        """
+        explanation = self._cache.get(transaction.id)
+        if explanation is not None:
+            return explanation
+
+        explanation = transaction.anomaly_explanation
+        if explanation:
+            if explanation.get("narrative_status") != "pending":
+                self._cache.set(transaction.id, explanation)
+            return explanation
+
+        frame = anomaly_detector.load_feature_frame(db, user_id, user_type, transaction_ids=[transaction.id])
+        results = anomaly_detector.detect_anomalies_batch(user_id, user_type, db, frame=frame)
+        for result in results:
+            # Keep the stored verdict; only the explanation is missing
+            result.update(is_anomaly=True, anomaly_score=transaction.anomaly_score or result["anomaly_score"])
+            if transaction.anomaly_reason:
+                result["reason"] = transaction.anomaly_reason
+        explanations = self.explain_batch(db, user_id, user_type, frame, results)
+        explanation = explanations.get(transaction.id)
+        if explanation is None:
+            return None
+
+        transaction.anomaly_explanation = explanation
+        db.commit()
+        self.publish(explanations)
+        return explanation
+
+    def _narrative_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, settings.ANOMALY_EXPLANATION_LLM_MAX_CONCURRENT),
+                    thread_name_prefix="anomaly-narrative"
+                )
+            return self._executor
+
+    def _add_narrative(self, transaction_id: int):
+        """Ask Gemini for a short narrative and store it with the explanation"""
+        db = SessionLocal()
+        try:
+            transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+            if transaction is None or not transaction.anomaly_explanation:
+                return
+            explanation = dict(transaction.anomaly_explanation)
+
+            pattern = {}
+            if explanation.get("sigma"):
+                pattern = {
+                    "category": explanation["sigma"]["category"],
+                    "typical_amount": explanation["sigma"]["typical_amount"],
+                    "std_amount": explanation["sigma"]["std_amount"]
+                }
+
+            narrative = gemini_service.explain_anomaly(
+                {
+                    "amount": transaction.amount,
+                    "merchant": transaction.merchant_name_raw,
+                    "category": transaction.category,
+                    "date": transaction.date.isoformat(),
+                    "payment_channel": getattr(transaction.payment_channel, "value", transaction.payment_channel)
+                },
+                pattern,
+                {
+                    "anomaly_score": explanation["anomaly_score"],
+                    "rules": explanation["rules"],
+                    "factors": explanation["factors"],
+                    "velocity": explanation.get("velocity")
+                }
+            )
+
+            explanation.update(narrative=narrative, narrative_status="ready")
+            # Reassign so the JSON column is marked dirty
+            transaction.anomaly_explanation = explanation
+            db.commit()
+            self._cache.set(transaction_id, explanation)
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Anomaly narrative failed for transaction {transaction_id}: {e}")
+
+        finally:
+            db.close()
+
+    def shutdown(self):
+        """Stop the narrative pool (called on application shutdown)"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+# Global instance
+anomaly_explainer = AnomalyExplainer()
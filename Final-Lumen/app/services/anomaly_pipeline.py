@@ -0,0 +1,317 @@
+"""
+Post-commit Anomaly Scoring Pipeline
+Scores newly ingested transactions in the background, in batches
+"""
+
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.transaction import Transaction
+from app.models.user import UserConsumer, UserBusiness
+from app.services.anomaly_service import anomaly_detector
+from app.services.anomaly_explainer import anomaly_explainer
+from app.services.pattern_engine import pattern_engine
+from app.services.velocity_detector import velocity_detector
+from app.services.model_scheduler import model_scheduler
+from app.services.whatsapp_service import whatsapp_service
+from app.utils.audit import AuditLogger
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AnomalyScoringPipeline:
+    """
+    Background stage run after an ingest request has committed
+
+    Ingest endpoints enqueue (user, transaction id) and return immediately.
+    A worker thread drains the queue in batches of up to ANOMALY_BATCH_SIZE
+    (or whatever arrived within ANOMALY_BATCH_MAX_WAIT_SECONDS), and for
+    each user in the batch:
+      1. scores the transactions with one detect_anomalies_batch call
+         against the patterns learned so far, plus the streaming velocity
+         windows (bursts, card testing, spend spikes, novelty),
+      2. stores flagged / anomaly_score / anomaly_reason, plus a precomputed
+         explanation for flagged transactions (see anomaly_explainer),
+      3. folds the transactions into the user's patterns,
+      4. reports new data and outlier flags to the retraining scheduler,
+      5. writes an anomaly detection audit record per transaction and sends
+         a WhatsApp alert for high-confidence anomalies.
+
+    The queue is bounded by ANOMALY_QUEUE_MAX_SIZE. When it is full, enqueue
+    returns False instead of blocking the request; such transactions (and
+    those of failed batches) keep anomaly_score NULL, and rescore_unscored
+    re-queues them at the next startup. Already scored transactions are
+    skipped, so a transaction queued twice is scored once.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=settings.ANOMALY_QUEUE_MAX_SIZE)
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.scored = 0
+        self.flagged = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_batch_seconds = 0.0
+
+    def start(self):
+        """Start the worker thread (idempotent)"""
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="anomaly-pipeline", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker to finish queued work and exit"""
+        if self._worker is None or not self._worker.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Anomaly pipeline queue full at shutdown; pending transactions stay unscored")
+            return
+        self._worker.join(timeout=timeout)
+
+    def enqueue(self, user_id: int, user_type: str, transaction_ids: List[int]) -> bool:
+        """
+        Queue committed transactions for scoring (never blocks)
+
+        Returns: False if the queue is full and the transactions were dropped
+        """
+        if not transaction_ids:
+            return True
+
+        self.start()
+        try:
+            self._queue.put_nowait((user_id, user_type, list(transaction_ids)))
+            return True
+        except queue.Full:
+            self.dropped += len(transaction_ids)
+            logger.warning(f"Anomaly pipeline queue full; {len(transaction_ids)} transactions left unscored")
+            return False
+
+    def rescore_unscored(self, lookback_days: Optional[int] = None) -> int:
+        """
+        Re-queue transactions created in the last lookback_days that were never scored
+
+        Returns: Number of transactions queued (stops early when the queue is full)
+        """
+        lookback_days = settings.ANOMALY_RESCORE_LOOKBACK_DAYS if lookback_days is None else lookback_days
+        if lookback_days <= 0:
+            return 0
+
+        db = SessionLocal()
+        try:
+            rows = db.query(Transaction.id, Transaction.user_consumer_id, Transaction.user_business_id).filter(
+                Transaction.anomaly_score.is_(None),
+                Transaction.created_at >= datetime.utcnow() - timedelta(days=lookback_days)
+            ).order_by(Transaction.id).all()
+        finally:
+            db.close()
+
+        by_user: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+        for transaction_id, consumer_id, business_id in rows:
+            if consumer_id is not None:
+                by_user[(consumer_id, "consumer")].append(transaction_id)
+            elif business_id is not None:
+                by_user[(business_id, "business")].append(transaction_id)
+
+        queued = 0
+        for (user_id, user_type), transaction_ids in by_user.items():
+            for offset in range(0, len(transaction_ids), settings.ANOMALY_BATCH_SIZE):
+                chunk = transaction_ids[offset:offset + settings.ANOMALY_BATCH_SIZE]
+                if not self.enqueue(user_id, user_type, chunk):
+                    logger.warning(f"Anomaly rescore stopped after {queued} transactions: queue full")
+                    return queued
+                queued += len(chunk)
+
+        if queued:
+            logger.info(f"Re-queued {queued} unscored transactions for anomaly scoring")
+        return queued
+
+    def _next_batch(self) -> Tuple[List[Tuple[int, str, List[int]]], bool]:
+        """Block for the first item, then gather more until the batch is full or the wait expires"""
+        items = [self._queue.get()]
+        if items[0] is _STOP:
+            return [], True
+
+        size = len(items[0][2])
+        deadline = time.monotonic() + settings.ANOMALY_BATCH_MAX_WAIT_SECONDS
+        while size < settings.ANOMALY_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return items, True
+            items.append(item)
+            size += len(item[2])
+
+        return items, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            items, stopping = self._next_batch()
+            if not items:
+                continue
+
+            by_user: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+            for user_id, user_type, transaction_ids in items:
+                by_user[(user_id, user_type)].extend(transaction_ids)
+
+            started = time.monotonic()
+            for (user_id, user_type), transaction_ids in by_user.items():
+                try:
+                    self.process(user_id, user_type, transaction_ids)
+                except Exception as e:
+                    logger.error(f"Anomaly pipeline failed for {user_type} {user_id}: {e}")
+
+            self.batches += 1
+            self.last_batch_seconds = time.monotonic() - started
+
+        # Drain anything queued before the stop marker
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                try:
+                    self.process(*item)
+                except Exception as e:
+                    logger.error(f"Anomaly pipeline failed during shutdown: {e}")
+
+    def process(self, user_id: int, user_type: str, transaction_ids: List[int]) -> List[Dict]:
+        """Score, persist and report one user's transactions (runs on the worker thread)"""
+        db = SessionLocal()
+        try:
+            # Skip transactions already scored (e.g. queued again by rescore_unscored)
+            transaction_ids = [
+                row.id for row in db.query(Transaction.id).filter(
+                    Transaction.id.in_(transaction_ids), Transaction.anomaly_score.is_(None)
+                )
+            ]
+            if not transaction_ids:
+                return []
+
+            frame = anomaly_detector.load_feature_frame(db, user_id, user_type, transaction_ids=transaction_ids)
+            results = anomaly_detector.detect_anomalies_batch(user_id, user_type, db, frame=frame)
+            if not results:
+                return []
+
+            transactions = {
+                tx.id: tx for tx in db.query(Transaction).filter(Transaction.id.in_(transaction_ids)).all()
+            }
+            velocity = velocity_detector.observe_batch(db, user_id, user_type, list(transactions.values()))
+            for result in results:
+                self._merge_velocity(result, velocity[result["transaction_id"]])
+            explanations = anomaly_explainer.explain_batch(db, user_id, user_type, frame, results)
+
+            for result in results:
+                tx = transactions[result["transaction_id"]]
+                tx.flagged = bool(tx.flagged) or result["is_anomaly"]
+                tx.anomaly_score = result["anomaly_score"]
+                tx.anomaly_reason = result["reason"]
+                if tx.id in explanations:
+                    tx.anomaly_explanation = explanations[tx.id]
+                # Patterns learn from the transaction only after it was scored against them
+                pattern_engine.observe(db, tx, user_id, user_type)
+
+            db.commit()
+            anomaly_explainer.publish(explanations)
+
+            model_scheduler.record_transactions(user_id, user_type, count=len(results))
+            model_scheduler.record_scores(user_id, user_type, [r["isolation_forest_outlier"] for r in results])
+
+            flagged = [r for r in results if r["is_anomaly"]]
+            self.scored += len(results)
+            self.flagged += len(flagged)
+
+            self._audit(user_id, user_type, results)
+            self._alert(db, user_id, user_type, flagged, transactions)
+            return results
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _merge_velocity(result: Dict, velocity: Dict):
+        """Combine streaming window flags into a batch scoring result"""
+        result["velocity"] = velocity["windows"]
+        if not velocity["is_anomaly"]:
+            return
+        reasons = [result["reason"]] if result["is_anomaly"] else []
+        result["reason"] = "; ".join(reasons + velocity["reasons"])
+        result["anomaly_score"] = max(result["anomaly_score"], velocity["anomaly_score"])
+        result["is_anomaly"] = True
+
+    def _audit(self, user_id: int, user_type: str, results: List[Dict]):
+        try:
+            for result in results:
+                AuditLogger.log_anomaly_detection(
+                    transaction_id=result["transaction_id"],
+                    user_id=user_id,
+                    user_type=user_type,
+                    anomaly_score=result["anomaly_score"],
+                    isolation_forest_score=result["isolation_forest_score"],
+                    sigma_deviation=result["z_score"],
+                    evidence={"reason": result["reason"], "velocity": result.get("velocity")},
+                    flagged=result["is_anomaly"]
+                )
+        except Exception as e:
+            logger.error(f"Anomaly audit logging failed: {e}")
+
+    def _alert(self, db, user_id: int, user_type: str, flagged: List[Dict], transactions: Dict[int, Transaction]):
+        """WhatsApp alert for anomalies above ANOMALY_CONFIDENCE_THRESHOLD"""
+        alerts = [r for r in flagged if r["anomaly_score"] >= settings.ANOMALY_CONFIDENCE_THRESHOLD]
+        if not alerts or not whatsapp_service.is_configured():
+            return
+
+        user_model = UserConsumer if user_type == "consumer" else UserBusiness
+        user = db.query(user_model).filter(user_model.id == user_id).first()
+        if not user or not user.phone:
+            return
+
+        for result in alerts:
+            tx = transactions[result["transaction_id"]]
+            whatsapp_service.send_anomaly_alert(
+                user.phone,
+                {
+                    "amount": tx.amount,
+                    "merchant": tx.merchant_name_raw,
+                    "date": tx.date.strftime('%Y-%m-%d %H:%M')
+                },
+                result["reason"]
+            )
+
+    def stats(self) -> Dict:
+        """Pipeline counters for instrumentation"""
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": settings.ANOMALY_QUEUE_MAX_SIZE,
+            "scored": self.scored,
+            "flagged": self.flagged,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "last_batch_seconds": round(self.last_batch_seconds, 3)
+        }
+
+
+# Global instance
+anomaly_pipeline = AnomalyScoringPipeline()
@@ -6,28 +6,57 @@ from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
-import pickle
-import os
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
 import logging
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.models.transaction import Transaction
+from app.models.transaction import Transaction, PaymentChannel
 from app.models.pattern import Pattern
+from app.services.pattern_engine import pattern_engine
+from app.services.model_registry import model_registry
+from app.services.duplicate_detector import duplicate_detector
 
 logger = logging.getLogger(__name__)
 
+# Columns pulled from the database for feature extraction and batch scoring
+FRAME_COLUMNS = [
+    "id", "amount", "date", "payment_channel", "ocr_confidence", "category",
+    "merchant_name_raw", "duplicate_key",
+]
+
+FEATURE_NAMES = [
+    "amount", "hour", "day_of_week", "day_of_month",
+    "is_upi", "is_card", "is_cash", "ocr_confidence",
+]
+
+MIN_TRAINING_TRANSACTIONS = 30
+
+
+def fit_isolation_forest(features: np.ndarray) -> Tuple[IsolationForest, StandardScaler]:
+    """
+    Fit a scaler and Isolation Forest on a feature matrix
+    
+    Module-level so it can run in a worker process (see model_scheduler).
+    """
+    scaler = StandardScaler()
+    features_scaled = scaler.fit_transform(features)
+    
+    model = IsolationForest(
+        contamination=settings.ISOLATION_FOREST_CONTAMINATION,
+        random_state=42,
+        n_estimators=100
+    )
+    model.fit(features_scaled)
+    return model, scaler
+
 
 class AnomalyDetector:
     """Anomaly Detection Service"""
     
     def __init__(self):
-        self.models = {}  # Per-user models
-        self.scalers = {}  # Per-user scalers
-        self.model_dir = "data/models"
-        os.makedirs(self.model_dir, exist_ok=True)
+        self.registry = model_registry  # Per-user models and scalers
     
     def train_user_model(
         self,
@@ -46,8 +75,8 @@ class AnomalyDetector:
         Returns: True if training successful
         """
         try:
-            if len(transactions) < 30:
-                logger.warning(f"Insufficient data for user {user_id}. Need at least 30 transactions.")
+            if len(transactions) < MIN_TRAINING_TRANSACTIONS:
+                logger.warning(f"Insufficient data for user {user_id}. Need at least {MIN_TRAINING_TRANSACTIONS} transactions.")
                 return False
             
             # Extract features
@@ -56,25 +85,9 @@ class AnomalyDetector:
             if features is None or len(features) == 0:
                 return False
             
-            # Scale features
-            scaler = StandardScaler()
-            features_scaled = scaler.fit_transform(features)
-            
-            # Train Isolation Forest
-            model = IsolationForest(
-                contamination=settings.ISOLATION_FOREST_CONTAMINATION,
-                random_state=42,
-                n_estimators=100
-            )
-            model.fit(features_scaled)
-            
-            # Save model and scaler
-            model_key = f"{user_type}_{user_id}"
-            self.models[model_key] = model
-            self.scalers[model_key] = scaler
-            
-            # Persist to disk
-            self._save_model(model_key, model, scaler)
+            # Train, swap in and persist
+            model, scaler = fit_isolation_forest(features)
+            self.install_model(f"{user_type}_{user_id}", model, scaler, metadata={"n_samples": len(features)})
             
             logger.info(f"Trained anomaly model for user {user_id} with {len(transactions)} transactions")
             return True
@@ -83,6 +96,26 @@ class AnomalyDetector:
             logger.error(f"Model training error: {e}")
             return False
     
+    def install_model(self, model_key: str, model, scaler, version: Optional[int] = None, metadata: Optional[Dict] = None) -> int:
+        """
+        Hot-swap a trained model into the registry
+        
+        Model and scaler are stored and cached as one entry, so concurrent
+        scoring sees either the old pair or the new pair.
+        
+        Returns: Installed version
+        """
+        version = self.registry.save(model_key, model, scaler, version=version, metadata=metadata)
+        logger.info(f"Installed anomaly model {model_key} v{version}")
+        return version
+    
+    def get_model(self, model_key: str):
+        """Return (model, scaler) for a user, loading lazily from the registry, or None"""
+        entry = self.registry.get(model_key)
+        if entry is None:
+            return None
+        return entry["model"], entry["scaler"]
+    
     def detect_anomaly(
         self,
         user_id: int,
@@ -100,8 +133,7 @@ class AnomalyDetector:
             model_key = f"{user_type}_{user_id}"
             
             # Load model if not in memory
-            if model_key not in self.models:
-                self._load_model(model_key)
+            model_pair = self.get_model(model_key)
             
             # Extract features for single transaction
             features = self._extract_single_transaction_features(transaction)
@@ -115,15 +147,13 @@ class AnomalyDetector:
             reasons = []
             
             # 1. Isolation Forest Detection (if model exists)
-            if model_key in self.models:
-                model = self.models[model_key]
-                scaler = self.scalers[model_key]
+            if model_pair:
+                model, scaler = model_pair
                 
                 features_scaled = scaler.transform(features)
-                prediction = model.predict(features_scaled)[0]
                 if_score = model.score_samples(features_scaled)[0]
                 
-                if prediction == -1:  # Anomaly detected
+                if if_score < model.offset_:  # Same test as predict() == -1
                     reasons.append("Isolation Forest flagged as outlier")
                     anomaly_score = max(anomaly_score, 0.7)
                     is_anomaly = True
@@ -159,18 +189,16 @@ class AnomalyDetector:
                 anomaly_score = max(anomaly_score, 0.5)
                 is_anomaly = True
             
-            # 4. Check for duplicate invoice numbers
-            if transaction.invoice_no:
-                duplicate = db.query(Transaction).filter(
-                    Transaction.invoice_no == transaction.invoice_no,
-                    Transaction.id != transaction.id,
-                    Transaction.user_consumer_id == user_id if user_type == "consumer" else Transaction.user_business_id == user_id
-                ).first()
-                
-                if duplicate:
-                    reasons.append("Duplicate invoice number detected")
-                    anomaly_score = max(anomaly_score, 0.8)
-                    is_anomaly = True
+            # 4. Check for duplicate invoices and near-duplicates
+            exact, near = duplicate_detector.check(db, user_id, user_type, self._transactions_to_frame([transaction]))
+            if exact[0]:
+                reasons.append("Duplicate invoice number detected")
+                anomaly_score = max(anomaly_score, 0.8)
+                is_anomaly = True
+            elif near[0]:
+                reasons.append(f"Possible duplicate: same amount at same merchant within {settings.NEAR_DUPLICATE_WINDOW_HOURS}h")
+                anomaly_score = max(anomaly_score, 0.6)
+                is_anomaly = True
             
             # Combine reasons
             reason = "; ".join(reasons) if reasons else "No anomalies detected"
@@ -182,25 +210,59 @@ class AnomalyDetector:
             logger.error(f"Anomaly detection error: {e}")
             return False, 0.0, f"Detection error: {str(e)}"
     
+    def load_feature_frame(
+        self,
+        db: Session,
+        user_id: int,
+        user_type: str,
+        transaction_ids: Optional[List[int]] = None,
+        since: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Pull only the columns needed for scoring into a DataFrame
+        
+        Returns: One row per transaction with FRAME_COLUMNS
+        """
+        if user_type == "consumer":
+            owner_filter = Transaction.user_consumer_id == user_id
+        else:
+            owner_filter = Transaction.user_business_id == user_id
+        
+        query = db.query(*[getattr(Transaction, column) for column in FRAME_COLUMNS]).filter(owner_filter)
+        if transaction_ids is not None:
+            query = query.filter(Transaction.id.in_(transaction_ids))
+        if since is not None:
+            query = query.filter(Transaction.date >= since)
+        
+        return pd.DataFrame(query.all(), columns=FRAME_COLUMNS)
+    
+    def _transactions_to_frame(self, transactions: List[Transaction]) -> pd.DataFrame:
+        """Columnar view of already-loaded ORM transactions"""
+        return pd.DataFrame(
+            [[getattr(tx, column) for column in FRAME_COLUMNS] for tx in transactions],
+            columns=FRAME_COLUMNS
+        )
+    
+    def _frame_features(self, df: pd.DataFrame) -> np.ndarray:
+        """Vectorized feature matrix (columns follow FEATURE_NAMES)"""
+        dates = pd.to_datetime(df["date"])
+        channels = df["payment_channel"].map(lambda channel: getattr(channel, "value", channel))
+        
+        return np.column_stack([
+            df["amount"].to_numpy(dtype=np.float64),
+            dates.dt.hour.to_numpy(dtype=np.float64),
+            dates.dt.weekday.to_numpy(dtype=np.float64),
+            dates.dt.day.to_numpy(dtype=np.float64),
+            (channels == PaymentChannel.UPI.value).to_numpy(dtype=np.float64),
+            (channels == PaymentChannel.CARD.value).to_numpy(dtype=np.float64),
+            (channels == PaymentChannel.CASH.value).to_numpy(dtype=np.float64),
+            df["ocr_confidence"].fillna(0.0).to_numpy(dtype=np.float64),
+        ])
+    
     def _extract_features(self, transactions: List[Transaction]) -> np.ndarray:
         """Extract feature matrix from transactions"""
         try:
-            features = []
-            
-            for tx in transactions:
-                feature_vector = [
-                    tx.amount,
-                    tx.date.hour,
-                    tx.date.weekday(),
-                    tx.date.day,
-                    1 if tx.payment_channel.value == "UPI" else 0,
-                    1 if tx.payment_channel.value == "Card" else 0,
-                    1 if tx.payment_channel.value == "Cash" else 0,
-                    tx.ocr_confidence,
-                ]
-                features.append(feature_vector)
-            
-            return np.array(features)
+            return self._frame_features(self._transactions_to_frame(transactions))
         
         except Exception as e:
             logger.error(f"Feature extraction error: {e}")
@@ -208,60 +270,102 @@ class AnomalyDetector:
     
     def _extract_single_transaction_features(self, transaction: Transaction) -> np.ndarray:
         """Extract features for a single transaction"""
-        try:
-            feature_vector = [
-                transaction.amount,
-                transaction.date.hour,
-                transaction.date.weekday(),
-                transaction.date.day,
-                1 if transaction.payment_channel.value == "UPI" else 0,
-                1 if transaction.payment_channel.value == "Card" else 0,
-                1 if transaction.payment_channel.value == "Cash" else 0,
-                transaction.ocr_confidence,
-            ]
-            
-            return np.array([feature_vector])
-        
-        except Exception as e:
-            logger.error(f"Single feature extraction error: {e}")
-            return None
+        return self._extract_features([transaction])
     
-    def _save_model(self, model_key: str, model, scaler):
-        """Save model and scaler to disk"""
-        try:
-            model_path = os.path.join(self.model_dir, f"{model_key}_model.pkl")
-            scaler_path = os.path.join(self.model_dir, f"{model_key}_scaler.pkl")
-            
-            with open(model_path, 'wb') as f:
-                pickle.dump(model, f)
-            
-            with open(scaler_path, 'wb') as f:
-                pickle.dump(scaler, f)
-            
-            logger.info(f"Saved model: {model_key}")
+    def detect_anomalies_batch(
+        self,
+        user_id: int,
+        user_type: str,
+        db: Session,
+        transactions: Optional[List[Transaction]] = None,
+        frame: Optional[pd.DataFrame] = None
+    ) -> List[Dict]:
+        """
+        Score many transactions for one user with a single model call
         
-        except Exception as e:
-            logger.error(f"Model save error: {e}")
-    
-    def _load_model(self, model_key: str):
-        """Load model and scaler from disk"""
-        try:
-            model_path = os.path.join(self.model_dir, f"{model_key}_model.pkl")
-            scaler_path = os.path.join(self.model_dir, f"{model_key}_scaler.pkl")
-            
-            if os.path.exists(model_path) and os.path.exists(scaler_path):
-                with open(model_path, 'rb') as f:
-                    self.models[model_key] = pickle.load(f)
-                
-                with open(scaler_path, 'rb') as f:
-                    self.scalers[model_key] = pickle.load(f)
-                
-                logger.info(f"Loaded model: {model_key}")
+        Args:
+            transactions: ORM transactions to score, or
+            frame: A load_feature_frame result; when neither is given the
+                user's whole account is loaded column-wise from the database
+        
+        Returns: [{"transaction_id", "is_anomaly", "anomaly_score", "reason",
+                   "isolation_forest_score", "isolation_forest_outlier", "z_score"}]
+        """
+        if frame is None:
+            if transactions is not None:
+                frame = self._transactions_to_frame(transactions)
             else:
-                logger.warning(f"Model not found: {model_key}")
+                frame = self.load_feature_frame(db, user_id, user_type)
         
-        except Exception as e:
-            logger.error(f"Model load error: {e}")
+        if frame.empty:
+            return []
+        
+        model_pair = self.get_model(f"{user_type}_{user_id}")
+        
+        n = len(frame)
+        scores = np.zeros(n)
+        reasons = [[] for _ in range(n)]
+        if_scores = np.full(n, np.nan)
+        if_outliers = np.zeros(n, dtype=bool)
+        
+        def flag(mask: np.ndarray, score: float, reason):
+            for i in np.flatnonzero(mask):
+                reasons[i].append(reason(i) if callable(reason) else reason)
+            scores[mask] = np.maximum(scores[mask], score)
+        
+        # 1. Isolation Forest: one score_samples call for the whole batch
+        #    (predict() is score_samples < offset_, so no second pass is needed)
+        if model_pair:
+            model, scaler = model_pair
+            features_scaled = scaler.transform(self._frame_features(frame))
+            if_scores = model.score_samples(features_scaled)
+            if_outliers = if_scores < model.offset_
+            flag(if_outliers, 0.7, "Isolation Forest flagged as outlier")
+        
+        # 2. Statistical sigma rule against each row's category pattern
+        amounts = frame["amount"].to_numpy(dtype=np.float64)
+        means = np.zeros(n)
+        stds = np.zeros(n)
+        for category, pattern in self._user_patterns(db, user_id, user_type).items():
+            if pattern.avg_monthly_spend and pattern.avg_monthly_spend > 0:
+                mask = (frame["category"] == category).to_numpy()
+                means[mask] = pattern.avg_monthly_spend
+                stds[mask] = pattern.std_monthly_spend or 0.0
+        
+        z_scores = np.divide(amounts - means, stds, out=np.zeros(n), where=stds > 0)
+        flag(z_scores > settings.SIGMA_THRESHOLD, 0.6,
+             lambda i: f"Amount exceeds {settings.SIGMA_THRESHOLD}σ threshold (z-score: {z_scores[i]:.2f})")
+        flag(z_scores > settings.HIGH_CONFIDENCE_SIGMA, 0.9,
+             lambda i: f"Amount significantly exceeds normal (z-score: {z_scores[i]:.2f})")
+        
+        # 3. Unusual hours (2-5 AM)
+        hours = pd.to_datetime(frame["date"]).dt.hour.to_numpy()
+        flag((hours >= 2) & (hours <= 5), 0.5, "Transaction at unusual hour (2-5 AM)")
+        
+        # 4. Duplicate invoices and near-duplicates, within the batch and against stored rows
+        exact, near = duplicate_detector.check(db, user_id, user_type, frame)
+        flag(exact, 0.8, "Duplicate invoice number detected")
+        flag(near, 0.6, f"Possible duplicate: same amount at same merchant within {settings.NEAR_DUPLICATE_WINDOW_HOURS}h")
+        
+        return [
+            {
+                "transaction_id": int(transaction_id),
+                "is_anomaly": bool(reasons[i]),
+                "anomaly_score": float(scores[i]),
+                "reason": "; ".join(reasons[i]) if reasons[i] else "No anomalies detected",
+                "isolation_forest_score": None if np.isnan(if_scores[i]) else float(if_scores[i]),
+                "isolation_forest_outlier": bool(if_outliers[i]),
+                "z_score": float(z_scores[i])
+            }
+            for i, transaction_id in enumerate(frame["id"].to_numpy())
+        ]
+    
+    def _user_patterns(self, db: Session, user_id: int, user_type: str) -> Dict[str, Pattern]:
+        if user_type == "consumer":
+            patterns = db.query(Pattern).filter(Pattern.user_consumer_id == user_id).all()
+        else:
+            patterns = db.query(Pattern).filter(Pattern.user_business_id == user_id).all()
+        return {pattern.category_id: pattern for pattern in patterns}
     
     def update_patterns(
         self,
@@ -270,64 +374,14 @@ class AnomalyDetector:
         user_type: str,
         category: str
     ):
-        """Update spending patterns for a user-category combination"""
+        """
+        Rebuild spending patterns for a user-category combination
+        
+        New transactions update patterns incrementally via pattern_engine.observe;
+        this full rebuild is kept for backfills and repairs.
+        """
         try:
-            # Get transactions for this user and category (last 90 days)
-            cutoff_date = datetime.utcnow() - timedelta(days=90)
-            
-            if user_type == "consumer":
-                transactions = db.query(Transaction).filter(
-                    Transaction.user_consumer_id == user_id,
-                    Transaction.category == category,
-                    Transaction.date >= cutoff_date,
-                    Transaction.confirmed != False  # Exclude rejected transactions
-                ).all()
-            else:
-                transactions = db.query(Transaction).filter(
-                    Transaction.user_business_id == user_id,
-                    Transaction.category == category,
-                    Transaction.date >= cutoff_date,
-                    Transaction.confirmed != False
-                ).all()
-            
-            if not transactions:
-                return
-            
-            # Calculate statistics
-            amounts = [tx.amount for tx in transactions]
-            avg_monthly = np.mean(amounts)
-            std_monthly = np.std(amounts)
-            
-            # Get or create pattern
-            if user_type == "consumer":
-                pattern = db.query(Pattern).filter(
-                    Pattern.user_consumer_id == user_id,
-                    Pattern.category_id == category
-                ).first()
-            else:
-                pattern = db.query(Pattern).filter(
-                    Pattern.user_business_id == user_id,
-                    Pattern.category_id == category
-                ).first()
-            
-            if not pattern:
-                pattern = Pattern(
-                    user_consumer_id=user_id if user_type == "consumer" else None,
-                    user_business_id=user_id if user_type == "business" else None,
-                    category_id=category
-                )
-                db.add(pattern)
-            
-            # Update pattern
-            pattern.avg_monthly_spend = avg_monthly
-            pattern.std_monthly_spend = std_monthly
-            pattern.avg_weekly_spend = avg_monthly / 4.33  # Approximate
-            pattern.std_weekly_spend = std_monthly / 4.33
-            pattern.sample_count = len(transactions)
-            pattern.upper_threshold_3sigma = avg_monthly + (3 * std_monthly)
-            pattern.upper_threshold_6sigma = avg_monthly + (6 * std_monthly)
-            pattern.last_update = datetime.utcnow()
-            
+            pattern_engine.rebuild(db, user_id, user_type, category=category)
             db.commit()
             logger.info(f"Updated pattern for user {user_id}, category {category}")
         
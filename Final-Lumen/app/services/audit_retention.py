@@ -0,0 +1,399 @@
+"""
+Audit Partitioning and Retention
+Monthly partition upkeep for audit_records and offload of expired months to
+Parquet archives that keep the hash chain verifiable
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional
+import logging
+
+from sqlalchemy import DateTime, Float, Integer, delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AuditSessionLocal
+from app.models.audit import AuditArchive, AuditRecord
+from app.services.audit_verifier import audit_verifier, sign_archive
+from app.services.audit_writer import chain_hash
+
+logger = logging.getLogger(__name__)
+
+_FETCH_SIZE = 10000
+
+_ARCHIVE_COLUMNS = [column.key for column in AuditRecord.__table__.columns]
+_JSON_COLUMNS = {"reason", "related_context", "audit_metadata"}
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"audit_records_y{month.year}m{month.month:02d}"
+
+
+DEFAULT_PARTITION = "audit_records_default"
+
+
+def create_month_partition(connection, month: date):
+    """CREATE the month's partition of audit_records if it does not exist (PostgreSQL)"""
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF audit_records "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+
+def _arrow_type(pa, column):
+    """Parquet column type for an audit_records column (JSON and enums are stored as strings)"""
+    if column.key in _JSON_COLUMNS:
+        return pa.string()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_partitioned(connection) -> bool:
+    """Whether audit_records is a partitioned table (PostgreSQL after audit migration 0001)"""
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'audit_records'::regclass"
+    )).scalar())
+
+
+class RetentionBlocked(Exception):
+    """A month cannot be offloaded yet (e.g. not covered by a verified checkpoint)"""
+
+
+class AuditRetention:
+    """
+    Keeps AUDIT_RETENTION_MONTHS of audit records in the database
+
+    On PostgreSQL the server re-checks partitions every
+    AUDIT_PARTITION_CHECK_INTERVAL_SECONDS (see start). Each month's
+    partition is created in its own transaction; records that already
+    landed in the default partition are moved into it (detach default,
+    create, move, reattach).
+
+    Older months are offloaded oldest first. For each month, the records
+    after the previous archive up to the month's last id (including the
+    rare later-month record that was chained before it) are:
+      1. required to be covered by a valid verifier checkpoint,
+      2. streamed to a Parquet file while their links and hashes are
+         re-checked against the previous archive (records up to the
+         legacy anchor are taken as they are),
+      3. recorded as a signed AuditArchive row (id range, first and last
+         hashes, chain length, file SHA-256),
+      4. removed - the month's partition is detached and dropped on
+         PostgreSQL, rows are deleted elsewhere.
+    The verifier then resumes the chain after the newest archive, so
+    retention never breaks verification.
+    """
+
+    def __init__(self, session_factory=AuditSessionLocal):
+        self._session_factory = session_factory
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Ensure partitions now and then periodically in a background thread (idempotent)"""
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop.clear()
+                self._worker = threading.Thread(target=self._run, name="audit-partitions", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._worker is not None and self._worker.is_alive():
+            self._worker.join(timeout=timeout)
+
+    def _run(self):
+        while True:
+            try:
+                self.ensure_partitions()
+            except Exception as e:
+                logger.error(f"Could not create audit partitions: {e}")
+            if self._stop.wait(settings.AUDIT_PARTITION_CHECK_INTERVAL_SECONDS):
+                return
+
+    def ensure_partitions(self, months_ahead: Optional[int] = None) -> List[str]:
+        """
+        Create partitions for this month, the next months_ahead and any month
+        with records in the default partition (no-op unless partitioned)
+
+        Returns the partitions that exist afterwards; a month that fails is
+        logged and does not affect the others.
+        """
+        months_ahead = settings.AUDIT_PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+        db = self._session_factory()
+        try:
+            connection = db.connection()
+            if not is_partitioned(connection):
+                return []
+            current = month_start(datetime.utcnow())
+            months = {add_months(current, offset) for offset in range(months_ahead + 1)}
+            months.update(
+                month_start(value) for value in connection.execute(text(
+                    f"SELECT DISTINCT date_trunc('month', \"timestamp\") FROM {DEFAULT_PARTITION}"
+                )).scalars()
+            )
+            db.rollback()
+        finally:
+            db.close()
+
+        ensured = []
+        for month in sorted(months):
+            db = self._session_factory()
+            try:
+                self._ensure_month_partition(db.connection(), month)
+                db.commit()
+                ensured.append(partition_name(month))
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Could not create audit partition {partition_name(month)}: {e}")
+            finally:
+                db.close()
+        return ensured
+
+    @staticmethod
+    def _ensure_month_partition(connection, month: date):
+        """Create one month's partition, moving its records out of the default partition"""
+        name = partition_name(month)
+        if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+            return
+
+        bounds = {"start": month, "end": add_months(month, 1)}
+        in_month = '"timestamp" >= :start AND "timestamp" < :end'
+        stranded = connection.execute(
+            text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month} LIMIT 1"), bounds
+        ).scalar()
+        if not stranded:
+            create_month_partition(connection, month)
+            return
+
+        # A new partition may not overlap rows in the default partition
+        connection.execute(text(f"ALTER TABLE audit_records DETACH PARTITION {DEFAULT_PARTITION}"))
+        create_month_partition(connection, month)
+        moved = connection.execute(
+            text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}"), bounds
+        ).rowcount
+        connection.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"), bounds)
+        connection.execute(text(f"ALTER TABLE audit_records ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        logger.warning(f"Moved {moved} audit records from {DEFAULT_PARTITION} into {name}")
+
+    def expired_months(self, db: Session) -> List[date]:
+        """Months with records older than the retention window, oldest first"""
+        cutoff = add_months(month_start(datetime.utcnow()), -settings.AUDIT_RETENTION_MONTHS)
+        oldest = db.execute(select(func.min(AuditRecord.timestamp))).scalar()
+        if oldest is None:
+            return []
+        months = []
+        month = month_start(oldest)
+        while month < cutoff:
+            months.append(month)
+            month = add_months(month, 1)
+        return months
+
+    def apply(self, dry_run: bool = False) -> List[Dict]:
+        """Offload every expired month in order; stops at the first month that is blocked"""
+        db = self._session_factory()
+        try:
+            months = self.expired_months(db)
+        finally:
+            db.close()
+
+        results = []
+        for month in months:
+            if dry_run:
+                results.append({"month": month.isoformat(), "status": "would_offload"})
+                continue
+            try:
+                results.append(self.offload_month(month))
+            except RetentionBlocked as e:
+                logger.warning(f"Audit retention stopped at {month:%Y-%m}: {e}")
+                results.append({"month": month.isoformat(), "status": "blocked", "reason": str(e)})
+                break
+        return results
+
+    def offload_month(self, month: date) -> Dict:
+        """Archive and remove one month of audit records (see class docstring)"""
+        db = self._session_factory()
+        path = None
+        try:
+            connection = db.connection()
+            anchor = audit_verifier.archive_anchor(db)
+            if anchor is not None and month <= anchor.month:
+                raise RetentionBlocked(f"{month:%Y-%m} is not after the last archived month {anchor.month:%Y-%m}")
+            after_id = anchor.last_record_id if anchor else 0
+            month_end = add_months(month, 1)
+
+            last_id = db.execute(select(func.max(AuditRecord.id)).where(
+                AuditRecord.timestamp >= month, AuditRecord.timestamp < month_end, AuditRecord.id > after_id
+            )).scalar()
+            if last_id is None:
+                self._drop_month(connection, month, after_id, after_id)
+                db.commit()
+                return {"month": month.isoformat(), "status": "empty", "records": 0}
+
+            checkpoint = audit_verifier.latest_valid_checkpoint(db, archive=anchor)
+            if checkpoint is None or checkpoint.record_id < last_id:
+                raise RetentionBlocked(
+                    f"records up to {last_id} are not covered by a verified checkpoint; run verify_audit_chain.py"
+                )
+
+            # Records up to an operator-approved legacy anchor are archived as they are
+            legacy = audit_verifier.legacy_anchor(db, archive=anchor)
+            accepted_through = legacy.record_id if legacy else 0
+
+            os.makedirs(settings.AUDIT_ARCHIVE_DIR, exist_ok=True)
+            path = os.path.join(settings.AUDIT_ARCHIVE_DIR, f"{partition_name(month)}.parquet")
+            summary = self._write_parquet(
+                db, path, after_id, last_id, anchor.last_hash if anchor else None, accepted_through
+            )
+
+            archive = AuditArchive(
+                month=month,
+                first_record_id=summary["first_id"],
+                last_record_id=last_id,
+                record_count=summary["count"],
+                first_previous_hash=summary["first_previous_hash"],
+                last_hash=summary["last_hash"],
+                chain_count=(anchor.chain_count if anchor else 0) + summary["count"],
+                path=path,
+                file_sha256=summary["sha256"]
+            )
+            archive.signature = sign_archive(archive)
+            db.add(archive)
+            self._drop_month(connection, month, after_id, last_id)
+            db.commit()
+
+            logger.info(f"Archived {summary['count']} audit records for {month:%Y-%m} to {path}")
+            return {"month": month.isoformat(), "status": "archived", "records": summary["count"],
+                    "last_record_id": last_id, "path": path}
+
+        except Exception:
+            db.rollback()
+            if path and os.path.exists(path) and not db.query(AuditArchive).filter(AuditArchive.path == path).first():
+                os.remove(path)
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _write_parquet(
+        db: Session, path: str, after_id: int, last_id: int, previous_hash: Optional[str], accepted_through: int = 0
+    ) -> Dict:
+        """Stream records after_id < id <= last_id to Parquet, re-checking the chain after accepted_through"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RetentionBlocked("pyarrow is required for audit archives (pip install pyarrow)")
+
+        schema = pa.schema([(column.key, _arrow_type(pa, column)) for column in AuditRecord.__table__.columns])
+        query = select(*AuditRecord.__table__.columns).where(
+            AuditRecord.id > after_id, AuditRecord.id <= last_id
+        ).order_by(AuditRecord.id)
+
+        summary = {"count": 0, "first_id": None, "first_previous_hash": None, "last_hash": None}
+        writer = None
+        try:
+            result = db.connection().execution_options(stream_results=True, yield_per=_FETCH_SIZE).execute(query)
+            for rows in result.mappings().partitions():
+                batch = {name: [] for name in _ARCHIVE_COLUMNS}
+                for row in rows:
+                    if row["id"] <= accepted_through:
+                        previous_hash = row["previous_record_hash"]
+                    if row["previous_record_hash"] != previous_hash:
+                        raise RetentionBlocked(f"broken link at audit record {row['id']}")
+                    if row["id"] > accepted_through and chain_hash(row, previous_hash) != row["record_hash"]:
+                        raise RetentionBlocked(f"hash mismatch at audit record {row['id']}")
+                    if summary["count"] == 0:
+                        summary["first_id"] = row["id"]
+                        summary["first_previous_hash"] = previous_hash
+                    previous_hash = row["record_hash"]
+                    summary["count"] += 1
+                    for name in _ARCHIVE_COLUMNS:
+                        value = row[name]
+                        if name in _JSON_COLUMNS:
+                            value = json.dumps(value, default=str)
+                        elif name in ("actor", "action"):
+                            value = value.value
+                        batch[name].append(value)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, schema, compression=settings.AUDIT_ARCHIVE_COMPRESSION)
+                writer.write_table(pa.table(batch, schema=schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+        summary["last_hash"] = previous_hash
+        summary["sha256"] = _file_sha256(path)
+        return summary
+
+    @staticmethod
+    def _drop_month(connection, month: date, after_id: int, last_id: int):
+        """Remove archived records: drop the month's partition, delete the rest by id"""
+        if is_partitioned(connection):
+            name = partition_name(month)
+            exists = connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+            # Records chained into the archive but timestamped in a later month
+            connection.execute(delete(AuditRecord).where(
+                AuditRecord.id > after_id, AuditRecord.id <= last_id, AuditRecord.timestamp >= add_months(month, 1)
+            ))
+            if exists:
+                connection.execute(text(f"ALTER TABLE audit_records DETACH PARTITION {name}"))
+                connection.execute(text(f"DROP TABLE {name}"))
+                return
+        connection.execute(delete(AuditRecord).where(AuditRecord.id > after_id, AuditRecord.id <= last_id))
+
+    def verify_archives(self) -> List[Dict]:
+        """Check each archive's signature, file hash and link to the previous archive"""
+        db = self._session_factory()
+        try:
+            archives = db.query(AuditArchive).order_by(AuditArchive.last_record_id).all()
+        finally:
+            db.close()
+
+        problems = []
+        previous_hash = None
+        for archive in archives:
+            month = archive.month.isoformat()
+            if sign_archive(archive) != archive.signature:
+                problems.append({"month": month, "error": "signature_mismatch"})
+            if archive.first_previous_hash != previous_hash:
+                problems.append({"month": month, "error": "broken_link"})
+            if not os.path.exists(archive.path):
+                problems.append({"month": month, "error": "file_missing"})
+            elif _file_sha256(archive.path) != archive.file_sha256:
+                problems.append({"month": month, "error": "file_hash_mismatch"})
+            previous_hash = archive.last_hash
+        return problems
+
+
+# Global instance
+audit_retention = AuditRetention()
@@ -0,0 +1,337 @@
+"""
+Audit Chain Verifier
+Re-checks the audit hash chain in parallel segments and records signed
+checkpoints, so later runs only verify records added since
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import logging
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.database import AuditSessionLocal
+from app.models.audit import AuditArchive, AuditCheckpoint, AuditRecord
+from app.services.audit_writer import chain_hash
+
+logger = logging.getLogger(__name__)
+
+MAX_ERRORS = 100  # Errors reported per segment and per run
+
+_CHAINED_COLUMNS = (
+    AuditRecord.id, AuditRecord.user_id, AuditRecord.user_type, AuditRecord.transaction_id,
+    AuditRecord.actor, AuditRecord.action, AuditRecord.outcome, AuditRecord.confidence,
+    AuditRecord.timestamp, AuditRecord.previous_record_hash, AuditRecord.record_hash
+)
+
+_FETCH_SIZE = 5000
+
+# Per-process engine for verify_segment (worker processes build their own)
+_segment_engines: Dict[str, object] = {}
+
+
+def sign_fields(*fields) -> str:
+    """HMAC-SHA256 over checkpoint or archive fields"""
+    key = (settings.AUDIT_CHECKPOINT_KEY or settings.SECRET_KEY).encode()
+    message = ":".join(str(field) for field in fields).encode()
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def sign_checkpoint(record_id: int, record_hash: str, record_count: int) -> str:
+    """HMAC-SHA256 over a checkpoint's fields"""
+    return sign_fields(record_id, record_hash, record_count)
+
+
+def sign_legacy_anchor(record_id: int, record_hash: str, record_count: int, approved_by: str) -> str:
+    """HMAC-SHA256 over a legacy anchor's fields (distinct from an ordinary checkpoint's)"""
+    return sign_fields("legacy", record_id, record_hash, record_count, approved_by)
+
+
+def checkpoint_signature(checkpoint: AuditCheckpoint) -> str:
+    """Expected signature of a checkpoint or legacy anchor"""
+    if checkpoint.legacy:
+        return sign_legacy_anchor(
+            checkpoint.record_id, checkpoint.record_hash, checkpoint.record_count, checkpoint.approved_by
+        )
+    return sign_checkpoint(checkpoint.record_id, checkpoint.record_hash, checkpoint.record_count)
+
+
+def sign_archive(archive: AuditArchive) -> str:
+    """HMAC-SHA256 over an archive's chain fields and file hash"""
+    return sign_fields(
+        archive.month.isoformat(), archive.first_record_id, archive.last_record_id, archive.record_count,
+        archive.first_previous_hash, archive.last_hash, archive.chain_count, archive.file_sha256
+    )
+
+
+def verify_segment(url: str, first_id: int, last_id: int) -> Dict:
+    """
+    Verify records with first_id <= id <= last_id (runs in a worker process)
+
+    Streams the segment through a server-side cursor, recomputes each
+    record_hash and checks each link inside the segment. The first record's
+    link is returned for the caller to check against the previous segment.
+    """
+    segment_engine = _segment_engines.get(url)
+    if segment_engine is None:
+        segment_engine = _segment_engines[url] = create_engine(url)
+
+    result = {"count": 0, "first_id": None, "first_previous_hash": None,
+              "last_id": None, "last_hash": None, "errors": []}
+    query = select(*_CHAINED_COLUMNS).where(
+        AuditRecord.id >= first_id, AuditRecord.id <= last_id
+    ).order_by(AuditRecord.id)
+
+    with segment_engine.connect() as connection:
+        rows = connection.execution_options(stream_results=True, yield_per=_FETCH_SIZE).execute(query)
+        for row in rows.mappings():
+            if result["count"] == 0:
+                result["first_id"] = row["id"]
+                result["first_previous_hash"] = row["previous_record_hash"]
+            elif row["previous_record_hash"] != result["last_hash"]:
+                _error(result, row["id"], "broken_link")
+            if chain_hash(row, row["previous_record_hash"]) != row["record_hash"]:
+                _error(result, row["id"], "hash_mismatch")
+            result["count"] += 1
+            result["last_id"] = row["id"]
+            result["last_hash"] = row["record_hash"]
+    return result
+
+
+def _error(result: Dict, record_id: int, kind: str):
+    if len(result["errors"]) < MAX_ERRORS:
+        result["errors"].append({"record_id": record_id, "error": kind})
+
+
+class AuditChainVerifier:
+    """
+    Verifies previous_record_hash / record_hash across the audit table
+
+    The id range after the newest valid checkpoint (or the whole table) is
+    cut into segments of AUDIT_CHECKPOINT_INTERVAL ids, verified in
+    parallel by AUDIT_VERIFY_WORKERS processes, and stitched together by
+    checking each segment's first link against the previous segment's last
+    hash. Every complete segment of an unbroken chain gets a checkpoint: its
+    last record id, hash and running count, signed with HMAC-SHA256. A
+    checkpoint is trusted only if its signature matches and its record
+    still has the signed hash; otherwise the run starts from the previous
+    valid checkpoint.
+
+    Records offloaded by audit retention are no longer in the table: runs
+    (including full ones) start after the newest archive whose signature
+    matches, and checkpoints at or before it are not used.
+
+    Records written before hashed timestamps were stored report
+    hash_mismatch, so no checkpoint could ever follow them. An operator
+    accepts them once with anchor_legacy (verify_audit_chain.py
+    --anchor-legacy): a signed legacy anchor at the last such record, after
+    which all runs, including full ones, start.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or settings.DATABASE_AUDIT_URL
+        self._session_factory = AuditSessionLocal if url is None else sessionmaker(bind=create_engine(url))
+        self._lock = threading.Lock()
+
+    def verify(self, full: bool = False, workers: Optional[int] = None, write_checkpoints: bool = True) -> Dict:
+        """
+        Verify the chain from the newest valid checkpoint (or with full=True from the
+        legacy anchor, else the oldest retained record)
+
+        Raises RuntimeError if a verification is already running in this process.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Audit chain verification already running")
+        try:
+            return self._verify(full, workers or settings.AUDIT_VERIFY_WORKERS or os.cpu_count() or 1, write_checkpoints)
+        finally:
+            self._lock.release()
+
+    def _verify(self, full: bool, workers: int, write_checkpoints: bool) -> Dict:
+        started = time.monotonic()
+        db = self._session_factory()
+        try:
+            errors: List[Dict] = []
+            archive = self.archive_anchor(db, errors)
+            if full:
+                checkpoint = self.legacy_anchor(db, errors, archive)
+            else:
+                checkpoint = self.latest_valid_checkpoint(db, errors, archive)
+            if checkpoint:
+                start_id, previous_hash, verified_before = checkpoint.record_id, checkpoint.record_hash, checkpoint.record_count
+            elif archive:
+                start_id, previous_hash, verified_before = archive.last_record_id, archive.last_hash, archive.chain_count
+            else:
+                start_id, previous_hash, verified_before = 0, None, 0
+            max_id = db.execute(select(func.max(AuditRecord.id))).scalar() or 0
+
+            interval = settings.AUDIT_CHECKPOINT_INTERVAL
+            segments = [(lo, lo + interval - 1) for lo in range(start_id + 1, max_id + 1, interval)]
+            results = self._run_segments(segments, workers)
+
+            count = verified_before
+            new_checkpoints = []
+            for (lo, hi), result in zip(segments, results):
+                if result["count"]:
+                    if result["first_previous_hash"] != previous_hash:
+                        errors.append({"record_id": result["first_id"], "error": "broken_link"})
+                    errors.extend(result["errors"])
+                    previous_hash = result["last_hash"]
+                    count += result["count"]
+                # Checkpoint complete segments while everything up to them is valid
+                if not errors and hi <= max_id and result["count"]:
+                    new_checkpoints.append(AuditCheckpoint(
+                        record_id=result["last_id"],
+                        record_hash=result["last_hash"],
+                        record_count=count,
+                        signature=sign_checkpoint(result["last_id"], result["last_hash"], count)
+                    ))
+
+            if write_checkpoints and new_checkpoints:
+                # A full run passes records that already have checkpoints
+                existing = set(db.execute(select(AuditCheckpoint.record_id).where(
+                    AuditCheckpoint.record_id.in_([c.record_id for c in new_checkpoints])
+                )).scalars())
+                new_checkpoints = [c for c in new_checkpoints if c.record_id not in existing]
+                db.add_all(new_checkpoints)
+                db.commit()
+
+            if errors:
+                logger.error(f"Audit chain verification found {len(errors)} errors (first at record {errors[0]['record_id']})")
+
+            return {
+                "valid": not errors,
+                "from_checkpoint": checkpoint.record_id if checkpoint else None,
+                "from_legacy_anchor": bool(checkpoint and checkpoint.legacy),
+                "from_archive": archive.last_record_id if archive and not checkpoint else None,
+                "records_verified": count - verified_before,
+                "records_total": count,
+                "last_record_id": max_id,
+                "segments": len(segments),
+                "workers": min(workers, max(len(segments), 1)),
+                "checkpoints_written": len(new_checkpoints) if write_checkpoints else 0,
+                "errors": errors[:MAX_ERRORS],
+                "seconds": round(time.monotonic() - started, 3)
+            }
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def archive_anchor(self, db: Session, errors: Optional[List[Dict]] = None) -> Optional[AuditArchive]:
+        """Newest archive with a valid signature (the retained chain continues after it)"""
+        for archive in db.query(AuditArchive).order_by(AuditArchive.last_record_id.desc()).all():
+            if hmac.compare_digest(sign_archive(archive), archive.signature):
+                return archive
+            if errors is not None:
+                errors.append({"record_id": archive.last_record_id, "error": "archive_mismatch"})
+        return None
+
+    def latest_valid_checkpoint(
+        self, db: Session, errors: Optional[List[Dict]] = None, archive: Optional[AuditArchive] = None
+    ) -> Optional[AuditCheckpoint]:
+        """Newest checkpoint (or legacy anchor) after the archive anchor whose signature and record hash still match"""
+        query = db.query(AuditCheckpoint).order_by(AuditCheckpoint.record_id.desc())
+        if archive is not None:
+            query = query.filter(AuditCheckpoint.record_id > archive.last_record_id)
+        for checkpoint in query.all():
+            if self._checkpoint_valid(db, checkpoint):
+                return checkpoint
+            if errors is not None:
+                errors.append({"record_id": checkpoint.record_id, "error": "checkpoint_mismatch"})
+        return None
+
+    def legacy_anchor(
+        self, db: Session, errors: Optional[List[Dict]] = None, archive: Optional[AuditArchive] = None
+    ) -> Optional[AuditCheckpoint]:
+        """The legacy anchor after the archive anchor, if it is still valid"""
+        query = db.query(AuditCheckpoint).filter(AuditCheckpoint.legacy.is_(True))
+        if archive is not None:
+            query = query.filter(AuditCheckpoint.record_id > archive.last_record_id)
+        anchor = query.first()
+        if anchor is None or self._checkpoint_valid(db, anchor):
+            return anchor
+        if errors is not None:
+            errors.append({"record_id": anchor.record_id, "error": "legacy_anchor_mismatch"})
+        return None
+
+    def anchor_legacy(self, record_id: int, approved_by: str) -> Dict:
+        """
+        Accept the retained records up to record_id as they are, with a signed legacy anchor
+
+        For records written before hashed timestamps were stored. Can be done
+        once; raises ValueError if an anchor exists or record_id is not a
+        retained record.
+        """
+        if not approved_by:
+            raise ValueError("approved_by is required")
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Audit chain verification already running")
+        db = self._session_factory()
+        try:
+            if db.query(AuditCheckpoint).filter(AuditCheckpoint.legacy.is_(True)).first():
+                raise ValueError("A legacy anchor already exists")
+
+            archive = self.archive_anchor(db)
+            after_id = archive.last_record_id if archive else 0
+            record_hash = db.execute(
+                select(AuditRecord.record_hash).where(AuditRecord.id == record_id, AuditRecord.id > after_id)
+            ).scalar()
+            if record_hash is None:
+                raise ValueError(f"Audit record {record_id} is not a retained, hashed record")
+
+            record_count = (archive.chain_count if archive else 0) + db.execute(
+                select(func.count(AuditRecord.id)).where(AuditRecord.id > after_id, AuditRecord.id <= record_id)
+            ).scalar()
+            if db.query(AuditCheckpoint).filter(AuditCheckpoint.record_id >= record_id).first():
+                raise ValueError(f"The chain is already checkpointed at or after record {record_id}")
+            anchor = AuditCheckpoint(
+                record_id=record_id,
+                record_hash=record_hash,
+                record_count=record_count,
+                legacy=True,
+                approved_by=approved_by,
+                signature=sign_legacy_anchor(record_id, record_hash, record_count, approved_by)
+            )
+            db.add(anchor)
+            db.commit()
+            logger.warning(f"Legacy audit anchor at record {record_id} approved by {approved_by}")
+            return {"record_id": record_id, "record_count": record_count, "approved_by": approved_by}
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+            self._lock.release()
+
+    @staticmethod
+    def _checkpoint_valid(db: Session, checkpoint: AuditCheckpoint) -> bool:
+        current = db.execute(
+            select(AuditRecord.record_hash).where(AuditRecord.id == checkpoint.record_id)
+        ).scalar()
+        return hmac.compare_digest(checkpoint_signature(checkpoint), checkpoint.signature) and current == checkpoint.record_hash
+
+    def _run_segments(self, segments, workers: int) -> List[Dict]:
+        if len(segments) <= 1 or workers <= 1:
+            return [verify_segment(self.url, lo, hi) for lo, hi in segments]
+        # spawn: forking a threaded server process is unsafe
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(segments)),
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            return list(pool.map(verify_segment, [self.url] * len(segments), *zip(*segments)))
+
+
+# Global instance
+audit_verifier = AuditChainVerifier()
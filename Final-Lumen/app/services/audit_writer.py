@@ -0,0 +1,241 @@
+"""
+Audit Log Writer
+Single-writer pipeline that links audit records into the hash chain and
+inserts them into the audit database in batches
+"""
+
+import hashlib
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy import insert, select, text
+
+from app.core.config import settings
+from app.core.database import AuditSessionLocal
+from app.models.audit import AuditRecord
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# pg_advisory_xact_lock key serializing chain writers across processes
+_CHAIN_LOCK_KEY = 0x4C554D454E
+
+
+def compute_record_hash(record_data: Dict) -> str:
+    """Compute SHA-256 hash of record for tamper detection"""
+    # Create deterministic string representation
+    hash_input = json.dumps(record_data, sort_keys=True, default=str)
+    return hashlib.sha256(hash_input.encode()).hexdigest()
+
+
+def chain_hash(record: Dict, previous_hash: Optional[str]) -> str:
+    """Hash of an audit record's chained fields (same fields the verifier recomputes)"""
+    return compute_record_hash({
+        "user_id": record.get("user_id"),
+        "user_type": record.get("user_type"),
+        "transaction_id": record.get("transaction_id"),
+        "actor": record["actor"].value,
+        "action": record["action"].value,
+        "outcome": record.get("outcome"),
+        "confidence": record.get("confidence"),
+        "timestamp": record["timestamp"].isoformat(),
+        "previous_hash": previous_hash
+    })
+
+
+class AuditWriter:
+    """
+    Writes audit records off the request path
+
+    Callers enqueue column values and return immediately. One worker thread
+    drains the queue in batches of up to AUDIT_BATCH_SIZE (or whatever
+    arrived within AUDIT_BATCH_MAX_WAIT_SECONDS) and, per batch, in one
+    audit database transaction:
+      1. takes the chain lock (an advisory lock on PostgreSQL, so writers
+         in other worker processes wait their turn),
+      2. reads the newest record_hash once,
+      3. links the batch in enqueue order, each record hashing its
+         predecessor's hash,
+      4. bulk-inserts the batch.
+
+    The timestamp stored is the one hashed, so the chain can be verified
+    from the table alone. When the queue is full, enqueue writes the record
+    synchronously instead of dropping it.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=settings.AUDIT_QUEUE_MAX_SIZE)
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.sync_writes = 0
+        self.batches = 0
+        self.last_batch_seconds = 0.0
+
+    def start(self):
+        """Start the worker thread (idempotent)"""
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Write queued records and stop the worker"""
+        if self._worker is None or not self._worker.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Audit queue full at shutdown; queued records may be lost")
+            return
+        self._worker.join(timeout=timeout)
+
+    def enqueue(self, record: Dict) -> bool:
+        """
+        Queue AuditRecord column values for writing
+
+        Returns: False if the queue was full and the record was written synchronously
+        """
+        record.setdefault("timestamp", datetime.utcnow())
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.sync_writes += 1
+            logger.warning("Audit queue full; writing record synchronously")
+            self.write([record])
+            return False
+
+    def enqueue_many(self, records: List[Dict]) -> bool:
+        """enqueue for several records, keeping their order"""
+        queued = True
+        for record in records:
+            queued = self.enqueue(record) and queued
+        return queued
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything enqueued so far is written; False on timeout"""
+        if self._worker is None or not self._worker.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _next_batch(self) -> Tuple[List[Dict], List[threading.Event], bool]:
+        """Block for the first item, then gather more until the batch is full or the wait expires"""
+        records: List[Dict] = []
+        flushes: List[threading.Event] = []
+        deadline = None
+        while len(records) < settings.AUDIT_BATCH_SIZE:
+            try:
+                if deadline is None:
+                    item = self._queue.get()
+                    deadline = time.monotonic() + settings.AUDIT_BATCH_MAX_WAIT_SECONDS
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return records, flushes, True
+            if isinstance(item, threading.Event):
+                flushes.append(item)
+                break
+            records.append(item)
+        return records, flushes, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            records, flushes, stopping = self._next_batch()
+            if records:
+                started = time.monotonic()
+                self._write_with_retry(records)
+                self.batches += 1
+                self.last_batch_seconds = time.monotonic() - started
+            for done in flushes:
+                done.set()
+
+        # Write anything queued after the stop marker
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), settings.AUDIT_BATCH_SIZE):
+            self._write_with_retry(remaining[start:start + settings.AUDIT_BATCH_SIZE])
+
+    def _write_with_retry(self, records: List[Dict]):
+        for attempt in range(2):
+            try:
+                self.write(records)
+                return
+            except Exception as e:
+                logger.error(f"Audit batch of {len(records)} records failed (attempt {attempt + 1}): {e}")
+        self.failed += len(records)
+
+    def write(self, records: List[Dict]) -> int:
+        """Link records into the hash chain and insert them in one transaction"""
+        with self._write_lock:
+            db = AuditSessionLocal()
+            try:
+                if db.get_bind().dialect.name == "postgresql":
+                    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CHAIN_LOCK_KEY})
+                previous_hash = db.execute(
+                    select(AuditRecord.record_hash).order_by(AuditRecord.id.desc()).limit(1)
+                ).scalar()
+
+                rows = []
+                for record in records:
+                    row = {
+                        **record,
+                        "reason": record.get("reason") or {},
+                        "related_context": record.get("related_context") or {},
+                        "audit_metadata": record.get("audit_metadata") or {},
+                        "previous_record_hash": previous_hash
+                    }
+                    row["record_hash"] = previous_hash = chain_hash(row, row["previous_record_hash"])
+                    rows.append(row)
+
+                db.execute(insert(AuditRecord), rows)
+                db.commit()
+                self.written += len(rows)
+                return len(rows)
+
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+    def stats(self) -> Dict:
+        """Writer counters for instrumentation"""
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": settings.AUDIT_QUEUE_MAX_SIZE,
+            "written": self.written,
+            "failed": self.failed,
+            "sync_writes": self.sync_writes,
+            "batches": self.batches,
+            "last_batch_seconds": round(self.last_batch_seconds, 3)
+        }
+
+
+# Global instance
+audit_writer = AuditWriter()
@@ -0,0 +1,195 @@
+"""
+Duplicate Transaction Detection
+Exact duplicates via the indexed duplicate_key, screened by per-user Bloom
+filters, plus near-duplicates (same merchant and amount within a time window)
+"""
+
+import math
+import threading
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+import logging
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.transaction import Transaction
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Bloom filter over hex SHA-256 keys (double hashing from the key itself)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        h1 = int(key[:16], 16)
+        h2 = int(key[16:32], 16) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class DuplicateDetector:
+    """
+    Duplicate checks for anomaly scoring
+
+    Each active user has a Bloom filter of their stored duplicate keys, built
+    on first use from the indexed column and kept in an LRU cache for
+    DUPLICATE_BLOOM_TTL_SECONDS (so keys written by other processes are
+    picked up). A key the filter has never seen cannot be a duplicate, so it
+    costs no query. Possible hits are confirmed with one indexed IN query
+    per batch.
+    """
+
+    def __init__(self):
+        self._filters = LRUCache(
+            max_entries=settings.DUPLICATE_BLOOM_MAX_USERS,
+            ttl_seconds=settings.DUPLICATE_BLOOM_TTL_SECONDS
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _owner_column(user_type: str):
+        return Transaction.user_consumer_id if user_type == "consumer" else Transaction.user_business_id
+
+    def _filter(self, db: Session, user_id: int, user_type: str) -> BloomFilter:
+        user_key = f"{user_type}_{user_id}"
+        bloom = self._filters.get(user_key)
+        if bloom is not None:
+            return bloom
+
+        keys = [
+            row[0] for row in db.query(Transaction.duplicate_key).filter(
+                self._owner_column(user_type) == user_id,
+                Transaction.duplicate_key.isnot(None)
+            ).all()
+        ]
+        bloom = BloomFilter(capacity=max(1024, 2 * len(keys)))
+        for key in keys:
+            bloom.add(key)
+        self._filters.set(user_key, bloom)
+        return bloom
+
+    def remember(self, user_id: int, user_type: str, key: Optional[str]):
+        """Add a newly stored key to the user's filter, if one is loaded"""
+        if not key:
+            return
+        with self._lock:
+            bloom = self._filters.get(f"{user_type}_{user_id}")
+            if bloom is None:
+                return
+            if bloom.count >= bloom.capacity:
+                # Over capacity: let the next check rebuild a larger filter
+                self._filters.pop(f"{user_type}_{user_id}")
+            else:
+                bloom.add(key)
+
+    def exact_duplicates(self, db: Session, user_id: int, user_type: str, frame: pd.DataFrame) -> np.ndarray:
+        """Rows whose duplicate_key matches another of the user's transactions"""
+        keys = frame["duplicate_key"]
+        has_key = keys.notna().to_numpy()
+        mask = (keys.notna() & keys.duplicated(keep=False)).to_numpy()
+
+        with self._lock:
+            bloom = self._filter(db, user_id, user_type)
+            candidates = [key for key in keys[has_key].unique() if key in bloom]
+
+        if candidates:
+            stored = pd.DataFrame(
+                db.query(Transaction.id, Transaction.duplicate_key).filter(
+                    self._owner_column(user_type) == user_id,
+                    Transaction.duplicate_key.in_(candidates)
+                ).all(),
+                columns=["id", "duplicate_key"]
+            )
+            # Stored rows outside the batch
+            stored = stored[~stored["id"].isin(frame["id"])]
+            mask |= (keys.notna() & keys.isin(stored["duplicate_key"])).to_numpy()
+
+        for key in keys[has_key].unique():
+            self.remember(user_id, user_type, key)
+
+        return mask
+
+    def near_duplicates(self, db: Session, user_id: int, user_type: str, frame: pd.DataFrame) -> np.ndarray:
+        """
+        Rows with another transaction at the same merchant for the same amount
+        within NEAR_DUPLICATE_WINDOW_HOURS (rows without a merchant never match)
+        """
+        n = len(frame)
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+
+        window = timedelta(hours=settings.NEAR_DUPLICATE_WINDOW_HOURS)
+        dates = pd.to_datetime(frame["date"])
+        merchants = frame["merchant_name_raw"].fillna("").str.lower().str.strip()
+
+        stored = pd.DataFrame(
+            db.query(
+                Transaction.id,
+                Transaction.merchant_name_raw,
+                Transaction.amount,
+                Transaction.date
+            ).filter(
+                self._owner_column(user_type) == user_id,
+                Transaction.merchant_name_raw.isnot(None),
+                Transaction.amount.in_(frame["amount"].unique().tolist()),
+                Transaction.date >= dates.min() - window,
+                Transaction.date <= dates.max() + window
+            ).all(),
+            columns=["id", "merchant_name_raw", "amount", "date"]
+        )
+        if stored.empty:
+            return np.zeros(n, dtype=bool)
+
+        stored["merchant"] = stored["merchant_name_raw"].fillna("").str.lower().str.strip()
+        stored["date"] = pd.to_datetime(stored["date"])
+
+        left = pd.DataFrame({
+            "row": np.arange(n),
+            "id": frame["id"].to_numpy(),
+            "merchant": merchants.to_numpy(),
+            "amount": frame["amount"].to_numpy(dtype=np.float64),
+            "date": dates.to_numpy()
+        })
+        # Without a merchant there is nothing to match on; unrelated payments of
+        # the same amount would otherwise all pair up
+        left = left[left["merchant"] != ""]
+        stored = stored[stored["merchant"] != ""]
+        pairs = left.merge(stored[["id", "merchant", "amount", "date"]], on=["merchant", "amount"], suffixes=("", "_other"))
+        pairs = pairs[
+            (pairs["id"] != pairs["id_other"])
+            & ((pairs["date"] - pairs["date_other"]).abs() <= window)
+        ]
+
+        mask = np.zeros(n, dtype=bool)
+        mask[pairs["row"].unique()] = True
+        return mask
+
+    def check(self, db: Session, user_id: int, user_type: str, frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns: (exact duplicate mask, near-duplicate mask)"""
+        exact = self.exact_duplicates(db, user_id, user_type, frame)
+        near = self.near_duplicates(db, user_id, user_type, frame) & ~exact
+        return exact, near
+
+    def stats(self) -> Dict:
+        return self._filters.stats()
+
+
+# Global instance
+duplicate_detector = DuplicateDetector()
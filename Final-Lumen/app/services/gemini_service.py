@@ -10,6 +10,8 @@ import time
 from google.api_core import retry
 
 from app.core.config import settings
+from app.services.prompt_builder import prompt_builder
+from app.services.intent_classifier import intent_classifier
 
 logger = logging.getLogger(__name__)
 
@@ -164,7 +166,8 @@ If you cannot confidently classify (confidence < 0.6), use category "Unknown".""
         query: str,
         context: List[Dict],
         session_memory: Dict,
-        persistent_memory: Dict
+        persistent_memory: Dict,
+        aggregates: Optional[Dict] = None
     ) -> Dict:
         """
         Generate RAG response using Gemini
@@ -174,6 +177,7 @@ If you cannot confidently classify (confidence < 0.6), use category "Unknown".""
             context: Retrieved transaction/document context
             session_memory: Session-level facts
             persistent_memory: Persistent user facts
+            aggregates: Exact SQL aggregates from the structured query engine
         
         Returns: {
             "response": str,
@@ -184,42 +188,31 @@ If you cannot confidently classify (confidence < 0.6), use category "Unknown".""
         }
         """
         try:
+            # Answer conversational turns locally - only transaction questions go to Gemini
+            classification = intent_classifier.classify(query)
+            if classification["fast_path"] and aggregates is None:
+                result = intent_classifier.respond(classification, session_memory, persistent_memory)
+                logger.info(f"Answered {classification['kind']} turn locally without Gemini")
+                return result
+            
             # Fallback if model not available
             if self.chat_model is None:
                 logger.warning("Gemini chat model not available, using fallback response")
-                return self._fallback_chat_response(query, context)
-            
-            # Detect if query is conversational (greetings, name, casual chat)
-            query_lower = query.lower().strip()
-            conversational_patterns = [
-                "hi", "hello", "hey", "good morning", "good evening", "good afternoon",
-                "my name is", "i am", "i'm", "call me", "thanks", "thank you",
-                "how are you", "what's up", "whats up", "sup", "what can you do",
-                "help", "bye", "goodbye", "see you"
-            ]
-            
-            is_conversational = any(pattern in query_lower for pattern in conversational_patterns)
-            
-            # If conversational and no transaction keywords, don't show transactions
-            transaction_keywords = [
-                "spend", "spent", "transaction", "payment", "paid", "bought", "purchase",
-                "expense", "cost", "money", "rupee", "₹", "grocery", "food", "dining",
-                "transport", "shopping", "bill", "merchant", "show me", "tell me about",
-                "how much", "where", "when did i", "category", "total"
-            ]
+                return self._fallback_chat_response(query, context, aggregates)
             
-            has_transaction_keywords = any(keyword in query_lower for keyword in transaction_keywords)
+            has_transaction_keywords = classification["has_transaction_terms"] or aggregates is not None
             
-            # Build context string only if needed
-            context_str = ""
-            if context and has_transaction_keywords:
-                context_str = "\n\n".join([
-                    f"Transaction {i+1} (ID: {ctx.get('id', 'N/A')}): ₹{ctx.get('amount', 0)} at {ctx.get('merchant', 'Unknown')} on {ctx.get('date', 'Unknown')}, Category: {ctx.get('category', 'N/A')}"
-                    for i, ctx in enumerate(context[:5])  # Top 5 contexts
-                ])
-            
-            session_facts = "\n".join([f"- {k}: {v}" for k, v in session_memory.items()])
-            persistent_facts = "\n".join([f"- {k}: {v}" for k, v in persistent_memory.items()])
+            # Only include transaction context if needed
+            sections = prompt_builder.build_chat_sections(
+                query,
+                context[:5] if has_transaction_keywords else [],
+                session_memory,
+                persistent_memory
+            )
+            context_str = sections["context"]
+            session_facts = sections["session_facts"]
+            persistent_facts = sections["persistent_facts"]
+            aggregates_str = self._format_aggregates(aggregates) if aggregates else ""
             
             prompt = f"""You are LUMEN, an AI financial assistant helping a user understand their transactions.
 
@@ -232,6 +225,9 @@ Persistent User Facts:
 Retrieved Transaction Context:
 {context_str if context_str else "No specific transactions found"}
 
+Computed Totals (exact figures from the database - use these for any totals, counts or averages instead of adding up the transactions above):
+{aggregates_str if aggregates_str else "None"}
+
 User Query: {query}
 
 Instructions:
@@ -252,9 +248,17 @@ Respond ONLY with valid JSON:
     "reasoning": "Why you gave this answer"
 }}"""
 
+            usage = prompt_builder.usage(prompt, sections)
+            
             response = self._call_with_retry(self.chat_model.generate_content, prompt)
             result_text = response.text.strip()
             
+            # Prefer the exact token count reported by Gemini
+            usage_metadata = getattr(response, "usage_metadata", None)
+            if usage_metadata is not None:
+                usage["prompt_tokens"] = getattr(usage_metadata, "prompt_token_count", None)
+                usage["response_tokens"] = getattr(usage_metadata, "candidates_token_count", None)
+            
             # Extract JSON
             if "```json" in result_text:
                 result_text = result_text.split("```json")[1].split("```")[0].strip()
@@ -272,81 +276,96 @@ Respond ONLY with valid JSON:
                     and has_transaction_keywords
                 )
             
-            logger.info(f"Generated chat response with intent {result.get('intent', 'unknown')}, show_transactions: {result.get('should_show_transactions', False)}")
+            result["usage"] = usage
+            
+            logger.info(f"Generated chat response with intent {result.get('intent', 'unknown')}, show_transactions: {result.get('should_show_transactions', False)}, prompt_tokens: {usage.get('prompt_tokens') or usage['estimated_prompt_tokens']}")
             return result
         
         except Exception as e:
             logger.error(f"Chat generation error: {e}")
-            return self._fallback_chat_response(query, context)
+            return self._fallback_chat_response(query, context, aggregates)
     
-    def _fallback_chat_response(self, query: str, context: List[Dict]) -> Dict:
-        """Fallback chat response when Gemini is unavailable"""
-        query_lower = query.lower()
+    def _format_aggregates(self, aggregates: Dict) -> str:
+        """Render structured query results for the prompt"""
+        scope = []
+        if aggregates.get("category"):
+            scope.append(f"category {aggregates['category']}")
+        if aggregates.get("merchant"):
+            scope.append(f"merchant matching '{aggregates['merchant']}'")
         
-        # Greetings and conversational patterns
-        if any(g in query_lower for g in ["hello", "hi", "hey", "good morning", "good evening"]):
-            return {
-                "response": "Hello! I'm LUMEN, your financial assistant. I can help you understand your transactions, spending patterns, and answer questions about your finances. How can I help you today?",
-                "intent": "conversational",
-                "confidence": 0.9,
-                "provenance": [],
-                "should_show_transactions": False,
-                "reasoning": "Greeting detected"
-            }
+        lines = [
+            f"- Period: {aggregates.get('period', 'all time')}" + (f" ({', '.join(scope)})" if scope else ""),
+            f"- Transactions: {aggregates.get('transaction_count', 0)}",
+            f"- Total: ₹{aggregates.get('total_amount', 0):.2f}",
+            f"- Average: ₹{aggregates.get('average_amount', 0):.2f}",
+            f"- Largest: ₹{aggregates.get('max_amount', 0):.2f}",
+        ]
         
-        if any(p in query_lower for p in ["my name is", "i am", "i'm", "call me"]):
-            return {
-                "response": "Nice to meet you! I'll remember that. Feel free to ask me anything about your transactions and spending.",
-                "intent": "conversational",
-                "confidence": 0.9,
-                "provenance": [],
-                "should_show_transactions": False,
-                "reasoning": "User introduction detected"
-            }
+        categories = aggregates.get("categories", [])
+        if categories and not aggregates.get("category"):
+            lines.append("- By category: " + ", ".join(
+                f"{c['category']} ₹{c['total']:.2f} ({c['count']} txns)" for c in categories[:8]
+            ))
         
-        if any(p in query_lower for p in ["how are you", "what's up", "whats up"]):
-            return {
-                "response": "I'm doing great, thank you for asking! I'm here to help you with your financial questions. What would you like to know?",
-                "intent": "conversational",
-                "confidence": 0.9,
-                "provenance": [],
-                "should_show_transactions": False,
-                "reasoning": "Casual greeting"
-            }
+        merchants = aggregates.get("top_merchants", [])
+        if merchants:
+            lines.append("- Top merchants: " + ", ".join(
+                f"{m['merchant']} ₹{m['total_spent']:.2f}" for m in merchants[:5]
+            ))
         
-        if any(p in query_lower for p in ["thank", "thanks"]):
-            return {
-                "response": "You're welcome! Let me know if you need anything else.",
-                "intent": "conversational",
-                "confidence": 0.9,
-                "provenance": [],
-                "should_show_transactions": False,
-                "reasoning": "Thanks detected"
-            }
+        return "\n".join(lines)
+    
+    def _fallback_chat_response(
+        self,
+        query: str,
+        context: List[Dict],
+        aggregates: Optional[Dict] = None
+    ) -> Dict:
+        """Fallback chat response when Gemini is unavailable"""
+        if aggregates:
+            result = self._aggregate_fallback_response(aggregates, context)
+        else:
+            result = self._build_fallback_chat_response(query, context)
+        result["fallback"] = True
+        return result
+    
+    def _aggregate_fallback_response(self, aggregates: Dict, context: List[Dict]) -> Dict:
+        """Answer aggregate questions directly from computed totals (context holds the matching transactions)"""
+        count = aggregates.get("transaction_count", 0)
+        scope = aggregates.get("category") or aggregates.get("merchant")
+        scope_str = f" on {scope}" if scope else ""
+        period = aggregates.get("period", "all time")
         
-        if any(p in query_lower for p in ["help", "what can you do"]):
-            return {
-                "response": "I can help you analyze your transactions, track spending patterns, answer questions about specific purchases, and provide financial insights. Just ask me anything!",
-                "intent": "conversational",
-                "confidence": 0.9,
-                "provenance": [],
-                "should_show_transactions": False,
-                "reasoning": "Help request"
-            }
+        if count == 0:
+            response = f"I couldn't find any transactions{scope_str} for {period}."
+        else:
+            response = (
+                f"You spent ₹{aggregates.get('total_amount', 0):.2f}{scope_str} across {count} "
+                f"transaction(s) ({period}), averaging ₹{aggregates.get('average_amount', 0):.2f} each."
+            )
+            categories = aggregates.get("categories", [])
+            if categories and not aggregates.get("category"):
+                top = categories[0]
+                response += f" Your biggest category was {top['category']} at ₹{top['total']:.2f}."
         
-        if any(p in query_lower for p in ["bye", "goodbye", "see you"]):
-            return {
-                "response": "Goodbye! Feel free to come back anytime you need help with your finances.",
-                "intent": "conversational",
-                "confidence": 0.9,
-                "provenance": [],
-                "should_show_transactions": False,
-                "reasoning": "Goodbye detected"
-            }
+        return {
+            "response": response,
+            "intent": "summary",
+            "confidence": 0.8,
+            "provenance": [ctx.get("id") for ctx in context if "id" in ctx],
+            "should_show_transactions": count > 0 and len(context) > 0,
+            "reasoning": "Computed from database aggregates"
+        }
+    
+    def _build_fallback_chat_response(self, query: str, context: List[Dict]) -> Dict:
+        """Keyword-based chat response used by the fallback path"""
+        # Greetings and conversational patterns
+        classification = intent_classifier.classify(query)
+        if classification["fast_path"]:
+            return intent_classifier.respond(classification)
         
         # Check for transaction-related keywords
-        transaction_keywords = ["spend", "spent", "transaction", "payment", "paid", "bought", "purchase", "expense", "grocery", "food", "transport"]
-        is_transaction_query = any(keyword in query_lower for keyword in transaction_keywords)
+        is_transaction_query = classification["has_transaction_terms"]
         
         # If we have context and it's a transaction query, provide basic summary
         if context and len(context) > 0 and is_transaction_query:
@@ -384,6 +403,14 @@ Respond ONLY with valid JSON:
     def extract_intent(self, query: str) -> str:
         """Extract intent from user query"""
         try:
+            # Local classification first; Gemini only for ambiguous transaction questions
+            classification = intent_classifier.classify(query)
+            if classification["fast_path"] or classification["confidence"] >= intent_classifier.LOCAL_CONFIDENCE_THRESHOLD:
+                return classification["intent"]
+            
+            if self.model is None:
+                return classification["intent"]
+            
             prompt = f"""Classify the intent of this user query about financial transactions:
 
 Query: "{query}"
@@ -0,0 +1,274 @@
+"""
+Local Intent Classifier
+Answers conversational turns and classifies intents without calling Gemini
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Words after "I'm ..." that answer "how are you" (a bare "I'm <word>" is never taken as a name)
+STATE_WORDS = {
+    "good", "fine", "ok", "okay", "great", "well", "back", "here", "alright", "doing good", "doing well",
+    "doing fine", "not bad",
+}
+
+# Conversational patterns, one alternation per kind (compiled into a single regex).
+# Names are only captured after an explicit cue: "I'm hungry" is not an introduction.
+CONVERSATIONAL_PATTERNS = {
+    "introduction": [r"my name is (?P<name>[a-z][a-z .'-]{0,40})", r"call me (?P<name2>[a-z][a-z .'-]{0,40})"],
+    "goodbye": ["bye", "goodbye", "good bye", "see you", "see ya", "good night", "take care"],
+    "thanks": ["thanks", "thank you", "thank u", "thx", "ty", "much appreciated", "appreciate it"],
+    "smalltalk": ["how are you", "how r u", "how's it going", "hows it going", "what's up", "whats up", "sup",
+                  "who are you", "what are you",
+                  r"(?:i am|i'm|im) (?:" + "|".join(sorted(STATE_WORDS, key=len, reverse=True)) + r")$"],
+    "help": ["help", "what can you do", "how does this work", "what do you do", "how can you help"],
+    "greeting": ["hi", "hii", "hello", "hey", "heya", "yo", "namaste", "good morning", "good evening",
+                 "good afternoon", "greetings"],
+}
+
+# Terms that make a query a transaction question (escalated to Gemini)
+TRANSACTION_TERMS = [
+    "spend", "spent", "spending", "transaction", "transactions", "payment", "payments", "paid", "pay",
+    "bought", "buy", "purchase", "purchases", "expense", "expenses", "cost", "costs", "money", "rupee",
+    "rupees", "rs", "inr", "grocery", "groceries", "food", "dining", "transport", "shopping", "bill", "bills",
+    "merchant", "show me", "tell me about", "how much", "how many", "where", "when did i", "category",
+    "categories", "total", "budget", "save", "saving", "savings", "income", "salary", "invoice", "receipt",
+    "refund", "upi", "card", "cash", "wallet", "bank", "balance", "anomaly", "flagged", "suspicious",
+    "unusual", "afford", "average", "month", "week", "year", "today", "yesterday", "last",
+]
+
+# Seed phrases for the local intent model
+TRAINING_PHRASES = {
+    "exact_lookup": [
+        "did i pay the electricity bill", "did i pay netflix this month", "was i charged twice by amazon",
+        "show me the payment to swiggy on monday", "find the transaction with invoice 1234",
+        "when did i last pay rent", "did my payment to uber go through", "what was the amount of the dmart bill",
+        "find my receipt from starbucks", "show the transaction from yesterday",
+    ],
+    "summary": [
+        "how much did i spend last month", "what is my total spending this week", "total spent on groceries",
+        "how much money did i spend on food", "summarize my expenses", "give me a summary of my spending",
+        "how many transactions did i make", "what is my average transaction", "what did i spend this year",
+        "total expenses for october",
+    ],
+    "trend": [
+        "where do i spend the most", "which category do i spend most on", "is my spending going up",
+        "how has my spending changed", "compare this month with last month", "what are my spending patterns",
+        "am i spending more on dining", "top merchants by spend", "spending trend over time",
+        "which merchant do i use most",
+    ],
+    "conversational": [
+        "hi", "hello there", "hey how are you", "good morning", "thanks a lot", "thank you so much",
+        "my name is asha", "call me ravi", "what can you do", "who are you", "bye", "see you later",
+        "how is it going", "nice to meet you", "ok cool", "great",
+    ],
+}
+
+RESPONSES = {
+    "greeting": "Hello{name}! I'm LUMEN, your financial assistant. I can help you understand your transactions, spending patterns, and answer questions about your finances. How can I help you today?",
+    "introduction": "Nice to meet you{name}! I'll remember that. Feel free to ask me anything about your transactions and spending.",
+    "smalltalk": "I'm doing great, thank you for asking! I'm here to help you with your financial questions. What would you like to know?",
+    "thanks": "You're welcome{name}! Let me know if you need anything else.",
+    "help": "I can help you analyze your transactions, track spending patterns, answer questions about specific purchases, and provide financial insights. Just ask me anything!",
+    "goodbye": "Goodbye{name}! Feel free to come back anytime you need help with your finances.",
+    "general": "I'm here to help! You can ask me about your transactions, spending patterns, or specific purchases. What would you like to know?",
+}
+
+REASONS = {
+    "greeting": "Greeting detected",
+    "introduction": "User introduction detected",
+    "smalltalk": "Casual greeting",
+    "thanks": "Thanks detected",
+    "help": "Help request",
+    "goodbye": "Goodbye detected",
+    "general": "General query, no transaction keywords",
+}
+
+NAME_MEMORY_KEYS = ("preferred_name", "user_name", "name")
+
+# Words that may accompany a conversational phrase without changing the turn
+FILLER_WORDS = {
+    "there", "lumen", "so", "much", "a", "lot", "again", "very", "ok", "okay", "cool", "great", "all",
+    "buddy", "friend", "bot", "later", "you", "oh", "and",
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def _alternation(phrases: List[str]) -> str:
+    """Word-bounded alternation, longest phrases first"""
+    literal = [p for p in phrases if not any(ch in p for ch in "(?[\\$")]
+    regex = [p for p in phrases if p not in literal]
+    parts = [re.escape(p) for p in sorted(literal, key=len, reverse=True)] + regex
+    return r"\b(?:" + "|".join(parts) + r")\b"
+
+
+class NaiveBayesIntentModel:
+    """Tiny multinomial Naive Bayes over word unigrams and bigrams"""
+
+    def __init__(self, training_phrases: Dict[str, List[str]], alpha: float = 0.5):
+        self.alpha = alpha
+        self.priors = {}
+        self.log_likelihoods = {}
+        self.unknown_log_likelihood = {}
+
+        vocabulary = set()
+        counts = defaultdict(Counter)
+        total_phrases = sum(len(phrases) for phrases in training_phrases.values())
+
+        for intent, phrases in training_phrases.items():
+            for phrase in phrases:
+                features = self.features(phrase)
+                counts[intent].update(features)
+                vocabulary.update(features)
+            self.priors[intent] = math.log(len(phrases) / total_phrases)
+
+        vocab_size = len(vocabulary)
+        for intent, counter in counts.items():
+            denominator = sum(counter.values()) + alpha * vocab_size
+            self.log_likelihoods[intent] = {
+                feature: math.log((count + alpha) / denominator) for feature, count in counter.items()
+            }
+            self.unknown_log_likelihood[intent] = math.log(alpha / denominator)
+
+        self.vocabulary = vocabulary
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def predict(self, text: str) -> Dict[str, float]:
+        """Return intent probabilities"""
+        features = [f for f in self.features(text) if f in self.vocabulary]
+        scores = {}
+        for intent, prior in self.priors.items():
+            likelihoods = self.log_likelihoods[intent]
+            unknown = self.unknown_log_likelihood[intent]
+            scores[intent] = prior + sum(likelihoods.get(f, unknown) for f in features)
+
+        best = max(scores.values())
+        exp_scores = {intent: math.exp(score - best) for intent, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {intent: value / total for intent, value in exp_scores.items()}
+
+
+class IntentClassifier:
+    """Compiled rule automaton plus a small local model"""
+
+    # Minimum local model confidence to answer without escalating
+    LOCAL_CONFIDENCE_THRESHOLD = 0.6
+
+    def __init__(self):
+        self._conversational = re.compile(
+            "|".join(f"(?P<{kind}>{_alternation(phrases)})" for kind, phrases in CONVERSATIONAL_PATTERNS.items())
+        )
+        self._transaction_terms = re.compile(_alternation(TRANSACTION_TERMS) + r"|₹|\d")
+        self.model = NaiveBayesIntentModel(TRAINING_PHRASES)
+
+    def classify(self, query: str) -> Dict:
+        """
+        Classify a query locally
+
+        Returns: {
+            "intent": str, "confidence": float,
+            "kind": conversational kind or None,
+            "has_transaction_terms": bool,
+            "name": captured name or None,
+            "fast_path": True if it can be answered without Gemini
+        }
+        """
+        query_lower = re.sub(r"\s+", " ", query.lower().strip())
+        query_clean = query_lower.strip(" !?.,")
+
+        has_transaction_terms = self._transaction_terms.search(query_clean) is not None
+
+        kind = None
+        name = None
+        match = self._conversational.search(query_clean)
+        if match:
+            kind = match.lastgroup
+            if kind not in CONVERSATIONAL_PATTERNS:
+                # A named capture inside a pattern matched; find the owning kind
+                kind = next(k for k in CONVERSATIONAL_PATTERNS if match.group(k))
+            if kind == "introduction":
+                name = next((match.group(g) for g in ("name", "name2") if match.group(g)), None)
+                name = name.strip(" .'-") if name else None
+                if not name:
+                    kind = "smalltalk"
+                else:
+                    name = name.title()
+
+        # A rule only answers the turn when nothing but conversational phrases and filler remains
+        residual = _TOKEN_PATTERN.findall(self._conversational.sub(" ", query_clean))
+        exact_rule = kind is not None and all(token in FILLER_WORDS for token in residual)
+
+        # Otherwise the request is what follows the greeting, so the model judges only that
+        probabilities = self.model.predict(query_clean if exact_rule or kind is None else " ".join(residual))
+        model_intent = max(probabilities, key=probabilities.get)
+        model_confidence = probabilities[model_intent]
+
+        if has_transaction_terms:
+            intent = model_intent if model_intent != "conversational" else "unknown"
+            confidence = model_confidence if model_intent != "conversational" else 0.3
+            fast_path = False
+        elif exact_rule:
+            intent, confidence, fast_path = "conversational", 0.95, True
+        else:
+            # Only a confident "conversational" prediction is answered locally; anything else goes to RAG/Gemini
+            intent = model_intent if model_confidence >= self.LOCAL_CONFIDENCE_THRESHOLD else "unknown"
+            confidence = model_confidence
+            fast_path = intent == "conversational"
+            if fast_path:
+                kind = kind or "general"
+            else:
+                kind, name = None, None
+
+        return {
+            "intent": intent,
+            "confidence": round(confidence, 3),
+            "kind": kind,
+            "has_transaction_terms": has_transaction_terms,
+            "name": name,
+            "fast_path": fast_path,
+        }
+
+    def respond(
+        self,
+        classification: Dict,
+        session_memory: Optional[Dict] = None,
+        persistent_memory: Optional[Dict] = None
+    ) -> Dict:
+        """Build a chat response for a conversational turn"""
+        kind = classification.get("kind") or "general"
+        name = classification.get("name") or self._known_name(session_memory, persistent_memory)
+
+        result = {
+            "response": RESPONSES[kind].format(name=f", {name}" if name else ""),
+            "intent": "conversational",
+            "confidence": 0.9 if kind != "general" else 0.7,
+            "provenance": [],
+            "should_show_transactions": False,
+            "reasoning": REASONS[kind],
+            "local": True,
+        }
+        if kind == "introduction" and classification.get("name"):
+            result["memory_updates"] = {"user_name": classification["name"]}
+        return result
+
+    def _known_name(self, *memories: Optional[Dict]) -> Optional[str]:
+        for memory in memories:
+            for key in NAME_MEMORY_KEYS:
+                if memory and memory.get(key):
+                    return str(memory[key])
+        return None
+
+
+# Global instance
+intent_classifier = IntentClassifier()
@@ -0,0 +1,298 @@
+"""
+Anomaly Model Registry
+Versioned on-disk storage and a memory-bounded cache for per-user models
+"""
+
+import os
+import json
+import pickle
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from datetime import datetime
+import logging
+import joblib
+
+from app.core.config import settings
+from app.utils.cache import LRUCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+INDEX_CHECK_INTERVAL_SECONDS = 5  # How often to look for versions saved by other processes
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Stores each model version as one uncompressed joblib file
+    ({model_dir}/{model_key}/v{version}.joblib) holding the model, scaler
+    and metadata, so numpy arrays can be memory-mapped on load.
+
+    index.json records the current version, file checksum and size of every
+    stored version. Only files listed in the index with a matching SHA-256 are
+    ever loaded. Saves from several worker processes are serialized by an
+    fcntl lock on index.lock: each re-reads the index, allocates the next
+    version and writes the model file and index under it.
+
+    Loaded models are kept in an LRU cache bounded by
+    ANOMALY_MODEL_CACHE_MAX_MB; users without a model are cached as misses
+    for ANOMALY_MODEL_MISS_TTL_SECONDS so scoring does not hit the disk.
+    """
+
+    def __init__(self, model_dir: str = "data/models"):
+        self.model_dir = model_dir
+        os.makedirs(self.model_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._index_mtime = None
+        self._index_checked_at = 0.0
+        self._index = self._read_index()
+        self._cache = LRUCache(
+            max_entries=settings.ANOMALY_MODEL_CACHE_MAX_ENTRIES,
+            max_weight=settings.ANOMALY_MODEL_CACHE_MAX_MB * 1024 * 1024,
+            weigher=lambda entry: entry["size_bytes"] if entry else 0
+        )
+
+    def _read_index(self) -> Dict:
+        path = os.path.join(self.model_dir, INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            self._index_mtime = os.path.getmtime(path)
+            with open(path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Model index read error: {e}")
+            return {}
+
+    def _write_index(self):
+        """Atomically rewrite index.json (caller holds the lock)"""
+        path = os.path.join(self.model_dir, INDEX_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+        self._index_mtime = os.path.getmtime(path)
+
+    @contextmanager
+    def _index_file_lock(self):
+        """Exclusive lock on index.lock shared by every process using model_dir"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.model_dir, LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _reload_index(self):
+        """Re-read index.json and drop cached models that are no longer current (caller holds the lock)"""
+        self._index = self._read_index()
+        for model_key in self._cache.keys():
+            cached = self._cache.get(model_key)
+            if cached is None or cached["version"] != self.current_version(model_key):
+                self._cache.pop(model_key)
+
+    def _refresh_index(self):
+        """Pick up versions written by other worker processes"""
+        now = time.monotonic()
+        if now - self._index_checked_at < INDEX_CHECK_INTERVAL_SECONDS:
+            return
+        self._index_checked_at = now
+
+        path = os.path.join(self.model_dir, INDEX_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        if mtime == self._index_mtime:
+            return
+
+        with self._lock:
+            self._reload_index()
+
+    def current_version(self, model_key: str) -> int:
+        with self._lock:
+            return self._index.get(model_key, {}).get("current", 0)
+
+    def versions(self) -> Dict[str, int]:
+        """Current version per model key"""
+        with self._lock:
+            return {key: entry["current"] for key, entry in self._index.items()}
+
+    def save(
+        self,
+        model_key: str,
+        model,
+        scaler,
+        version: Optional[int] = None,
+        metadata: Optional[Dict] = None
+    ) -> int:
+        """
+        Persist a new model version, make it current and cache it
+
+        Returns: Saved version
+        """
+        with self._lock, self._index_file_lock():
+            # Other processes may have saved since this one last read the index
+            self._reload_index()
+            entry = self._index.setdefault(model_key, {"current": 0, "versions": []})
+            if version is None:
+                version = max([v["version"] for v in entry["versions"]] + [entry["current"]]) + 1
+
+            user_dir = os.path.join(self.model_dir, model_key)
+            os.makedirs(user_dir, exist_ok=True)
+            path = os.path.join(user_dir, f"v{version}.joblib")
+
+            saved_at = datetime.utcnow().isoformat()
+            joblib.dump(
+                {"model": model, "scaler": scaler, "version": version, "saved_at": saved_at, **(metadata or {})},
+                f"{path}.tmp",
+                compress=0  # Uncompressed so arrays can be memory-mapped
+            )
+            os.replace(f"{path}.tmp", path)
+
+            record = {
+                "version": version,
+                "file": os.path.relpath(path, self.model_dir),
+                "sha256": _sha256(path),
+                "size_bytes": os.path.getsize(path),
+                "saved_at": saved_at,
+                **(metadata or {})
+            }
+            entry["versions"] = [v for v in entry["versions"] if v["version"] != version] + [record]
+            entry["current"] = version
+            self._prune(model_key, entry)
+            self._write_index()
+
+            self._cache.set(model_key, {
+                "model": model,
+                "scaler": scaler,
+                "version": version,
+                "size_bytes": record["size_bytes"]
+            })
+
+        logger.info(f"Saved model: {model_key} v{version}")
+        return version
+
+    def _prune(self, model_key: str, entry: Dict):
+        """Keep the newest ANOMALY_MODEL_KEEP_VERSIONS versions on disk"""
+        keep = max(1, settings.ANOMALY_MODEL_KEEP_VERSIONS)
+        ordered = sorted(entry["versions"], key=lambda v: v["version"], reverse=True)
+        for stale in ordered[keep:]:
+            try:
+                os.remove(os.path.join(self.model_dir, stale["file"]))
+            except FileNotFoundError:
+                pass
+        entry["versions"] = sorted(ordered[:keep], key=lambda v: v["version"])
+
+    def get(self, model_key: str) -> Optional[Dict]:
+        """
+        Current model for a key, loading it lazily
+
+        Returns: {"model", "scaler", "version", "size_bytes"} or None
+        """
+        self._refresh_index()
+        entry = self._cache.get(model_key, default=False)
+        if entry is not False:
+            return entry
+
+        with self._lock:
+            entry = self._cache.get(model_key, default=False)
+            if entry is not False:
+                return entry
+
+            entry = self._load(model_key)
+            if entry is None:
+                self._cache.set(model_key, None, ttl_seconds=settings.ANOMALY_MODEL_MISS_TTL_SECONDS)
+            else:
+                self._cache.set(model_key, entry)
+            return entry
+
+    def _load(self, model_key: str) -> Optional[Dict]:
+        index_entry = self._index.get(model_key)
+        if not index_entry:
+            return self._import_legacy(model_key)
+
+        record = next((v for v in index_entry["versions"] if v["version"] == index_entry["current"]), None)
+        if record is None:
+            return None
+
+        path = os.path.join(self.model_dir, record["file"])
+        try:
+            if _sha256(path) != record["sha256"]:
+                logger.error(f"Model file checksum mismatch, refusing to load: {path}")
+                return None
+
+            payload = joblib.load(path, mmap_mode="r")
+            logger.info(f"Loaded model: {model_key} v{record['version']}")
+            return {
+                "model": payload["model"],
+                "scaler": payload["scaler"],
+                "version": record["version"],
+                "size_bytes": record["size_bytes"]
+            }
+
+        except Exception as e:
+            logger.error(f"Model load error: {e}")
+            return None
+
+    def _import_legacy(self, model_key: str) -> Optional[Dict]:
+        """One-time import of pre-registry {model_key}_model.pkl / _scaler.pkl files"""
+        model_path = os.path.join(self.model_dir, f"{model_key}_model.pkl")
+        scaler_path = os.path.join(self.model_dir, f"{model_key}_scaler.pkl")
+        if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
+            return None
+
+        try:
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
+            with open(scaler_path, 'rb') as f:
+                scaler = pickle.load(f)
+
+            version = 1
+            meta_path = os.path.join(self.model_dir, f"{model_key}_meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    version = json.load(f).get("version", 1)
+
+            self.save(model_key, model, scaler, version=version, metadata={"imported_from": "pickle"})
+            for path in (model_path, scaler_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            logger.info(f"Imported legacy pickle model: {model_key}")
+            return self._cache.get(model_key)
+
+        except Exception as e:
+            logger.error(f"Legacy model import error: {e}")
+            return None
+
+    def stats(self) -> Dict:
+        """Cache and storage statistics for instrumentation"""
+        with self._lock:
+            stored_bytes = sum(v["size_bytes"] for entry in self._index.values() for v in entry["versions"])
+            return {
+                "models": len(self._index),
+                "stored_bytes": stored_bytes,
+                "cache": self._cache.stats()
+            }
+
+
+# Global instance
+model_registry = ModelRegistry()
@@ -0,0 +1,186 @@
+"""
+Background Retraining Scheduler for per-user anomaly models
+Retrains Isolation Forest models off the request path
+"""
+
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+from datetime import datetime, timedelta
+import logging
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.anomaly_service import anomaly_detector, fit_isolation_forest, MIN_TRAINING_TRANSACTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def _lower_priority():
+    """Worker initializer: run training below API worker priority"""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+class ModelRetrainScheduler:
+    """
+    Decides when a user's anomaly model is stale and retrains it
+
+    A model is retrained when ANOMALY_RETRAIN_MIN_NEW_TRANSACTIONS have
+    arrived since the last training, or when the recent Isolation Forest
+    outlier rate drifts above ANOMALY_RETRAIN_DRIFT_FACTOR x the configured
+    contamination. Features are loaded in a coordinator thread, the fit runs
+    in a low-priority process pool, and the result is hot-swapped into
+    anomaly_detector. At most ANOMALY_TRAINING_MAX_CONCURRENT jobs run at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._new_counts: Dict[str, int] = {}
+        self._recent_outliers: Dict[str, deque] = {}
+        self._in_flight = set()
+        self._rerun = set()
+        self._last_trained: Dict[str, datetime] = {}
+        self._coordinator: Optional[ThreadPoolExecutor] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+
+    @staticmethod
+    def _model_key(user_id: int, user_type: str) -> str:
+        return f"{user_type}_{user_id}"
+
+    def _executors(self):
+        """Create the executors lazily (not at import time)"""
+        if self._coordinator is None:
+            workers = max(1, settings.ANOMALY_TRAINING_MAX_CONCURRENT)
+            self._coordinator = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-retrain")
+            # spawn: forking a threaded server process is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority
+            )
+        return self._coordinator, self._pool
+
+    def record_transactions(self, user_id: int, user_type: str, count: int = 1):
+        """Count newly ingested transactions and retrain when enough have arrived"""
+        model_key = self._model_key(user_id, user_type)
+        with self._lock:
+            self._new_counts[model_key] = self._new_counts.get(model_key, 0) + count
+            due = self._new_counts[model_key] >= settings.ANOMALY_RETRAIN_MIN_NEW_TRANSACTIONS
+
+        if due:
+            self.schedule(user_id, user_type, reason="new transactions")
+
+    def record_scores(self, user_id: int, user_type: str, outliers):
+        """
+        Track Isolation Forest outlier flags from scoring for drift detection
+
+        Args:
+            outliers: Iterable of booleans, True where the model flagged an outlier
+        """
+        model_key = self._model_key(user_id, user_type)
+        window = settings.ANOMALY_RETRAIN_DRIFT_WINDOW
+        with self._lock:
+            recent = self._recent_outliers.setdefault(model_key, deque(maxlen=window))
+            recent.extend(bool(flag) for flag in outliers)
+            rate = float(np.mean(recent)) if len(recent) >= window // 2 else 0.0
+            drifted = rate > settings.ISOLATION_FOREST_CONTAMINATION * settings.ANOMALY_RETRAIN_DRIFT_FACTOR
+            if drifted:
+                recent.clear()
+
+        if drifted:
+            self.schedule(user_id, user_type, reason=f"drift (outlier rate {rate:.1%})")
+
+    def schedule(self, user_id: int, user_type: str, reason: str = "manual") -> bool:
+        """
+        Queue a retrain for a user; a request while one is running reruns it once
+
+        Returns: True if a new job was queued
+        """
+        model_key = self._model_key(user_id, user_type)
+        with self._lock:
+            if model_key in self._in_flight:
+                self._rerun.add(model_key)
+                return False
+            self._in_flight.add(model_key)
+            self._new_counts[model_key] = 0
+
+        coordinator, _ = self._executors()
+        logger.info(f"Scheduling anomaly model retrain for {model_key}: {reason}")
+        coordinator.submit(self._run_job, user_id, user_type)
+        return True
+
+    def _run_job(self, user_id: int, user_type: str):
+        model_key = self._model_key(user_id, user_type)
+        try:
+            features = self._load_training_features(user_id, user_type)
+            if features is None:
+                logger.info(f"Skipping retrain for {model_key}: fewer than {MIN_TRAINING_TRANSACTIONS} transactions")
+                return
+
+            _, pool = self._executors()
+            model, scaler = pool.submit(fit_isolation_forest, features).result()
+            version = anomaly_detector.install_model(model_key, model, scaler, metadata={"n_samples": len(features)})
+
+            with self._lock:
+                self._last_trained[model_key] = datetime.utcnow()
+                self.jobs_completed += 1
+            logger.info(f"Retrained anomaly model {model_key} v{version} on {len(features)} transactions")
+
+        except Exception as e:
+            with self._lock:
+                self.jobs_failed += 1
+            logger.error(f"Anomaly model retrain failed for {model_key}: {e}")
+
+        finally:
+            with self._lock:
+                self._in_flight.discard(model_key)
+                rerun = model_key in self._rerun
+                self._rerun.discard(model_key)
+            if rerun:
+                self.schedule(user_id, user_type, reason="requested during previous run")
+
+    def _load_training_features(self, user_id: int, user_type: str) -> Optional[np.ndarray]:
+        """Column-wise load of the user's recent transactions"""
+        db = SessionLocal()
+        try:
+            since = datetime.utcnow() - timedelta(days=settings.ANOMALY_TRAINING_WINDOW_DAYS)
+            frame = anomaly_detector.load_feature_frame(db, user_id, user_type, since=since)
+        finally:
+            db.close()
+
+        if len(frame) < MIN_TRAINING_TRANSACTIONS:
+            return None
+        return anomaly_detector._frame_features(frame)
+
+    def status(self) -> Dict:
+        """Scheduler state for instrumentation"""
+        with self._lock:
+            return {
+                "in_flight": sorted(self._in_flight),
+                "pending_new_transactions": dict(self._new_counts),
+                "last_trained": {key: value.isoformat() for key, value in self._last_trained.items()},
+                "model_versions": anomaly_detector.registry.versions(),
+                "jobs_completed": self.jobs_completed,
+                "jobs_failed": self.jobs_failed,
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop the executors (called on application shutdown)"""
+        if self._coordinator is not None:
+            self._coordinator.shutdown(wait=wait, cancel_futures=True)
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._coordinator = None
+            self._pool = None
+
+
+# Global instance
+model_scheduler = ModelRetrainScheduler()
@@ -0,0 +1,431 @@
+"""
+Incremental Pattern Statistics Engine
+Maintains per user/category spending patterns in O(1) per transaction
+"""
+
+import copy
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import logging
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.transaction import Transaction
+from app.models.pattern import Pattern
+
+logger = logging.getLogger(__name__)
+
+TOP_MERCHANTS = 5
+
+
+def _week_key(date: datetime) -> str:
+    """Bucket key for the ISO week (Monday) containing date"""
+    return (date.date() - timedelta(days=date.weekday())).isoformat()
+
+
+def _month_key(date: datetime) -> str:
+    return date.strftime("%Y-%m")
+
+
+def _empty_week() -> Dict:
+    return {"n": 0, "mean": 0.0, "m2": 0.0, "dow": [0] * 7, "hours": [0] * 24, "merchants": {}}
+
+
+def _merge_moments(a: Tuple[int, float, float], b: Tuple[int, float, float]) -> Tuple[int, float, float]:
+    """Combine (n, mean, M2) of two samples (Chan et al. parallel algorithm)"""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta * delta * n_a * n_b / n
+    return n, mean, m2
+
+
+class PatternEngine:
+    """
+    Incremental spending pattern statistics
+
+    Each Pattern keeps weekly buckets holding Welford moments (n, mean, M2)
+    of transaction amounts plus day-of-week, hour and merchant counts, and
+    monthly buckets holding spend totals. A new transaction updates one
+    weekly and one monthly bucket; derived fields are recomputed by merging
+    the bounded number of buckets inside the window.
+    """
+
+    def __init__(self, window_days: Optional[int] = None):
+        self.window_days = window_days or settings.PATTERN_WINDOW_DAYS
+
+    def observe(
+        self,
+        db: Session,
+        transaction: Transaction,
+        user_id: int,
+        user_type: str,
+        now: Optional[datetime] = None
+    ) -> Optional[Pattern]:
+        """Add a transaction to its user/category pattern (caller commits)"""
+        if transaction.confirmed is False:  # Rejected transactions are not part of the pattern
+            return None
+        return self._update(db, transaction, user_id, user_type, +1, now)
+
+    def forget(
+        self,
+        db: Session,
+        transaction: Transaction,
+        user_id: int,
+        user_type: str,
+        now: Optional[datetime] = None
+    ) -> Optional[Pattern]:
+        """Remove a previously observed transaction, e.g. when the user rejects it (no-op if it was never observed)"""
+        return self._update(db, transaction, user_id, user_type, -1, now)
+
+    def _update(
+        self,
+        db: Session,
+        transaction: Transaction,
+        user_id: int,
+        user_type: str,
+        sign: int,
+        now: Optional[datetime]
+    ) -> Optional[Pattern]:
+        if not transaction.category or transaction.amount is None:
+            return None
+
+        now = now or datetime.utcnow()
+        if transaction.date < now - timedelta(days=self.window_days):
+            return None
+
+        # Run in a savepoint so a failed flush only undoes this update, not the
+        # caller's transaction (which still has to commit the ingest or confirm)
+        for attempt in range(2):
+            try:
+                with db.begin_nested():
+                    return self._update_buckets(db, transaction, user_id, user_type, sign, now)
+            except IntegrityError as e:
+                # Another request created the pattern first; retry against its row
+                if attempt == 0:
+                    continue
+                logger.error(f"Incremental pattern update error: {e}")
+            except Exception as e:
+                logger.error(f"Incremental pattern update error: {e}")
+                break
+        return None
+
+    def _update_buckets(
+        self,
+        db: Session,
+        transaction: Transaction,
+        user_id: int,
+        user_type: str,
+        sign: int,
+        now: datetime
+    ) -> Pattern:
+        pattern = self._get_or_create_pattern(db, user_id, user_type, transaction.category)
+
+        weekly = copy.deepcopy(pattern.weekly_buckets or {})
+        monthly = copy.deepcopy(pattern.monthly_buckets or {})
+
+        # A transaction that was never observed (e.g. rejected before it was
+        # scored) must not drive the bucket counts below zero
+        if sign < 0 and not self._contains(weekly, monthly, transaction):
+            return pattern
+
+        week = weekly.setdefault(_week_key(transaction.date), _empty_week())
+        self._apply(week, transaction, sign)
+        if week["n"] <= 0:
+            del weekly[_week_key(transaction.date)]
+
+        month = monthly.setdefault(_month_key(transaction.date), {"n": 0, "total": 0.0})
+        month["n"] += sign
+        month["total"] += sign * float(transaction.amount)
+        if month["n"] <= 0:
+            del monthly[_month_key(transaction.date)]
+
+        pattern.weekly_buckets = weekly
+        pattern.monthly_buckets = monthly
+        self._refresh_derived(pattern, now)
+        return pattern
+
+    @staticmethod
+    def _contains(weekly: Dict, monthly: Dict, transaction: Transaction) -> bool:
+        """Whether the buckets can hold this transaction, i.e. removing it keeps every count >= 0"""
+        week = weekly.get(_week_key(transaction.date))
+        month = monthly.get(_month_key(transaction.date))
+        if not week or not month or week["n"] <= 0 or month["n"] <= 0:
+            return False
+        merchant = week["merchants"].get(transaction.merchant_name_raw or "Unknown")
+        return (
+            week["dow"][transaction.date.weekday()] > 0
+            and week["hours"][transaction.date.hour] > 0
+            and merchant is not None
+            and merchant[0] > 0
+        )
+
+    def _apply(self, week: Dict, transaction: Transaction, sign: int):
+        """Welford add (sign=+1) or remove (sign=-1) of one amount"""
+        x = float(transaction.amount)
+        n, mean, m2 = week["n"], week["mean"], week["m2"]
+
+        if sign > 0:
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+        elif n <= 1:
+            n, mean, m2 = 0, 0.0, 0.0
+        else:
+            new_mean = (n * mean - x) / (n - 1)
+            m2 = max(0.0, m2 - (x - new_mean) * (x - mean))
+            n, mean = n - 1, new_mean
+
+        week["n"], week["mean"], week["m2"] = n, mean, m2
+        week["dow"][transaction.date.weekday()] += sign
+        week["hours"][transaction.date.hour] += sign
+
+        merchant = transaction.merchant_name_raw or "Unknown"
+        count, total, merchant_id = week["merchants"].get(merchant, [0, 0.0, transaction.merchant_id])
+        count += sign
+        total += sign * x
+        if count > 0:
+            week["merchants"][merchant] = [count, total, merchant_id]
+        else:
+            week["merchants"].pop(merchant, None)
+
+    def _refresh_derived(self, pattern: Pattern, now: datetime):
+        """Prune expired buckets and recompute the Pattern's derived fields"""
+        window_start = (now - timedelta(days=self.window_days)).date()
+        window_start_week = (window_start - timedelta(days=window_start.weekday())).isoformat()
+        window_start_month = window_start.strftime("%Y-%m")
+
+        weekly = {k: v for k, v in (pattern.weekly_buckets or {}).items() if k >= window_start_week}
+        monthly = {k: v for k, v in (pattern.monthly_buckets or {}).items() if k >= window_start_month}
+
+        moments = (0, 0.0, 0.0)
+        dow = np.zeros(7, dtype=np.int64)
+        hours = np.zeros(24, dtype=np.int64)
+        merchants = {}
+
+        for week in weekly.values():
+            moments = _merge_moments(moments, (week["n"], week["mean"], week["m2"]))
+            dow += np.asarray(week["dow"], dtype=np.int64)
+            hours += np.asarray(week["hours"], dtype=np.int64)
+            for name, (count, total, merchant_id) in week["merchants"].items():
+                entry = merchants.setdefault(name, [0, 0.0, merchant_id])
+                entry[0] += count
+                entry[1] += total
+
+        n, mean, m2 = moments
+        std = float(np.sqrt(m2 / n)) if n > 0 else 0.0  # Population std, same as np.std
+
+        pattern.weekly_buckets = weekly
+        pattern.monthly_buckets = monthly
+        pattern.window_days = self.window_days
+        pattern.sample_count = int(n)
+        pattern.avg_monthly_spend = mean
+        pattern.std_monthly_spend = std
+        pattern.avg_weekly_spend = mean / 4.33  # Approximate
+        pattern.std_weekly_spend = std / 4.33
+        pattern.upper_threshold_3sigma = mean + (3 * std)
+        pattern.upper_threshold_6sigma = mean + (6 * std)
+        pattern.typical_days_of_week = self._typical_days(dow)
+        pattern.typical_time_of_day = self._typical_hours(hours)
+        pattern.top_merchants = self._top_merchants(merchants)
+        pattern.last_update = now
+
+    @staticmethod
+    def _typical_days(dow: np.ndarray) -> List[int]:
+        """Days of week (0=Monday) with at least an average share of transactions"""
+        total = dow.sum()
+        if total == 0:
+            return []
+        return [int(d) for d in np.flatnonzero(dow >= total / 7)]
+
+    @staticmethod
+    def _typical_hours(hours: np.ndarray) -> List[List[int]]:
+        """Contiguous [start_hour, end_hour] ranges with at least an average share of transactions"""
+        total = hours.sum()
+        if total == 0:
+            return []
+
+        active = hours >= max(1.0, total / 24)
+        ranges = []
+        start = None
+        for hour in range(24):
+            if active[hour] and start is None:
+                start = hour
+            elif not active[hour] and start is not None:
+                ranges.append([start, hour - 1])
+                start = None
+        if start is not None:
+            ranges.append([start, 23])
+        return ranges
+
+    @staticmethod
+    def _top_merchants(merchants: Dict) -> List[Dict]:
+        ranked = sorted(merchants.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)
+        return [
+            {
+                "merchant": name,
+                "merchant_id": merchant_id,
+                "count": count,
+                "avg_amount": round(total / count, 2) if count else 0.0
+            }
+            for name, (count, total, merchant_id) in ranked[:TOP_MERCHANTS]
+        ]
+
+    def _get_or_create_pattern(
+        self,
+        db: Session,
+        user_id: int,
+        user_type: str,
+        category: str
+    ) -> Pattern:
+        if user_type == "consumer":
+            query = db.query(Pattern).filter(
+                Pattern.user_consumer_id == user_id,
+                Pattern.category_id == category
+            )
+        else:
+            query = db.query(Pattern).filter(
+                Pattern.user_business_id == user_id,
+                Pattern.category_id == category
+            )
+
+        pattern = query.with_for_update().first()
+        if not pattern:
+            pattern = Pattern(
+                user_consumer_id=user_id if user_type == "consumer" else None,
+                user_business_id=user_id if user_type == "business" else None,
+                category_id=category,
+                window_days=self.window_days,
+                weekly_buckets={},
+                monthly_buckets={}
+            )
+            db.add(pattern)
+            db.flush()  # Sessions do not autoflush; make the row visible to the next lookup
+        return pattern
+
+    def rebuild(
+        self,
+        db: Session,
+        user_id: int,
+        user_type: str,
+        category: Optional[str] = None,
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Recompute patterns from scratch with a vectorized pass (caller commits)
+
+        Returns: Number of patterns rebuilt
+        """
+        now = now or datetime.utcnow()
+        cutoff_date = now - timedelta(days=self.window_days)
+
+        owner_column = Transaction.user_consumer_id if user_type == "consumer" else Transaction.user_business_id
+        query = db.query(
+            Transaction.category,
+            Transaction.amount,
+            Transaction.date,
+            Transaction.merchant_name_raw,
+            Transaction.merchant_id
+        ).filter(
+            owner_column == user_id,
+            Transaction.date >= cutoff_date,
+            Transaction.category.isnot(None),
+            or_(Transaction.confirmed.is_(None), Transaction.confirmed == True)  # Exclude rejected transactions
+        )
+        if category:
+            query = query.filter(Transaction.category == category)
+
+        df = pd.DataFrame(
+            query.all(),
+            columns=["category", "amount", "date", "merchant", "merchant_id"]
+        )
+
+        rebuilt = 0
+        if df.empty:
+            categories = [category] if category else []
+        else:
+            df["amount"] = df["amount"].astype(float)
+            df["date"] = pd.to_datetime(df["date"])
+            df["merchant"] = df["merchant"].fillna("Unknown")
+            df["week"] = (df["date"] - pd.to_timedelta(df["date"].dt.weekday, unit="D")).dt.strftime("%Y-%m-%d")
+            df["month"] = df["date"].dt.strftime("%Y-%m")
+            df["dow"] = df["date"].dt.weekday
+            df["hour"] = df["date"].dt.hour
+            categories = df["category"].unique().tolist()
+            if category and category not in categories:
+                categories.append(category)
+
+        for cat in categories:
+            cat_df = df[df["category"] == cat] if not df.empty else df
+            pattern = self._get_or_create_pattern(db, user_id, user_type, cat)
+            pattern.weekly_buckets = self._weekly_buckets(cat_df)
+            pattern.monthly_buckets = self._monthly_buckets(cat_df)
+            self._refresh_derived(pattern, now)
+            rebuilt += 1
+
+        return rebuilt
+
+    @staticmethod
+    def _weekly_buckets(df: pd.DataFrame) -> Dict:
+        if df.empty:
+            return {}
+
+        grouped = df.groupby("week")["amount"]
+        moments = pd.DataFrame({
+            "n": grouped.count(),
+            "mean": grouped.mean(),
+            "m2": grouped.var(ddof=0) * grouped.count()
+        })
+        dow = df.groupby(["week", "dow"]).size().unstack(fill_value=0).reindex(columns=range(7), fill_value=0)
+        hours = df.groupby(["week", "hour"]).size().unstack(fill_value=0).reindex(columns=range(24), fill_value=0)
+        merchants = df.groupby(["week", "merchant"]).agg(
+            count=("amount", "size"),
+            total=("amount", "sum"),
+            merchant_id=("merchant_id", "first")
+        )
+
+        buckets = {}
+        for week, row in moments.iterrows():
+            buckets[week] = {
+                "n": int(row["n"]),
+                "mean": float(row["mean"]),
+                "m2": float(row["m2"]),
+                "dow": [int(v) for v in dow.loc[week]],
+                "hours": [int(v) for v in hours.loc[week]],
+                "merchants": {
+                    name: [int(m["count"]), float(m["total"]), None if pd.isna(m["merchant_id"]) else int(m["merchant_id"])]
+                    for name, m in merchants.loc[week].iterrows()
+                }
+            }
+        return buckets
+
+    @staticmethod
+    def _monthly_buckets(df: pd.DataFrame) -> Dict:
+        if df.empty:
+            return {}
+        grouped = df.groupby("month")["amount"].agg(["count", "sum"])
+        return {
+            month: {"n": int(row["count"]), "total": float(row["sum"])}
+            for month, row in grouped.iterrows()
+        }
+
+    def monthly_spend(self, pattern: Pattern) -> Dict[str, float]:
+        """Total spend per month from the pattern's monthly buckets"""
+        return {month: bucket["total"] for month, bucket in sorted((pattern.monthly_buckets or {}).items())}
+
+    def weekly_spend(self, pattern: Pattern) -> Dict[str, float]:
+        """Total spend per week (keyed by Monday) from the weekly buckets"""
+        return {week: bucket["n"] * bucket["mean"] for week, bucket in sorted((pattern.weekly_buckets or {}).items())}
+
+
+# Global instance
+pattern_engine = PatternEngine()
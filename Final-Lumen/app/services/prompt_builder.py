@@ -0,0 +1,264 @@
+"""
+Token-budgeted prompt builder for the chatbot
+Keeps prompt size bounded for long-lived sessions
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"[a-z0-9₹]+")
+
+# Session keys managed by the builder itself (not rendered as plain facts)
+RECENT_TURNS_KEY = "recent_turns"
+DIGEST_KEY = "digest"  # Log of older turns (question and answer summary each)
+TURN_KEYS = (RECENT_TURNS_KEY, DIGEST_KEY, "last_query", "last_intent")
+
+# Facts that should survive truncation regardless of query overlap
+PRIORITY_FACT_KEYS = ("name", "preferred_name", "currency", "budget")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English text)
+
+    Used for budgeting before the call; the actual count reported by Gemini
+    is attached to the response when available.
+    """
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to roughly max_tokens, keeping the beginning"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * 4 - 3)
+    return text[:max_chars].rstrip() + "..."
+
+
+class PromptBuilder:
+    """Ranks, truncates and renders prompt sections within token budgets"""
+
+    def _tokens(self, text: str) -> set:
+        return set(_WORD_PATTERN.findall(text.lower()))
+
+    def _rank_facts(self, facts: Dict, query: str) -> List[Tuple[str, str]]:
+        """Order facts by priority, then by word overlap with the query"""
+        query_words = self._tokens(query)
+        scored = []
+        for position, (key, value) in enumerate(facts.items()):
+            if value is None or value == "":
+                continue
+            text = f"{key} {value}"
+            overlap = len(query_words & self._tokens(text))
+            priority = 1 if any(p in str(key).lower() for p in PRIORITY_FACT_KEYS) else 0
+            # Later insertion order = more recent, used as a tie-breaker
+            scored.append(((priority, overlap, position), str(key), str(value)))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [(key, value) for _, key, value in scored]
+
+    def render_facts(self, facts: Dict, query: str, budget: int) -> Tuple[str, int]:
+        """
+        Render "- key: value" lines for the highest ranked facts within budget
+
+        Returns: (rendered text, number of facts dropped)
+        """
+        lines = []
+        used = 0
+        ranked = self._rank_facts(facts, query)
+        max_value_tokens = max(16, budget // 4)
+
+        for key, value in ranked:
+            line = f"- {key}: {truncate_to_tokens(value, max_value_tokens)}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                continue
+            lines.append(line)
+            used += cost
+
+        return "\n".join(lines), len(ranked) - len(lines)
+
+    def render_context(self, context: List[Dict], budget: int) -> Tuple[str, int]:
+        """
+        Render retrieved transactions (already in relevance order) within budget
+
+        Returns: (rendered text, number of documents dropped)
+        """
+        lines = []
+        used = 0
+        for i, ctx in enumerate(context):
+            line = f"Transaction {i+1} (ID: {ctx.get('id', 'N/A')}): ₹{ctx.get('amount', 0)} at {ctx.get('merchant', 'Unknown')} on {ctx.get('date', 'Unknown')}, Category: {ctx.get('category', 'N/A')}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+
+        return "\n\n".join(lines), len(context) - len(lines)
+
+    def render_session(self, session_memory: Dict, query: str, budget: int) -> Tuple[str, int]:
+        """
+        Render the log of older turns, recent turns and remaining session facts
+
+        Returns: (rendered text, number of items dropped)
+        """
+        parts = []
+        used = 0
+        dropped = 0
+
+        log = self._turn_log(session_memory)
+        if log:
+            log_text = "Earlier in this conversation: " + truncate_to_tokens("; ".join(log), settings.CHAT_DIGEST_TOKEN_BUDGET)
+            parts.append(log_text)
+            used += estimate_tokens(log_text)
+
+        turn_lines = []
+        for turn in reversed(session_memory.get(RECENT_TURNS_KEY) or []):
+            line = f"- User asked: \"{turn.get('query', '')}\" (intent: {turn.get('intent') or 'unknown'})"
+            if turn.get("answer"):
+                line += f" - answered: {turn['answer']}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                dropped += 1
+                continue
+            turn_lines.append(line)
+            used += cost
+        if turn_lines:
+            parts.append("Recent turns:\n" + "\n".join(reversed(turn_lines)))
+
+        facts = {
+            k: v for k, v in session_memory.items()
+            if k not in TURN_KEYS and not isinstance(v, (list, dict))
+        }
+        facts_text, facts_dropped = self.render_facts(facts, query, max(0, budget - used))
+        if facts_text:
+            parts.append(facts_text)
+        dropped += facts_dropped
+
+        return "\n".join(parts), dropped
+
+    def build_chat_sections(
+        self,
+        query: str,
+        context: List[Dict],
+        session_memory: Dict,
+        persistent_memory: Dict
+    ) -> Dict:
+        """
+        Build budgeted prompt sections for generate_chat_response
+
+        Returns: {"session_facts", "persistent_facts", "context", "dropped": {...}}
+        """
+        session_text, session_dropped = self.render_session(
+            session_memory or {}, query, settings.CHAT_SESSION_TOKEN_BUDGET
+        )
+        persistent_text, persistent_dropped = self.render_facts(
+            persistent_memory or {}, query, settings.CHAT_MEMORY_TOKEN_BUDGET
+        )
+        context_text, context_dropped = self.render_context(
+            context or [], settings.CHAT_CONTEXT_TOKEN_BUDGET
+        )
+
+        return {
+            "session_facts": session_text,
+            "persistent_facts": persistent_text,
+            "context": context_text,
+            "dropped": {
+                "session": session_dropped,
+                "persistent_memory": persistent_dropped,
+                "context": context_dropped
+            }
+        }
+
+    def usage(self, prompt: str, sections: Dict) -> Dict:
+        """Per-call prompt size report"""
+        prompt_tokens = estimate_tokens(prompt)
+        if prompt_tokens > settings.CHAT_PROMPT_TOKEN_BUDGET:
+            logger.warning(f"Chat prompt ({prompt_tokens} tokens) exceeds budget of {settings.CHAT_PROMPT_TOKEN_BUDGET}")
+
+        return {
+            "estimated_prompt_tokens": prompt_tokens,
+            "section_tokens": {
+                "session_facts": estimate_tokens(sections["session_facts"]),
+                "persistent_facts": estimate_tokens(sections["persistent_facts"]),
+                "context": estimate_tokens(sections["context"])
+            },
+            "dropped": sections["dropped"]
+        }
+
+    @staticmethod
+    def _turn_log(session_memory: Dict) -> List[str]:
+        """Logged older turns (sessions from before the log was a list hold one string)"""
+        log = session_memory.get(DIGEST_KEY) or []
+        return [log] if isinstance(log, str) else list(log)
+
+    def summarize_answer(self, response: Dict, aggregates: Optional[Dict] = None) -> Optional[str]:
+        """
+        Short record of what the assistant answered, kept with the turn
+
+        Aggregate answers keep the computed figure; others the start of the
+        reply. Conversational replies carry no facts and are not recorded.
+        """
+        if response.get("intent") == "conversational":
+            return None
+        if aggregates:
+            scope = aggregates.get("category") or aggregates.get("merchant")
+            return (
+                f"₹{aggregates.get('total_amount', 0):.2f} across {aggregates.get('transaction_count', 0)} "
+                f"transaction(s), {aggregates.get('period', 'all time')}" + (f", {scope}" if scope else "")
+            )
+        text = (response.get("response") or "").strip()
+        if not text:
+            return None
+        first_sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        return truncate_to_tokens(first_sentence, 32)
+
+    def update_session_memory(
+        self,
+        session_memory: Optional[Dict],
+        query: str,
+        intent: Optional[str],
+        answer: Optional[str] = None
+    ) -> Dict:
+        """
+        Record a turn (question, intent and answer summary) in session memory
+
+        Turns beyond CHAT_RECENT_TURNS move to a log of shorter
+        question/answer entries; the oldest entries are dropped whole once
+        the log outgrows CHAT_DIGEST_TOKEN_BUDGET.
+
+        Returns a new dict (so SQLAlchemy detects the JSON column change).
+        """
+        memory = dict(session_memory or {})
+        turns = list(memory.get(RECENT_TURNS_KEY) or [])
+        turns.append({"query": truncate_to_tokens(query, 64), "intent": intent, "answer": answer})
+
+        overflow = turns[:-settings.CHAT_RECENT_TURNS] if len(turns) > settings.CHAT_RECENT_TURNS else []
+        turns = turns[-settings.CHAT_RECENT_TURNS:]
+
+        if overflow:
+            log = self._turn_log(memory)
+            for turn in overflow:
+                entry = f"asked \"{truncate_to_tokens(turn['query'], 24)}\" ({turn.get('intent') or 'unknown'})"
+                if turn.get("answer"):
+                    entry += f" -> {truncate_to_tokens(turn['answer'], 24)}"
+                log.append(entry)
+            while len(log) > 1 and estimate_tokens("; ".join(log)) > settings.CHAT_DIGEST_TOKEN_BUDGET:
+                log.pop(0)
+            memory[DIGEST_KEY] = log
+
+        memory[RECENT_TURNS_KEY] = turns
+        memory["last_query"] = query
+        memory["last_intent"] = intent
+        return memory
+
+
+# Global instance
+prompt_builder = PromptBuilder()
@@ -0,0 +1,368 @@
+"""
+Structured Query Engine for aggregate chat questions
+Answers "how much / how many / total" questions with SQL aggregates
+instead of vector retrieval
+"""
+
+import re
+import calendar
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import logging
+from sqlalchemy import func
+from sqlalchemy.orm import Session, Query
+
+from app.models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+
+# Phrases that make a question an aggregate question
+AGGREGATE_PATTERNS = {
+    "count": r"\bhow many\b|\bnumber of\b|\bcount of\b",
+    "avg": r"\baverage\b|\bavg\b",
+    "max": r"\bbiggest\b|\blargest\b|\bhighest\b|\bmost expensive\b",
+    "breakdown": r"\bbreakdown\b|\bby category\b|\bper category\b|\beach category\b|\bwhere do i spend\b|\bwhat do i spend\b|\bspend most\b|\bspent most\b|\btop categor",
+    "sum": r"\bhow much\b|\btotal\b|\bsum of\b|\bin sum\b",
+}
+
+# An aggregate phrase only routes to SQL when the question is about money or transactions
+AGGREGATE_SUBJECT = (
+    r"\b(?:spen[dt]|spending|paid|pay(?:ments?)?|expenses?|transactions?|purchases?|bought|orders?|"
+    r"bills?|costs?|charged?|charges|money|amount|income|received|earned|sales?|revenue)\b"
+)
+
+# Informal words mapped to the default category names
+CATEGORY_SYNONYMS = {
+    "food": "Food & Dining",
+    "dining": "Food & Dining",
+    "restaurant": "Food & Dining",
+    "restaurants": "Food & Dining",
+    "eating out": "Food & Dining",
+    "takeout": "Food & Dining",
+    "grocery": "Groceries",
+    "groceries": "Groceries",
+    "cab": "Transport",
+    "cabs": "Transport",
+    "taxi": "Transport",
+    "fuel": "Transport",
+    "petrol": "Transport",
+    "travel": "Travel",
+    "bills": "Utilities",
+    "electricity": "Utilities",
+    "movies": "Entertainment",
+    "subscriptions": "Entertainment",
+    "salaries": "Salary",
+    "payroll": "Salary",
+    "stock": "Inventory",
+}
+
+MONTHS = {name.lower(): idx for idx, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): idx for idx, name in enumerate(calendar.month_abbr) if name})
+
+# Words that end a merchant name or can never be one
+PERIOD_WORDS = {
+    "date", "now", "today", "yesterday", "day", "days", "week", "weeks", "month", "months", "year", "years",
+    "last", "this", "past", "previous", "next",
+} | set(MONTHS)
+
+_MERCHANT_STOPWORDS = (
+    r"(?=\s+(?:in|last|this|during|since|over|for|on|between|from|to|till|until|through|today|yesterday|so far|"
+    + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\b|[?.!,]|$)"
+)
+
+
+class StructuredQueryEngine:
+    """Intent router and SQL aggregate engine for chat questions"""
+
+    def __init__(self):
+        self._aggregate_patterns = {
+            metric: re.compile(pattern) for metric, pattern in AGGREGATE_PATTERNS.items()
+        }
+        self._aggregate_subject = re.compile(AGGREGATE_SUBJECT)
+        self._merchant_pattern = re.compile(r"\b(?:at|from|to)\s+([a-z0-9&'. -]+?)" + _MERCHANT_STOPWORDS)
+
+    def parse(
+        self,
+        query: str,
+        categories: List[str],
+        now: Optional[datetime] = None
+    ) -> Optional[Dict]:
+        """
+        Parse an aggregate or time-range question into a query plan
+
+        Args:
+            query: User's question
+            categories: Categories that exist for this user
+            now: Reference time (defaults to utcnow)
+
+        Returns: Plan dict, or None for open-ended questions
+        """
+        query_lower = query.lower().strip()
+        now = now or datetime.utcnow()
+
+        metric = None
+        for name, pattern in self._aggregate_patterns.items():
+            if pattern.search(query_lower):
+                metric = name
+                break
+
+        if metric is None:
+            return None
+
+        category = self._match_category(query_lower, categories)
+        merchant = None if category else self._match_merchant(query_lower)
+
+        # "How much" alone is not enough: the question must be about spending, a category or a merchant
+        if not (category or merchant or self._aggregate_subject.search(query_lower)):
+            return None
+
+        start, end, period = self._parse_time_range(query_lower, now)
+
+        plan = {
+            "metric": metric,
+            "start": start,
+            "end": end,
+            "period": period,
+            "category": category,
+            "merchant": merchant,
+        }
+        logger.info(f"Structured query plan: {plan}")
+        return plan
+
+    def plan_key(self, plan: Dict) -> str:
+        """Cache key identifying the aggregate a plan computes"""
+        start = plan["start"].date().isoformat() if plan["start"] else ""
+        return "|".join([
+            plan["metric"], plan["category"] or "", plan["merchant"] or "", plan["period"], start
+        ])
+
+    def execute(
+        self,
+        plan: Dict,
+        db: Session,
+        user_id: int,
+        user_type: str,
+        sample_size: int = 5
+    ) -> Dict:
+        """
+        Run the plan as SQL aggregates over the user's transactions
+
+        Returns: {
+            "period", "category", "merchant",
+            "transaction_count", "total_amount", "average_amount",
+            "min_amount", "max_amount",
+            "categories": [...], "top_merchants": [...],
+            "transactions": [context dicts for the largest matching rows]
+        }
+        """
+        query = self._base_query(db, user_id, user_type, plan)
+
+        count, total, avg, min_amount, max_amount = query.with_entities(
+            func.count(Transaction.id),
+            func.sum(Transaction.amount),
+            func.avg(Transaction.amount),
+            func.min(Transaction.amount),
+            func.max(Transaction.amount)
+        ).one()
+        total = float(total or 0.0)
+
+        categories = category_breakdown(query, total)
+        merchants = merchant_breakdown(query, limit=5)
+
+        largest = query.order_by(Transaction.amount.desc()).limit(sample_size).all()
+        transactions = [
+            {
+                "id": tx.id,
+                "amount": tx.amount,
+                "merchant": tx.merchant_name_raw,
+                "category": tx.category,
+                "date": tx.date.isoformat(),
+                "payment_channel": tx.payment_channel.value,
+                "summary": f"Transaction of ₹{tx.amount} at {tx.merchant_name_raw} on {tx.date.strftime('%Y-%m-%d')}",
+                "relevance_score": 1.0
+            }
+            for tx in largest
+        ]
+
+        return {
+            "metric": plan["metric"],
+            "period": plan["period"],
+            "start": plan["start"].isoformat() if plan["start"] else None,
+            "end": plan["end"].isoformat() if plan["end"] else None,
+            "category": plan["category"],
+            "merchant": plan["merchant"],
+            "transaction_count": count,
+            "total_amount": round(total, 2),
+            "average_amount": round(float(avg or 0.0), 2),
+            "min_amount": round(float(min_amount or 0.0), 2),
+            "max_amount": round(float(max_amount or 0.0), 2),
+            "categories": sorted(categories, key=lambda x: x["total"], reverse=True),
+            "top_merchants": merchants,
+            "transactions": transactions,
+        }
+
+    def user_categories(self, db: Session, user_id: int, user_type: str) -> List[str]:
+        """Distinct categories present in a user's transactions"""
+        if user_type == "consumer":
+            owner_filter = Transaction.user_consumer_id == user_id
+        else:
+            owner_filter = Transaction.user_business_id == user_id
+
+        rows = db.query(Transaction.category).filter(owner_filter).distinct().all()
+        return [row[0] for row in rows if row[0]]
+
+    def _base_query(self, db: Session, user_id: int, user_type: str, plan: Dict) -> Query:
+        """User-scoped transaction query with the plan's filters applied"""
+        if user_type == "consumer":
+            query = db.query(Transaction).filter(Transaction.user_consumer_id == user_id)
+        else:
+            query = db.query(Transaction).filter(Transaction.user_business_id == user_id)
+
+        if plan.get("start"):
+            query = query.filter(Transaction.date >= plan["start"])
+        if plan.get("end"):
+            query = query.filter(Transaction.date < plan["end"])
+        if plan.get("category"):
+            query = query.filter(Transaction.category == plan["category"])
+        if plan.get("merchant"):
+            pattern = re.sub(r"([\\%_])", r"\\\1", plan["merchant"])
+            query = query.filter(Transaction.merchant_name_raw.ilike(f"%{pattern}%", escape="\\"))
+
+        return query
+
+    def _parse_time_range(
+        self,
+        query_lower: str,
+        now: datetime
+    ) -> Tuple[Optional[datetime], Optional[datetime], str]:
+        """Return (start, end, label); end is exclusive"""
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        if re.search(r"\btoday\b", query_lower):
+            return today, today + timedelta(days=1), "today"
+
+        if re.search(r"\byesterday\b", query_lower):
+            return today - timedelta(days=1), today, "yesterday"
+
+        match = re.search(r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b", query_lower)
+        if match:
+            amount, unit = int(match.group(1)), match.group(2)
+            days = {"day": 1, "week": 7, "month": 30, "year": 365}[unit] * amount
+            return now - timedelta(days=days), None, f"last {amount} {unit}s"
+
+        week_start = today - timedelta(days=today.weekday())
+        if re.search(r"\bthis week\b", query_lower):
+            return week_start, None, "this week"
+        if re.search(r"\blast week\b", query_lower):
+            return week_start - timedelta(days=7), week_start, "last week"
+
+        month_start = today.replace(day=1)
+        if re.search(r"\bthis month\b", query_lower):
+            return month_start, None, "this month"
+        if re.search(r"\blast month\b", query_lower):
+            previous = (month_start - timedelta(days=1)).replace(day=1)
+            return previous, month_start, "last month"
+
+        year_start = today.replace(month=1, day=1)
+        if re.search(r"\bthis year\b", query_lower):
+            return year_start, None, "this year"
+        if re.search(r"\blast year\b", query_lower):
+            return year_start.replace(year=year_start.year - 1), year_start, "last year"
+
+        month_names = "|".join(sorted(MONTHS, key=len, reverse=True))
+        match = re.search(
+            r"\b(?:from|between)\s+(" + month_names + r")\s+(?:to|till|until|through|and)\s+(" + month_names + r")\b",
+            query_lower
+        )
+        if match:
+            first, last = MONTHS[match.group(1)], MONTHS[match.group(2)]
+            year = today.year if last <= today.month else today.year - 1
+            start = datetime(year if first <= last else year - 1, first, 1)
+            end = datetime(year + 1, 1, 1) if last == 12 else datetime(year, last + 1, 1)
+            return start, end, f"{calendar.month_name[first]} to {calendar.month_name[last]} {year}"
+
+        match = re.search(r"\b(?:in|during|for)\s+(" + month_names + r")\b", query_lower)
+        if match:
+            month = MONTHS[match.group(1)]
+            year = today.year if month <= today.month else today.year - 1
+            start = datetime(year, month, 1)
+            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+            return start, end, f"{calendar.month_name[month]} {year}"
+
+        return None, None, "all time"
+
+    def _match_category(self, query_lower: str, categories: List[str]) -> Optional[str]:
+        """Match a category by name, name token or synonym"""
+        by_lower = {category.lower(): category for category in categories}
+
+        for category_lower, category in by_lower.items():
+            if re.search(r"\b" + re.escape(category_lower) + r"\b", query_lower):
+                return category
+
+        for synonym, target in CATEGORY_SYNONYMS.items():
+            if target.lower() in by_lower and re.search(r"\b" + re.escape(synonym) + r"\b", query_lower):
+                return by_lower[target.lower()]
+
+        for category_lower, category in by_lower.items():
+            for token in re.findall(r"[a-z]{4,}", category_lower):
+                if re.search(r"\b" + token + r"\b", query_lower):
+                    return category
+
+        return None
+
+    def _match_merchant(self, query_lower: str) -> Optional[str]:
+        """Extract a merchant name from "at/from/to <merchant>" phrases"""
+        match = self._merchant_pattern.search(query_lower)
+        if not match:
+            return None
+
+        merchant = match.group(1).strip(" .'")
+        if not merchant or merchant in ("all", "me", "my", "the"):
+            return None
+        if merchant.split()[0] in PERIOD_WORDS:
+            return None
+        return merchant
+
+
+def category_breakdown(query: Query, total_amount: float) -> List[Dict]:
+    """Per-category count and total - same grouping as /transactions/stats"""
+    category_stats = query.with_entities(
+        Transaction.category,
+        func.count(Transaction.id).label('count'),
+        func.sum(Transaction.amount).label('total')
+    ).group_by(Transaction.category).all()
+
+    return [
+        {
+            "category": cat,
+            "count": count,
+            "total": float(total),
+            "percentage": (float(total) / total_amount * 100) if total_amount > 0 else 0
+        }
+        for cat, count, total in category_stats
+    ]
+
+
+def merchant_breakdown(query: Query, limit: int = 10) -> List[Dict]:
+    """Top merchants by total spend - same grouping as /transactions/stats"""
+    top_merchants = query.with_entities(
+        Transaction.merchant_name_raw,
+        func.count(Transaction.id).label('count'),
+        func.sum(Transaction.amount).label('total')
+    ).group_by(Transaction.merchant_name_raw)\
+     .order_by(func.sum(Transaction.amount).desc())\
+     .limit(limit).all()
+
+    return [
+        {
+            "merchant": merchant,
+            "transaction_count": count,
+            "total_spent": float(total)
+        }
+        for merchant, count, total in top_merchants
+    ]
+
+
+# Global instance
+query_engine = StructuredQueryEngine()
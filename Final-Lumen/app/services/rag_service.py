@@ -16,6 +16,7 @@ from app.models.transaction import Transaction
 from app.models.chat import ChatSession, ChatMemory, ChatMessage
 from app.models.rag import RAGIndex
 from app.services.gemini_service import gemini_service
+from app.services.semantic_cache import semantic_cache
 
 logger = logging.getLogger(__name__)
 
@@ -128,25 +129,61 @@ class RAGService:
             # Add to FAISS index
             self._add_to_faiss(user_id, user_type, doc_id, embedding)
             
+            # New data for this user - cached chat answers are stale
+            semantic_cache.invalidate_user(user_id, user_type)
+            
             logger.info(f"Indexed transaction {transaction.id}")
         
         except Exception as e:
             logger.error(f"Transaction indexing error: {e}")
             db.rollback()
     
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """Embed a query, or return None if the embedding model is unavailable"""
+        try:
+            if self.embedding_model is None:
+                return None
+            return self.embedding_model.encode(query)
+        except Exception as e:
+            logger.error(f"Query embedding error: {e}")
+            return None
+    
     def retrieve_context(
         self,
         query: str,
         user_id: int,
         user_type: str,
         db: Session,
-        top_k: int = 5
+        top_k: int = 5,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict]:
         """
         Retrieve relevant documents for a query using hybrid retrieval
         
+        Async callers should run search() in the thread pool and only
+        fetch_context() on the session, since the search is CPU-bound.
+        
+        Args:
+            query_embedding: Precomputed embedding of the query (optional)
+        
         Returns: List of relevant transaction summaries
         """
+        hits = self.search(query, user_id, user_type, top_k=top_k, query_embedding=query_embedding)
+        return self.fetch_context(db, hits)
+    
+    def search(
+        self,
+        query: str,
+        user_id: int,
+        user_type: str,
+        top_k: int = 5,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Nearest indexed documents for a query (no database access)
+        
+        Returns: [(doc_id, distance)], closest first
+        """
         try:
             # Check if embedding model is available
             if self.embedding_model is None:
@@ -160,44 +197,57 @@ class RAGService:
                 return []
             
             # Generate query embedding
-            query_embedding = self.embedding_model.encode(query)
+            if query_embedding is None:
+                query_embedding = self.embedding_model.encode(query)
             
-            # Retrieve from FAISS
             user_key = f"{user_type}_{user_id}"
-            retrieved_docs = []
             
             # Load index if not in memory
             if user_key not in self.indices:
                 self._load_index(user_key)
             
-            if user_key in self.indices:
-                index = self.indices[user_key]
-                doc_mapping = self.doc_mappings[user_key]
-                
-                # Search
-                distances, indices = index.search(np.array([query_embedding]), min(top_k, index.ntotal))
+            if user_key not in self.indices:
+                return []
+            
+            index = self.indices[user_key]
+            doc_mapping = self.doc_mappings[user_key]
+            
+            # Search
+            distances, indices = index.search(np.array([query_embedding]), min(top_k, index.ntotal))
+            
+            # -1 means no result
+            return [
+                (doc_mapping[idx], float(dist))
+                for dist, idx in zip(distances[0], indices[0])
+                if idx != -1 and idx in doc_mapping
+            ]
+        
+        except Exception as e:
+            logger.error(f"Context retrieval error: {e}")
+            return []
+    
+    def fetch_context(self, db: Session, hits: List[Tuple[str, float]]) -> List[Dict]:
+        """Transaction context for search() hits, in hit order"""
+        try:
+            retrieved_docs = []
+            for doc_id, dist in hits:
+                # Fetch from database
+                rag_doc = db.query(RAGIndex).filter(RAGIndex.doc_id == doc_id).first()
                 
-                for dist, idx in zip(distances[0], indices[0]):
-                    if idx != -1 and idx in doc_mapping:  # -1 means no result
-                        doc_id = doc_mapping[idx]
-                        
-                        # Fetch from database
-                        rag_doc = db.query(RAGIndex).filter(RAGIndex.doc_id == doc_id).first()
-                        
-                        if rag_doc and rag_doc.transaction_id:
-                            transaction = db.query(Transaction).filter(Transaction.id == rag_doc.transaction_id).first()
-                            
-                            if transaction:
-                                retrieved_docs.append({
-                                    "id": transaction.id,
-                                    "amount": transaction.amount,
-                                    "merchant": transaction.merchant_name_raw,
-                                    "category": transaction.category,
-                                    "date": transaction.date.isoformat(),
-                                    "payment_channel": transaction.payment_channel.value,
-                                    "summary": rag_doc.doc_summary,
-                                    "relevance_score": float(1.0 / (1.0 + dist))  # Convert distance to similarity
-                                })
+                if rag_doc and rag_doc.transaction_id:
+                    transaction = db.query(Transaction).filter(Transaction.id == rag_doc.transaction_id).first()
+                    
+                    if transaction:
+                        retrieved_docs.append({
+                            "id": transaction.id,
+                            "amount": transaction.amount,
+                            "merchant": transaction.merchant_name_raw,
+                            "category": transaction.category,
+                            "date": transaction.date.isoformat(),
+                            "payment_channel": transaction.payment_channel.value,
+                            "summary": rag_doc.doc_summary,
+                            "relevance_score": float(1.0 / (1.0 + dist))  # Convert distance to similarity
+                        })
             
             logger.info(f"Retrieved {len(retrieved_docs)} documents for query")
             return retrieved_docs
@@ -419,12 +469,15 @@ Source: {transaction.source_type.value}
             mapping_path = os.path.join(settings.VECTOR_STORE_PATH, f"{user_key}_mapping.json")
             
             if os.path.exists(index_path) and os.path.exists(mapping_path):
-                self.indices[user_key] = faiss_module.read_index(index_path)
+                index = faiss_module.read_index(index_path)
                 
                 with open(mapping_path, 'r') as f:
                     json_mapping = json.load(f)
-                    # Convert string keys back to int
-                    self.doc_mappings[user_key] = {int(k): v for k, v in json_mapping.items()}
+                
+                # Mapping first: search() may run concurrently in the thread pool
+                # Convert string keys back to int
+                self.doc_mappings[user_key] = {int(k): v for k, v in json_mapping.items()}
+                self.indices[user_key] = index
                 
                 logger.info(f"Loaded FAISS index for {user_key}")
         
@@ -0,0 +1,332 @@
+"""
+Dashboard Response Cache
+Per-user cache of the read-heavy GET endpoints with ETag revalidation
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+
+from app.core.config import settings
+from app.models.transaction import Transaction
+from app.models.user import UserConsumer, UserBusiness
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Invalidation scopes: the data a cached endpoint is built from
+TRANSACTIONS = "transactions"
+PROFILE = "profile"
+ACCOUNT = "account"  # Any user row change; versions the authenticated user snapshots in user_cache
+
+# Columns served by /users/me; other user writes (e.g. last_active) keep it cached
+_PROFILE_FIELDS = {
+    UserConsumer: ("name", "email", "phone", "location", "avatar_url"),
+    UserBusiness: ("business_name", "contact_person", "email", "phone", "location", "avatar_url", "gstin"),
+}
+
+_KEY_PREFIX = "lumen:rc"
+_PENDING = "response_cache_pending"
+
+
+class LocalCacheBackend:
+    """
+    In-memory stand-in for the shared backend
+
+    Same interface as RedisCacheBackend, for tests and single-process runs
+    that should exercise the shared code path without a Redis server.
+    """
+
+    def __init__(self):
+        self._entries = LRUCache(max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: int):
+        self._entries.set(key, value, ttl_seconds=ttl_seconds)
+
+    def counters(self, keys: List[str]) -> List[int]:
+        return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key: str):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+
+class RedisCacheBackend:
+    """Redis backend, so all API processes share entries and invalidations"""
+
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: int):
+        self._client.set(key, value, ex=ttl_seconds)
+
+    def counters(self, keys: List[str]) -> List[int]:
+        return [int(value or 0) for value in self._client.mget(keys)]
+
+    def incr(self, key: str):
+        self._client.incr(key)
+
+
+class ResponseCache:
+    """
+    Caches JSON responses per user, endpoint and parameters
+
+    Keys include the user's data version for the endpoint's scope, and
+    invalidation bumps that version: stale entries are never read again and
+    age out of the LRU (or the Redis TTL). Invalidation is driven by the ORM
+    session - committing new, changed or deleted transactions invalidates
+    the owner's TRANSACTIONS scope, and changing a served profile field
+    invalidates PROFILE. Bulk UPDATE/INSERT statements bypass the session
+    and are only picked up when the TTL expires.
+
+    With RESPONSE_CACHE_BACKEND=redis the in-process LRU sits in front of
+    Redis and versions are read from Redis, so invalidations are seen by
+    every process. With "none" (or "local") versions are per process, which
+    is only correct for a single worker: when WEB_CONCURRENCY > 1 and Redis
+    is not in use the cache switches itself off, since a write handled by
+    one worker would not invalidate the others.
+
+    Responses carry a strong ETag over the body; a request whose
+    If-None-Match matches gets an empty 304.
+    """
+
+    def __init__(self):
+        self._local = LRUCache(
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+            max_weight=settings.RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+            weigher=lambda entry: len(entry[1])
+        )
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._shared = None
+        self._shared_loaded = False
+        self._warned_per_process = False
+        self.not_modified = 0
+
+    def _shared_backend(self):
+        """Configured shared backend, created on first use (None if not configured or unavailable)"""
+        if not self._shared_loaded:
+            with self._lock:
+                if not self._shared_loaded:
+                    backend = settings.RESPONSE_CACHE_BACKEND
+                    try:
+                        if backend == "redis":
+                            self._shared = RedisCacheBackend(settings.RESPONSE_CACHE_REDIS_URL)
+                        elif backend == "local":
+                            self._shared = LocalCacheBackend()
+                    except Exception as e:
+                        logger.error(f"Response cache backend '{backend}' unavailable, using in-process cache only: {e}")
+                    self._shared_loaded = True
+        return self._shared
+
+    def shares_invalidations(self) -> bool:
+        """Whether an invalidation reaches every worker process (Redis, or a single worker)"""
+        return settings.WEB_CONCURRENCY <= 1 or isinstance(self._shared_backend(), RedisCacheBackend)
+
+    def enabled(self) -> bool:
+        """RESPONSE_CACHE_ENABLED, unless invalidations would stay inside one of several workers"""
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return False
+        if not self.shares_invalidations():
+            if not self._warned_per_process:
+                logger.warning(
+                    f"Response cache disabled: backend '{settings.RESPONSE_CACHE_BACKEND}' is per process "
+                    f"and WEB_CONCURRENCY={settings.WEB_CONCURRENCY}; use RESPONSE_CACHE_BACKEND=redis"
+                )
+                self._warned_per_process = True
+            return False
+        return True
+
+    @staticmethod
+    def _user_key(user_id: int, user_type: str) -> str:
+        return f"{user_type}_{user_id}"
+
+    @staticmethod
+    def _version_key(scope: str, user_key: str) -> str:
+        return f"{_KEY_PREFIX}:version:{scope}:{user_key}"
+
+    def key(self, endpoint: str, scope: str, user_id: int, user_type: str, **params) -> Optional[str]:
+        """
+        Cache key for a request, or None when caching is off
+
+        Build the key before reading from the database: data invalidated
+        while the response is built is then stored under a version that is
+        never read.
+        """
+        if not self.enabled():
+            return None
+
+        version = self.version(scope, user_id, user_type)
+        if version is None:
+            return None
+
+        user_key = self._user_key(user_id, user_type)
+        query = "&".join(f"{name}={params[name]}" for name in sorted(params))
+        return f"{_KEY_PREFIX}:{endpoint}:{user_key}:v{version}:{query}"
+
+    def version(self, scope: str, user_id: int, user_type: str) -> Optional[int]:
+        """Current data version of a user's scope (None if the shared backend cannot be read)"""
+        version_key = self._version_key(scope, self._user_key(user_id, user_type))
+        shared = self._shared_backend()
+        if shared is None:
+            return self._versions.get(version_key, 0)
+        try:
+            return shared.counters([version_key])[0]
+        except Exception as e:
+            logger.warning(f"Cache version lookup failed, not caching: {e}")
+            return None
+
+    def lookup(self, request: Request, key: Optional[str]) -> Optional[Response]:
+        """Cached response (or 304) for a key, or None on a miss"""
+        if key is None:
+            return None
+
+        entry = self._local.get(key)
+        if entry is None:
+            shared = self._shared_backend()
+            if shared is not None:
+                try:
+                    raw = shared.get(key)
+                except Exception as e:
+                    logger.warning(f"Response cache read failed: {e}")
+                    raw = None
+                if raw:
+                    etag, body = raw.split(b"\n", 1)
+                    entry = (etag.decode(), body)
+                    self._local.set(key, entry)
+
+        if entry is None:
+            return None
+        return self._response(request, *entry)
+
+    def store(self, request: Request, key: Optional[str], payload: Any) -> Response:
+        """
+        Serialize a payload, cache it under key (if any) and return the response
+
+        Pydantic models are dumped directly to JSON; anything else goes
+        through jsonable_encoder.
+        """
+        if isinstance(payload, BaseModel):
+            body = payload.model_dump_json().encode()
+        else:
+            body = JSONResponse(content=jsonable_encoder(payload)).body
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+        if key is not None:
+            self._local.set(key, (etag, body))
+            shared = self._shared_backend()
+            if shared is not None:
+                try:
+                    shared.set(key, etag.encode() + b"\n" + body, settings.RESPONSE_CACHE_TTL_SECONDS)
+                except Exception as e:
+                    logger.warning(f"Response cache write failed: {e}")
+
+        return self._response(request, etag, body)
+
+    def _response(self, request: Request, etag: str, body: bytes) -> Response:
+        # no-cache: clients may keep the body but must revalidate with If-None-Match
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if self._matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    @staticmethod
+    def _matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == etag:
+                return True
+        return False
+
+    def invalidate_user(self, user_id: int, user_type: str, scopes: Iterable[str] = (TRANSACTIONS, PROFILE)):
+        """Bump the user's data version for each scope, dropping their cached responses"""
+        user_key = self._user_key(user_id, user_type)
+        shared = self._shared_backend()
+        for scope in scopes:
+            version_key = self._version_key(scope, user_key)
+            if shared is not None:
+                try:
+                    shared.incr(version_key)
+                except Exception as e:
+                    logger.error(f"Response cache invalidation failed for {user_key} ({scope}): {e}")
+            else:
+                with self._lock:
+                    self._versions[version_key] = self._versions.get(version_key, 0) + 1
+
+    def stats(self) -> Dict:
+        """Cache statistics for instrumentation"""
+        return {
+            "backend": settings.RESPONSE_CACHE_BACKEND,
+            "enabled": self.enabled(),
+            "local": self._local.stats(),
+            "not_modified": self.not_modified
+        }
+
+
+# Global instance
+response_cache = ResponseCache()
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_invalidations(session, flush_context, instances):
+    """Note which users' cached responses the flushed changes affect"""
+    affected = set()
+
+    def add_owner(transaction: Transaction):
+        if transaction.user_consumer_id is not None:
+            affected.add(("consumer", transaction.user_consumer_id, TRANSACTIONS))
+        elif transaction.user_business_id is not None:
+            affected.add(("business", transaction.user_business_id, TRANSACTIONS))
+
+    for target in session.new:
+        if isinstance(target, Transaction):
+            add_owner(target)
+    for target in session.deleted:
+        if isinstance(target, Transaction):
+            add_owner(target)
+
+    for target in session.dirty:
+        if isinstance(target, Transaction):
+            if session.is_modified(target, include_collections=False):
+                add_owner(target)
+        elif type(target) in _PROFILE_FIELDS and any(
+            attributes.get_history(target, name, passive=attributes.PASSIVE_NO_INITIALIZE).has_changes()
+            for name in _PROFILE_FIELDS[type(target)]
+        ):
+            user_type = "consumer" if isinstance(target, UserConsumer) else "business"
+            affected.add((user_type, target.id, PROFILE))
+
+    if affected:
+        session.info.setdefault(_PENDING, set()).update(affected)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session):
+    for user_type, user_id, scope in session.info.pop(_PENDING, ()):
+        response_cache.invalidate_user(user_id, user_type, (scope,))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,172 @@
+"""
+Semantic Response Cache for the chatbot
+Serves near-duplicate questions without calling Gemini
+"""
+
+import numpy as np
+from typing import Dict, List, Optional
+import threading
+import time
+import logging
+
+from app.core.config import settings
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticResponseCache:
+    """
+    Per-user cache of chat responses keyed by query embedding
+
+    An entry is served when a new query embedding has cosine similarity
+    above CHAT_CACHE_SIMILARITY_THRESHOLD with a cached query and the
+    user's data version has not changed since the entry was stored.
+    Entries stored with a key (e.g. an aggregate query plan) are only
+    served to lookups with the same key.
+    The data version is bumped whenever a transaction is indexed for
+    the user (see RAGService.index_transaction).
+    """
+
+    def __init__(self):
+        # {user_key: {"embeddings": np.ndarray, "entries": [dict]}}
+        self._users = LRUCache(max_entries=settings.CHAT_CACHE_MAX_USERS)
+        self._versions = {}  # {user_key: int}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _user_key(user_id: int, user_type: str) -> str:
+        return f"{user_type}_{user_id}"
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def data_version(self, user_id: int, user_type: str) -> int:
+        """Current data version for a user"""
+        return self._versions.get(self._user_key(user_id, user_type), 0)
+
+    def invalidate_user(self, user_id: int, user_type: str):
+        """Bump the user's data version and drop their cached responses"""
+        user_key = self._user_key(user_id, user_type)
+        with self._lock:
+            self._versions[user_key] = self._versions.get(user_key, 0) + 1
+            self._users.pop(user_key)
+
+    def lookup(
+        self,
+        user_id: int,
+        user_type: str,
+        query_embedding,
+        key: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Find a cached response for a semantically similar query with the same key
+
+        Returns: {"response": dict, "context": list, "similarity": float} or None
+        """
+        if not settings.CHAT_CACHE_ENABLED or query_embedding is None:
+            return None
+
+        query_vector = self._normalize(query_embedding)
+        if query_vector is None:
+            return None
+
+        user_key = self._user_key(user_id, user_type)
+        bucket = self._users.get(user_key)
+        if not bucket or not bucket["entries"]:
+            return None
+
+        version = self.data_version(user_id, user_type)
+        now = time.time()
+
+        similarities = bucket["embeddings"] @ query_vector
+        for idx in np.argsort(similarities)[::-1]:
+            similarity = float(similarities[idx])
+            if similarity < settings.CHAT_CACHE_SIMILARITY_THRESHOLD:
+                break
+
+            entry = bucket["entries"][idx]
+            if entry["version"] != version or entry.get("key") != key:
+                continue
+            if now - entry["created_at"] > settings.CHAT_CACHE_TTL_SECONDS:
+                continue
+
+            logger.info(f"Semantic cache hit for {user_key} (similarity={similarity:.3f})")
+            return {
+                "response": entry["response"],
+                "context": entry["context"],
+                "similarity": similarity
+            }
+
+        return None
+
+    def store(
+        self,
+        user_id: int,
+        user_type: str,
+        query_embedding,
+        response: Dict,
+        context: List[Dict],
+        version: Optional[int] = None,
+        key: Optional[str] = None
+    ):
+        """
+        Cache a generated response
+
+        Pass the data version read before retrieval so a response built from
+        data that was invalidated mid-request is never served.
+        """
+        if not settings.CHAT_CACHE_ENABLED or query_embedding is None:
+            return
+
+        query_vector = self._normalize(query_embedding)
+        if query_vector is None:
+            return
+
+        user_key = self._user_key(user_id, user_type)
+        current_version = self.data_version(user_id, user_type)
+        if version is None:
+            version = current_version
+        elif version != current_version:
+            return
+        now = time.time()
+
+        with self._lock:
+            bucket = self._users.get(user_key) or {"embeddings": None, "entries": []}
+
+            # Keep only entries that can still be served
+            live = [
+                i for i, entry in enumerate(bucket["entries"])
+                if entry["version"] == version and now - entry["created_at"] <= settings.CHAT_CACHE_TTL_SECONDS
+            ]
+            live = live[-(settings.CHAT_CACHE_MAX_ENTRIES_PER_USER - 1):] if settings.CHAT_CACHE_MAX_ENTRIES_PER_USER > 1 else []
+
+            entries = [bucket["entries"][i] for i in live]
+            vectors = [bucket["embeddings"][i] for i in live]
+
+            entries.append({
+                "version": version,
+                "key": key,
+                "created_at": now,
+                "response": response,
+                "context": context
+            })
+            vectors.append(query_vector)
+
+            self._users.set(user_key, {
+                "embeddings": np.vstack(vectors),
+                "entries": entries
+            })
+
+    def stats(self) -> Dict:
+        """Cache statistics for instrumentation"""
+        return self._users.stats()
+
+
+# Global instance
+semantic_cache = SemanticResponseCache()
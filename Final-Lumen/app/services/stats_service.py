@@ -0,0 +1,168 @@
+"""
+Transaction Statistics Service
+Dashboard aggregates for /transactions/stats
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import logging
+from sqlalchemy import func, case, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.rollup import TransactionRollup
+from app.models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+TOP_MERCHANTS = 10
+
+# (key, count, total, flagged, confirmed) per dimension
+Groups = Dict[str, List[Tuple]]
+
+
+class StatsService:
+    """
+    Builds the /transactions/stats payload
+
+    from_rollups reads the daily rollups (whole days, cheapest). live scans
+    the user's transactions once for an exact timestamp window: GROUPING SETS
+    with FILTER aggregates on PostgreSQL, and one GROUP BY over all three
+    dimensions folded in Python elsewhere. Both return the same shape.
+    """
+
+    def from_rollups(self, db: Session, user_id: int, user_type: str, days: int) -> Dict:
+        """
+        Aggregates over the daily rollups in one grouped query
+
+        The window covers whole days: from the UTC day `days` ago through today.
+        """
+        since = (datetime.utcnow() - timedelta(days=days)).date()
+        rows = db.query(
+            TransactionRollup.dimension,
+            TransactionRollup.key,
+            func.sum(TransactionRollup.transaction_count),
+            func.sum(TransactionRollup.total_amount),
+            func.sum(TransactionRollup.flagged_count),
+            func.sum(TransactionRollup.confirmed_count)
+        ).filter(
+            TransactionRollup.user_type == user_type,
+            TransactionRollup.user_id == user_id,
+            TransactionRollup.day >= since
+        ).group_by(TransactionRollup.dimension, TransactionRollup.key).all()
+
+        groups = {"category": [], "merchant": [], "channel": []}
+        for dimension, key, count, total, flagged, confirmed in rows:
+            if count:
+                groups[dimension].append((key or None, int(count), float(total or 0.0), int(flagged or 0), int(confirmed or 0)))
+
+        # Every transaction has exactly one channel row per day
+        totals = tuple(sum(row[i] for row in groups["channel"]) for i in range(1, 5))
+        return self._payload(groups, totals)
+
+    def live(self, db: Session, user_id: int, user_type: str, days: int) -> Dict:
+        """Exact aggregates for transactions dated within the last `days` days, in one statement"""
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        owner_column = Transaction.user_consumer_id if user_type == "consumer" else Transaction.user_business_id
+        filters = (owner_column == user_id, Transaction.date >= cutoff_date)
+
+        if db.bind.dialect.name == "postgresql":
+            return self._live_grouping_sets(db, filters)
+        return self._live_fallback(db, filters)
+
+    def _live_grouping_sets(self, db: Session, filters) -> Dict:
+        dimensions = (Transaction.category, Transaction.merchant_name_raw, Transaction.payment_channel)
+        rows = db.query(
+            *dimensions,
+            func.grouping(*dimensions).label("grouping_id"),
+            func.count(Transaction.id),
+            func.sum(Transaction.amount),
+            func.count(Transaction.id).filter(Transaction.flagged == True),
+            func.count(Transaction.id).filter(Transaction.confirmed == True)
+        ).filter(*filters).group_by(
+            func.grouping_sets(
+                tuple_(Transaction.category),
+                tuple_(Transaction.merchant_name_raw),
+                tuple_(Transaction.payment_channel),
+                tuple_()
+            )
+        ).all()
+
+        # GROUPING() sets a bit for each dimension rolled up (category is the high bit)
+        by_grouping = {0b011: "category", 0b101: "merchant", 0b110: "channel"}
+        groups = {"category": [], "merchant": [], "channel": []}
+        totals = (0, 0.0, 0, 0)
+        for category, merchant, channel, grouping_id, count, total, flagged, confirmed in rows:
+            measures = (int(count), float(total or 0.0), int(flagged), int(confirmed))
+            if grouping_id == 0b111:
+                totals = measures
+                continue
+            dimension = by_grouping[grouping_id]
+            key = {"category": category, "merchant": merchant, "channel": self._channel(channel)}[dimension]
+            groups[dimension].append((key, *measures))
+
+        return self._payload(groups, totals)
+
+    def _live_fallback(self, db: Session, filters) -> Dict:
+        """One GROUP BY over (category, merchant, channel), folded into each dimension"""
+        rows = db.query(
+            Transaction.category,
+            Transaction.merchant_name_raw,
+            Transaction.payment_channel,
+            func.count(Transaction.id),
+            func.sum(Transaction.amount),
+            func.sum(case((Transaction.flagged == True, 1), else_=0)),
+            func.sum(case((Transaction.confirmed == True, 1), else_=0))
+        ).filter(*filters).group_by(
+            Transaction.category,
+            Transaction.merchant_name_raw,
+            Transaction.payment_channel
+        ).all()
+
+        folded = {dimension: defaultdict(lambda: [0, 0.0, 0, 0]) for dimension in ("category", "merchant", "channel")}
+        totals = [0, 0.0, 0, 0]
+        for category, merchant, channel, count, total, flagged, confirmed in rows:
+            measures = (int(count), float(total or 0.0), int(flagged or 0), int(confirmed or 0))
+            for dimension, key in (("category", category), ("merchant", merchant), ("channel", self._channel(channel))):
+                for i, measure in enumerate(measures):
+                    folded[dimension][key][i] += measure
+            for i, measure in enumerate(measures):
+                totals[i] += measure
+
+        groups = {
+            dimension: [(key, *measures) for key, measures in values.items()]
+            for dimension, values in folded.items()
+        }
+        return self._payload(groups, tuple(totals))
+
+    @staticmethod
+    def _channel(channel) -> str:
+        return str(getattr(channel, "value", channel))
+
+    @staticmethod
+    def _payload(groups: Groups, totals: Tuple) -> Dict:
+        total_count, total_amount, flagged_count, confirmed_count = totals
+        return {
+            "total_count": total_count,
+            "total_amount": total_amount,
+            "flagged_count": flagged_count,
+            "confirmed_count": confirmed_count,
+            "categories": [
+                {
+                    "category": category,
+                    "count": count,
+                    "total": total,
+                    "percentage": (total / total_amount * 100) if total_amount > 0 else 0
+                }
+                for category, count, total, _, _ in groups["category"]
+            ],
+            "top_merchants": [
+                {"merchant": merchant, "transaction_count": count, "total_spent": total}
+                for merchant, count, total, _, _ in sorted(groups["merchant"], key=lambda row: row[2], reverse=True)[:TOP_MERCHANTS]
+            ],
+            "channels": {channel: count for channel, count, _, _, _ in groups["channel"]}
+        }
+
+
+# Global instance
+stats_service = StatsService()
@@ -0,0 +1,279 @@
+"""
+Authenticated User Cache
+Token and user snapshot caching for get_current_user, plus batched
+last_active writes
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from sqlalchemy import bindparam, event, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.user import UserConsumer, UserBusiness
+from app.services.response_cache import ACCOUNT, response_cache
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+USER_MODELS = {"consumer": UserConsumer, "business": UserBusiness}
+
+_PENDING = "user_cache_pending"
+
+
+def load_user(db: Session, user_id: int, user_type: str):
+    """The user row itself (for endpoints that modify the user)"""
+    model = USER_MODELS[user_type]
+    return db.query(model).filter(model.id == user_id).first()
+
+
+class UserSnapshot:
+    """
+    Read-only copy of a user row's columns
+
+    Shared between requests, so assigning to it raises; load the row with
+    load_user to change the user.
+    """
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values: Dict[str, Any]):
+        object.__setattr__(self, "_values", values)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"User snapshots are read-only; use load_user to modify '{name}'")
+
+    def __repr__(self) -> str:
+        return f"UserSnapshot(id={self._values.get('id')}, email={self._values.get('email')!r})"
+
+
+class UserCache:
+    """
+    Caches verified tokens and user snapshots for get_current_user
+
+    A cache hit needs no database work: the token's claims come from the
+    token cache (until the token expires) and the user from a snapshot held
+    for AUTH_USER_CACHE_TTL_SECONDS. Snapshots are tagged with the user's
+    ACCOUNT version from the response cache backend, and committing a change
+    to a user row (last_active excepted) bumps it, so with Redis every worker
+    reloads a deactivated or edited user on its next request. With several
+    workers and no Redis, invalidations cannot be shared and the user is
+    loaded on every request.
+    """
+
+    def __init__(self):
+        self._tokens = LRUCache(
+            max_entries=settings.AUTH_USER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS
+        )
+        self._users = LRUCache(
+            max_entries=settings.AUTH_USER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS
+        )
+
+    def get_token(self, token: str):
+        """Claims of a token verified earlier, or None"""
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        token_data, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            self._tokens.pop(token)
+            return None
+        return token_data
+
+    def set_token(self, token: str, token_data, expires_at: Optional[float]):
+        """Remember verified claims, never past the token's own expiry"""
+        ttl = settings.AUTH_USER_CACHE_TTL_SECONDS
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl > 0:
+            self._tokens.set(token, (token_data, expires_at), ttl_seconds=ttl)
+
+    def get_user(self, db: Session, user_id: int, user_type: str) -> Optional[UserSnapshot]:
+        """Snapshot of the user, loading it on a miss (None if the user does not exist)"""
+        version = self._version(user_id, user_type)
+        snapshot = self._cached(user_id, user_type, version)
+        if snapshot is not None:
+            return snapshot
+        return self._remember(user_type, load_user(db, user_id, user_type), version)
+
+    async def get_user_async(self, db: AsyncSession, user_id: int, user_type: str) -> Optional[UserSnapshot]:
+        """get_user for an AsyncSession"""
+        version = self._version(user_id, user_type)
+        snapshot = self._cached(user_id, user_type, version)
+        if snapshot is not None:
+            return snapshot
+        model = USER_MODELS[user_type]
+        user = (await db.execute(select(model).where(model.id == user_id))).scalar_one_or_none()
+        return self._remember(user_type, user, version)
+
+    @staticmethod
+    def _version(user_id: int, user_type: str) -> Optional[int]:
+        """
+        The user's ACCOUNT version, or None when snapshots must not be cached
+
+        Read before loading the user, so a change committed meanwhile is
+        stored under a version that is never matched.
+        """
+        if not response_cache.shares_invalidations():
+            return None
+        return response_cache.version(ACCOUNT, user_id, user_type)
+
+    def _cached(self, user_id: int, user_type: str, version: Optional[int]) -> Optional[UserSnapshot]:
+        if version is None:
+            return None
+        entry = self._users.get((user_type, user_id))
+        if entry is None or entry[1] != version:
+            return None
+        return entry[0]
+
+    def _remember(self, user_type: str, user, version: Optional[int]) -> Optional[UserSnapshot]:
+        if user is None:
+            return None
+        snapshot = UserSnapshot({
+            column.key: getattr(user, column.key)
+            for column in inspect(type(user)).mapper.column_attrs
+        })
+        if version is not None:
+            self._users.set((user_type, user.id), (snapshot, version))
+        return snapshot
+
+    def invalidate(self, user_id: int, user_type: str):
+        """Drop a user's snapshot in every process so the next request reloads it"""
+        self._users.pop((user_type, user_id))
+        response_cache.invalidate_user(user_id, user_type, (ACCOUNT,))
+
+    def clear(self):
+        self._tokens.clear()
+        self._users.clear()
+
+    def stats(self) -> Dict:
+        return {"tokens": self._tokens.stats(), "users": self._users.stats()}
+
+
+class LastActiveTracker:
+    """
+    Coalesces last_active updates in memory
+
+    get_current_user only records the time; a background thread writes the
+    latest time per user every LAST_ACTIVE_FLUSH_INTERVAL_SECONDS with one
+    executemany UPDATE per user table. The writes use Core statements, so
+    they do not invalidate cached snapshots or responses.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], datetime] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.flushed = 0
+
+    def touch(self, user_id: int, user_type: str):
+        """Record activity now (never touches the database)"""
+        with self._lock:
+            self._pending[(user_type, user_id)] = datetime.utcnow()
+        self.start()
+
+    def start(self):
+        """Start the flush thread (idempotent)"""
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop.clear()
+                self._worker = threading.Thread(target=self._run, name="last-active-flush", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the flush thread and write whatever is pending"""
+        self._stop.set()
+        if self._worker is not None and self._worker.is_alive():
+            self._worker.join(timeout=timeout)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(settings.LAST_ACTIVE_FLUSH_INTERVAL_SECONDS):
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending last_active times; returns the number of users updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        db = SessionLocal()
+        try:
+            for user_type, model in USER_MODELS.items():
+                rows = [
+                    {"user_id": user_id, "seen_at": seen_at}
+                    for (pending_type, user_id), seen_at in pending.items()
+                    if pending_type == user_type
+                ]
+                if rows:
+                    table = model.__table__
+                    db.execute(
+                        update(table).where(table.c.id == bindparam("user_id")).values(last_active=bindparam("seen_at")),
+                        rows
+                    )
+            db.commit()
+            self.flushed += len(pending)
+            return len(pending)
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"last_active flush failed for {len(pending)} users: {e}")
+            # Keep the times for the next flush unless newer ones arrived
+            with self._lock:
+                for key, seen_at in pending.items():
+                    self._pending.setdefault(key, seen_at)
+            return 0
+
+        finally:
+            db.close()
+
+
+# Global instances
+user_cache = UserCache()
+last_active_tracker = LastActiveTracker()
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_user_changes(session, flush_context, instances):
+    """Note users whose rows change in this flush (last_active alone does not count)"""
+    changed = set()
+    for target in session.deleted:
+        if isinstance(target, (UserConsumer, UserBusiness)):
+            changed.add(("consumer" if isinstance(target, UserConsumer) else "business", target.id))
+    for target in session.dirty:
+        if isinstance(target, (UserConsumer, UserBusiness)) and any(
+            attributes.get_history(target, column.key, passive=attributes.PASSIVE_NO_INITIALIZE).has_changes()
+            for column in inspect(type(target)).mapper.column_attrs
+            if column.key != "last_active"
+        ):
+            changed.add(("consumer" if isinstance(target, UserConsumer) else "business", target.id))
+    if changed:
+        session.info.setdefault(_PENDING, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_changed_users(session):
+    for user_type, user_id in session.info.pop(_PENDING, ()):
+        user_cache.invalidate(user_id, user_type)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop(_PENDING, None)
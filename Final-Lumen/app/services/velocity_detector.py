@@ -0,0 +1,281 @@
+"""
+Streaming Velocity and Burst Detection
+Per-user sliding windows over recent transactions, updated in O(1)
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+import logging
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.transaction import Transaction
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Sliding windows tracked per user (label -> seconds)
+WINDOWS = {"1h": 3600, "24h": 86400, "7d": 7 * 86400}
+
+
+class SlidingWindows:
+    """
+    Ring buffer of (timestamp, amount) with running count / sum / small-amount
+    count for each window in WINDOWS
+
+    Every push advances each window's tail past expired entries, so the cost
+    is amortized O(1) per transaction. When the buffer is full the oldest
+    entry is evicted, which caps very long windows at `capacity` entries.
+    Late arrivals are inserted at their own timestamp, which costs O(capacity).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.amounts = np.zeros(capacity, dtype=np.float64)
+        self.start = 0  # Sequence number of the oldest retained entry
+        self.end = 0  # Sequence number of the next entry
+        self.tails = {label: 0 for label in WINDOWS}
+        self.sums = {label: 0.0 for label in WINDOWS}
+        self.smalls = {label: 0 for label in WINDOWS}
+
+    def _drop(self, label: str):
+        slot = self.tails[label] % self.capacity
+        amount = self.amounts[slot]
+        self.sums[label] -= amount
+        if amount < settings.VELOCITY_SMALL_AMOUNT:
+            self.smalls[label] -= 1
+        self.tails[label] += 1
+
+    def push(self, timestamp: float, amount: float):
+        if self.end - self.start == self.capacity:
+            for label in WINDOWS:
+                if self.tails[label] == self.start:
+                    self._drop(label)
+            self.start += 1
+
+        slot = self.end % self.capacity
+        self.timestamps[slot] = timestamp
+        self.amounts[slot] = amount
+        self.end += 1
+
+        small = amount < settings.VELOCITY_SMALL_AMOUNT
+        for label, seconds in WINDOWS.items():
+            self.sums[label] += amount
+            if small:
+                self.smalls[label] += 1
+            while self.tails[label] < self.end and self.timestamps[self.tails[label] % self.capacity] <= timestamp - seconds:
+                self._drop(label)
+
+    def insert(self, timestamp: float, amount: float):
+        """Add an entry older than the newest one, keeping the buffer in time order"""
+        sequence = np.arange(self.start, self.end) % self.capacity
+        timestamps, amounts = self.timestamps[sequence], self.amounts[sequence]
+        position = int(np.searchsorted(timestamps, timestamp, side="right"))
+        if len(timestamps) == self.capacity:
+            if position == 0:
+                return  # Older than everything retained; it would be evicted at once
+            timestamps, amounts, position = timestamps[1:], amounts[1:], position - 1
+
+        timestamps = np.insert(timestamps, position, timestamp)
+        amounts = np.insert(amounts, position, amount)
+        self.start, self.end = 0, len(timestamps)
+        self.timestamps[:self.end] = timestamps
+        self.amounts[:self.end] = amounts
+
+        # Rebuild the windows, still anchored at the newest entry
+        for label, seconds in WINDOWS.items():
+            tail = int(np.searchsorted(timestamps, timestamps[-1] - seconds, side="right"))
+            self.tails[label] = tail
+            self.sums[label] = float(amounts[tail:].sum())
+            self.smalls[label] = int((amounts[tail:] < settings.VELOCITY_SMALL_AMOUNT).sum())
+
+    def snapshot_at(self, timestamp: float) -> Dict:
+        """Window statistics anchored at an earlier time (for scoring late arrivals)"""
+        sequence = np.arange(self.start, self.end) % self.capacity
+        timestamps, amounts = self.timestamps[sequence], self.amounts[sequence]
+        end = int(np.searchsorted(timestamps, timestamp, side="right"))
+        snapshot = {}
+        for label, seconds in WINDOWS.items():
+            tail = int(np.searchsorted(timestamps, timestamp - seconds, side="right"))
+            window = amounts[tail:end]
+            snapshot[label] = {
+                "count": len(window),
+                "sum": round(float(window.sum()), 2),
+                "small_count": int((window < settings.VELOCITY_SMALL_AMOUNT).sum())
+            }
+        return snapshot
+
+    def last_timestamp(self) -> Optional[float]:
+        if self.end == self.start:
+            return None
+        return float(self.timestamps[(self.end - 1) % self.capacity])
+
+    def count(self, label: str) -> int:
+        return self.end - self.tails[label]
+
+    def snapshot(self) -> Dict:
+        return {
+            label: {"count": self.count(label), "sum": round(self.sums[label], 2), "small_count": self.smalls[label]}
+            for label in WINDOWS
+        }
+
+
+class UserVelocityState:
+    """Windows plus merchant/channel history for one user"""
+
+    def __init__(self):
+        self.windows = SlidingWindows(settings.VELOCITY_BUFFER_SIZE)
+        self.merchants: Set[str] = set()
+        self.channels: Set[str] = set()
+        self.history = 0  # Transactions seen (including warm-up)
+        self.lock = threading.Lock()
+
+
+class VelocityDetector:
+    """
+    Streaming detector for bursts and rapid-fire payments
+
+    Flags (scores follow detect_anomaly's scale):
+      - burst: VELOCITY_MAX_PER_HOUR or more transactions in the last hour (0.8)
+      - card testing: VELOCITY_SMALL_BURST_COUNT or more small amounts in the last hour (0.7)
+      - daily spike: 24h spend above VELOCITY_DAILY_SPIKE_FACTOR x the daily average
+        of the preceding 6 days (0.6)
+      - novelty: first-ever merchant on a first-ever payment channel (0.5)
+
+    State lives in memory per process, warmed from the last 7 days of the
+    user's transactions on first use and evicted LRU beyond VELOCITY_MAX_USERS.
+    Transactions older than the 7-day window (e.g. historical imports) are
+    recorded for novelty but not scored; later ones that arrive out of order
+    are scored against the windows around their own timestamp.
+    """
+
+    def __init__(self):
+        self._states = LRUCache(max_entries=settings.VELOCITY_MAX_USERS)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _merchant(transaction) -> str:
+        return (transaction.merchant_name_raw or "").lower().strip()
+
+    @staticmethod
+    def _channel(transaction) -> str:
+        channel = transaction.payment_channel
+        return getattr(channel, "value", channel) or ""
+
+    def _state(self, db: Session, user_id: int, user_type: str, exclude_ids: List[int]) -> UserVelocityState:
+        user_key = f"{user_type}_{user_id}"
+        with self._lock:
+            state = self._states.get(user_key)
+            if state is None:
+                state = self._warm(db, user_id, user_type, exclude_ids)
+                self._states.set(user_key, state)
+            return state
+
+    def _warm(self, db: Session, user_id: int, user_type: str, exclude_ids: List[int]) -> UserVelocityState:
+        """Build state from stored history, excluding the transactions about to be observed"""
+        owner_column = Transaction.user_consumer_id if user_type == "consumer" else Transaction.user_business_id
+        state = UserVelocityState()
+
+        history = db.query(Transaction.merchant_name_raw, Transaction.payment_channel).filter(
+            owner_column == user_id,
+            ~Transaction.id.in_(exclude_ids)
+        ).distinct().all()
+        for merchant, channel in history:
+            state.merchants.add((merchant or "").lower().strip())
+            state.channels.add(getattr(channel, "value", channel) or "")
+
+        since = datetime.utcnow() - timedelta(seconds=WINDOWS["7d"])
+        recent = db.query(Transaction.date, Transaction.amount).filter(
+            owner_column == user_id,
+            Transaction.date >= since,
+            ~Transaction.id.in_(exclude_ids)
+        ).order_by(Transaction.date).all()
+        for date, amount in recent:
+            state.windows.push(date.timestamp(), float(amount))
+
+        state.history = db.query(Transaction.id).filter(
+            owner_column == user_id,
+            ~Transaction.id.in_(exclude_ids)
+        ).count()
+        return state
+
+    def observe_batch(
+        self,
+        db: Session,
+        user_id: int,
+        user_type: str,
+        transactions: List[Transaction]
+    ) -> Dict[int, Dict]:
+        """
+        Feed a user's new transactions (in date order) through the windows
+
+        Returns: {transaction_id: {"is_anomaly", "anomaly_score", "reasons", "windows"}}
+        """
+        state = self._state(db, user_id, user_type, [tx.id for tx in transactions])
+        results = {}
+        with state.lock:
+            for tx in sorted(transactions, key=lambda t: t.date):
+                results[tx.id] = self._observe(state, tx)
+        return results
+
+    def _observe(self, state: UserVelocityState, transaction: Transaction) -> Dict:
+        merchant = self._merchant(transaction)
+        channel = self._channel(transaction)
+        novel_merchant = state.history >= settings.VELOCITY_MIN_HISTORY and merchant not in state.merchants
+        novel_channel = state.history >= settings.VELOCITY_MIN_HISTORY and channel not in state.channels
+        state.merchants.add(merchant)
+        state.channels.add(channel)
+        state.history += 1
+
+        timestamp = transaction.date.timestamp()
+        if timestamp < datetime.utcnow().timestamp() - WINDOWS["7d"]:
+            return {"is_anomaly": False, "anomaly_score": 0.0, "reasons": [], "windows": None}
+
+        # Late arrivals (e.g. a backfill of older receipts) go in at their own time
+        # and are scored against the windows around that time
+        last = state.windows.last_timestamp()
+        if last is None or timestamp >= last:
+            state.windows.push(timestamp, float(transaction.amount))
+            windows = state.windows.snapshot()
+        else:
+            state.windows.insert(timestamp, float(transaction.amount))
+            windows = state.windows.snapshot_at(timestamp)
+        score = 0.0
+        reasons = []
+
+        if windows["1h"]["count"] >= settings.VELOCITY_MAX_PER_HOUR:
+            reasons.append(f"Burst: {windows['1h']['count']} transactions in the last hour")
+            score = max(score, 0.8)
+
+        if windows["1h"]["small_count"] >= settings.VELOCITY_SMALL_BURST_COUNT:
+            reasons.append(f"Possible card testing: {windows['1h']['small_count']} small payments in the last hour")
+            score = max(score, 0.7)
+
+        # Baseline: average day over the rest of the week
+        daily_average = (windows["7d"]["sum"] - windows["24h"]["sum"]) / 6
+        if (
+            windows["7d"]["count"] - windows["24h"]["count"] >= settings.VELOCITY_MIN_HISTORY
+            and daily_average > 0
+            and windows["24h"]["sum"] > settings.VELOCITY_DAILY_SPIKE_FACTOR * daily_average
+        ):
+            reasons.append(f"Spending spike: ₹{windows['24h']['sum']:.0f} in 24h vs ₹{daily_average:.0f}/day average")
+            score = max(score, 0.6)
+
+        if novel_merchant and novel_channel:
+            reasons.append("New merchant on a payment channel never used before")
+            score = max(score, 0.5)
+
+        return {"is_anomaly": bool(reasons), "anomaly_score": score, "reasons": reasons, "windows": windows}
+
+    def forget_user(self, user_id: int, user_type: str):
+        self._states.pop(f"{user_type}_{user_id}")
+
+    def stats(self) -> Dict:
+        return self._states.stats()
+
+
+# Global instance
+velocity_detector = VelocityDetector()
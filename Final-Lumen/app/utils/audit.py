@@ -1,33 +1,94 @@
 """
 Audit logging utilities
+
+Entry point of the audit subsystem: callers never pass a session. Records
+are written to the audit database (audit_engine / AuditSessionLocal) by
+audit_writer, outside the caller's transaction; read them through
+get_audit_db.
 """
 
-import hashlib
-import json
-from datetime import datetime
-from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
+from typing import Optional, Dict, List, Union
 import logging
 
-from app.models.audit import AuditRecord, AuditActor, AuditAction
-from app.core.database import get_audit_db
+from app.models.audit import AuditActor, AuditAction
+from app.services.audit_writer import audit_writer, compute_record_hash
 
 logger = logging.getLogger(__name__)
 
 
+def _enum(enum_class, value):
+    return value if isinstance(value, enum_class) else enum_class(value.lower())
+
+
+def log_audit(
+    action: Union[AuditAction, str],
+    actor: Union[AuditActor, str] = AuditActor.USER,
+    **fields
+):
+    """Queue one audit record (actor/action may be given by value, e.g. "user", "confirmed")"""
+    AuditLogger.log_action(actor=_enum(AuditActor, actor), action=_enum(AuditAction, action), **fields)
+
+
+def log_audit_batch(records: List[Dict]):
+    """Queue several audit records in order; each takes log_action's keyword arguments"""
+    audit_writer.enqueue_many([
+        AuditLogger.record(**{
+            **record,
+            "actor": _enum(AuditActor, record["actor"]),
+            "action": _enum(AuditAction, record["action"])
+        })
+        for record in records
+    ])
+
+
+def flush_audit(timeout: float = 10.0) -> bool:
+    """Wait until queued audit records are written (scripts and tests)"""
+    return audit_writer.flush(timeout)
+
+
 class AuditLogger:
     """Audit logging service for compliance and traceability"""
     
     @staticmethod
     def compute_record_hash(record_data: Dict) -> str:
         """Compute SHA-256 hash of record for tamper detection"""
-        # Create deterministic string representation
-        hash_input = json.dumps(record_data, sort_keys=True, default=str)
-        return hashlib.sha256(hash_input.encode()).hexdigest()
+        return compute_record_hash(record_data)
+    
+    @staticmethod
+    def record(
+        actor: AuditActor,
+        action: AuditAction,
+        user_id: Optional[int] = None,
+        user_type: Optional[str] = None,
+        transaction_id: Optional[int] = None,
+        reason: Optional[Dict] = None,
+        related_context: Optional[Dict] = None,
+        outcome: Optional[str] = None,
+        confidence: Optional[float] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        device_id: Optional[str] = None,
+        metadata: Optional[Dict] = None
+    ) -> Dict:
+        """AuditRecord column values for audit_writer"""
+        return {
+            "user_id": user_id,
+            "user_type": user_type,
+            "transaction_id": transaction_id,
+            "actor": actor,
+            "action": action,
+            "reason": reason,
+            "related_context": related_context,
+            "outcome": outcome,
+            "confidence": confidence,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "device_id": device_id,
+            "audit_metadata": metadata
+        }
     
     @staticmethod
     def log_action(
-        db: Session,
         actor: AuditActor,
         action: AuditAction,
         user_id: Optional[int] = None,
@@ -41,10 +102,13 @@ class AuditLogger:
         user_agent: Optional[str] = None,
         device_id: Optional[str] = None,
         metadata: Optional[Dict] = None
-    ) -> AuditRecord:
+    ):
         """
         Create audit log entry
         
+        The record is queued for audit_writer, which links it into the hash
+        chain and inserts it into the audit database in the next batch.
+        
         Args:
             actor: Who performed the action (system/user/admin)
             action: What action was performed
@@ -60,62 +124,16 @@ class AuditLogger:
             device_id: Device identifier
             metadata: Additional metadata
         """
-        try:
-            # Get previous record hash for chain
-            previous_record = db.query(AuditRecord).order_by(AuditRecord.id.desc()).first()
-            previous_hash = previous_record.record_hash if previous_record else None
-            
-            # Create record data for hashing
-            record_data = {
-                "user_id": user_id,
-                "user_type": user_type,
-                "transaction_id": transaction_id,
-                "actor": actor.value,
-                "action": action.value,
-                "outcome": outcome,
-                "confidence": confidence,
-                "timestamp": datetime.utcnow().isoformat(),
-                "previous_hash": previous_hash
-            }
-            
-            # Compute current record hash
-            record_hash = AuditLogger.compute_record_hash(record_data)
-            
-            # Create audit record
-            audit_record = AuditRecord(
-                user_id=user_id,
-                user_type=user_type,
-                transaction_id=transaction_id,
-                actor=actor,
-                action=action,
-                reason=reason or {},
-                related_context=related_context or {},
-                outcome=outcome,
-                confidence=confidence,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                device_id=device_id,
-                previous_record_hash=previous_hash,
-                record_hash=record_hash,
-                metadata=metadata or {}
-            )
-            
-            db.add(audit_record)
-            db.commit()
-            db.refresh(audit_record)
-            
-            logger.info(f"Audit log created: {action.value} by {actor.value} for user {user_id}")
-            
-            return audit_record
+        audit_writer.enqueue(AuditLogger.record(
+            actor, action, user_id=user_id, user_type=user_type, transaction_id=transaction_id,
+            reason=reason, related_context=related_context, outcome=outcome, confidence=confidence,
+            ip_address=ip_address, user_agent=user_agent, device_id=device_id, metadata=metadata
+        ))
         
-        except Exception as e:
-            logger.error(f"Failed to create audit log: {e}")
-            db.rollback()
-            raise
+        logger.debug(f"Audit log queued: {action.value} by {actor.value} for user {user_id}")
     
     @staticmethod
     def log_anomaly_detection(
-        db: Session,
         transaction_id: int,
         user_id: int,
         user_type: str,
@@ -135,7 +153,6 @@ class AuditLogger:
         }
         
         return AuditLogger.log_action(
-            db=db,
             actor=AuditActor.SYSTEM,
             action=AuditAction.ANOMALY_DETECTED,
             user_id=user_id,
@@ -148,7 +165,6 @@ class AuditLogger:
     
     @staticmethod
     def log_classification(
-        db: Session,
         transaction_id: int,
         user_id: int,
         user_type: str,
@@ -164,7 +180,6 @@ class AuditLogger:
         }
         
         return AuditLogger.log_action(
-            db=db,
             actor=AuditActor.SYSTEM,
             action=AuditAction.CLASSIFIED,
             user_id=user_id,
@@ -177,7 +192,6 @@ class AuditLogger:
     
     @staticmethod
     def log_user_confirmation(
-        db: Session,
         transaction_id: int,
         user_id: int,
         user_type: str,
@@ -195,7 +209,6 @@ class AuditLogger:
         }
         
         return AuditLogger.log_action(
-            db=db,
             actor=AuditActor.USER,
             action=AuditAction.HITL_REVIEW,
             user_id=user_id,
@@ -209,7 +222,6 @@ class AuditLogger:
     
     @staticmethod
     def log_rag_query(
-        db: Session,
         user_id: int,
         user_type: str,
         query: str,
@@ -226,13 +238,16 @@ class AuditLogger:
             "retrieved_doc_count": len(retrieved_docs)
         }
         
+        # References only: the documents are transactions already stored in the main database
         related_context = {
-            "retrieved_docs": retrieved_docs,
+            "retrieved_docs": [
+                {"id": doc.get("id"), "relevance_score": doc.get("relevance_score")}
+                for doc in retrieved_docs
+            ],
             "response_summary": response[:200]  # First 200 chars
         }
         
         return AuditLogger.log_action(
-            db=db,
             actor=AuditActor.USER,
             action=AuditAction.RAG_QUERY,
             user_id=user_id,
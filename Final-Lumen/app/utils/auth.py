@@ -7,13 +7,17 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.user import UserConsumer, UserBusiness
 from app.schemas.auth import TokenData
+from app.services.user_cache import user_cache, last_active_tracker, USER_MODELS
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -79,32 +83,37 @@ def decode_access_token(token: str) -> TokenData:
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get current authenticated user from JWT token"""
+    """
+    Get current authenticated user from JWT token
+    
+    Returns a read-only UserSnapshot from user_cache (the database is only
+    read on a miss); endpoints that change the user load the row with
+    load_user. last_active is recorded in memory and written in batches.
+    """
     token = credentials.credentials
-    token_data = decode_access_token(token)
+    token_data = user_cache.get_token(token)
+    if token_data is None:
+        token_data = decode_access_token(token)
+        user_cache.set_token(token, token_data, jwt.get_unverified_claims(token).get("exp"))
     
-    # Fetch user based on type
-    if token_data.user_type == "consumer":
-        user = db.query(UserConsumer).filter(UserConsumer.id == token_data.user_id).first()
-    elif token_data.user_type == "business":
-        user = db.query(UserBusiness).filter(UserBusiness.id == token_data.user_id).first()
-    else:
+    if token_data.user_type not in USER_MODELS:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid user type"
         )
     
+    user = await user_cache.get_user_async(db, token_data.user_id, token_data.user_type)
+    
     if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found or inactive"
         )
     
-    # Update last active
-    user.last_active = datetime.utcnow()
-    db.commit()
+    # Update last active (flushed in batches)
+    last_active_tracker.touch(token_data.user_id, token_data.user_type)
     
     return {"user": user, "user_type": token_data.user_type}
 
@@ -125,3 +134,19 @@ def authenticate_user(db: Session, email: str, password: str, user_type: str):
         return None
     
     return user
+
+
+async def authenticate_user_async(db: AsyncSession, email: str, password: str, user_type: str):
+    """authenticate_user for an AsyncSession; bcrypt runs in the thread pool"""
+    model = USER_MODELS.get(user_type)
+    if model is None:
+        return None
+    
+    user = (await db.execute(select(model).where(model.email == email))).scalar_one_or_none()
+    if not user:
+        return None
+    
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
+        return None
+    
+    return user
@@ -0,0 +1,126 @@
+"""
+In-process caching utilities
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional per-entry TTL
+
+    With max_weight and weigher set, entries are also evicted (oldest first)
+    until the summed weight fits, e.g. a memory budget in bytes. The most
+    recently set entry is always kept.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        max_weight: Optional[int] = None,
+        weigher: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self._data = OrderedDict()  # {key: (expires_at, value)}
+        self._weights = {}  # {key: weight}, only with a weigher
+        self._weight = 0
+        self._lock = threading.RLock()
+
+        # Counters for instrumentation
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return cached value (and mark it recently used) or default"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Insert or replace a value, evicting least recently used entries"""
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (expires_at, value)
+            if self.weigher is not None:
+                weight = self.weigher(value)
+                self._weights[key] = weight
+                self._weight += weight
+
+            while len(self._data) > self.max_entries or (
+                self.max_weight is not None and self._weight > self.max_weight and len(self._data) > 1
+            ):
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: Hashable):
+        """Drop a key and its weight (caller holds the lock)"""
+        entry = self._data.pop(key, _MISSING)
+        self._weight -= self._weights.pop(key, 0)
+        return entry
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a key and return its value"""
+        with self._lock:
+            entry = self._remove(key)
+            return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self._weight = 0
+
+    def keys(self):
+        """Snapshot of current keys (oldest first)"""
+        with self._lock:
+            return list(self._data.keys())
+
+    def stats(self) -> dict:
+        """Cache size and hit/miss counters"""
+        with self._lock:
+            stats = {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+            if self.weigher is not None:
+                stats["weight"] = self._weight
+                stats["max_weight"] = self.max_weight
+            return stats
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return False
+            expires_at = entry[0]
+            return expires_at is None or expires_at >= time.monotonic()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
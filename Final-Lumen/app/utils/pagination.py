@@ -0,0 +1,92 @@
+"""
+Keyset pagination, column projection and row count helpers for transaction listings
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text, tuple_
+from sqlalchemy.orm import Query, Session
+
+from app.models.transaction import Transaction
+from app.schemas.transaction import TransactionListItem
+
+# Columns selected by listing queries: TransactionListItem fields only, so
+# JSON blobs (encrypted_data, wrapped_deks, parsed_fields) are never loaded
+LISTING_COLUMNS = tuple(getattr(Transaction, name) for name in TransactionListItem.model_fields)
+
+
+def encode_cursor(transaction: Transaction) -> str:
+    """Opaque cursor pointing just after a transaction in (date, id) order"""
+    payload = json.dumps({"d": transaction.date.isoformat(), "i": transaction.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Returns: (date, id) of the last row on the previous page
+
+    Raises: ValueError for a malformed cursor
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload["d"]), int(payload["i"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def paginate(
+    query: Query,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0
+) -> Tuple[List[Transaction], Optional[str]]:
+    """
+    Newest-first page of a transaction query (ORM or LISTING_COLUMNS rows)
+
+    With a cursor the page starts after the cursor's (date, id) and is served
+    from the (owner, ..., date, id) indexes without skipping rows; otherwise
+    offset is applied for backwards compatibility.
+
+    Returns: (transactions, next cursor or None on the last page)
+    """
+    query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
+    if cursor:
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < tuple_(*decode_cursor(cursor)))
+    elif offset:
+        query = query.offset(offset)
+
+    # One extra row tells whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+
+def count_rows(db: Session, query: Query, mode: str = "exact") -> Optional[int]:
+    """
+    Row count for a listing query
+
+    Args:
+        mode: "exact" runs COUNT(*); "estimated" uses the PostgreSQL planner
+            estimate (falls back to exact on other databases); "none" skips it
+
+    Returns: Count, or None for mode "none"
+    """
+    if mode == "none":
+        return None
+
+    if mode == "estimated" and db.bind.dialect.name == "postgresql":
+        statement = query.order_by(None).statement.compile(
+            dialect=db.bind.dialect,
+            compile_kwargs={"literal_binds": True}
+        )
+        plan: Dict = db.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    return query.order_by(None).count()
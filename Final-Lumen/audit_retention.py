@@ -0,0 +1,64 @@
+"""
+Apply the audit log retention policy
+Offloads months older than AUDIT_RETENTION_MONTHS to Parquet archives and
+removes them from the audit database; run verify_audit_chain.py first so
+the months are covered by checkpoints
+"""
+import sys
+import os
+import argparse
+import time
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.services.audit_retention import audit_retention
+
+def main():
+    """Main retention function"""
+    parser = argparse.ArgumentParser(description="Offload expired audit log months to Parquet")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the months that would be offloaded")
+    parser.add_argument("--verify-archives", action="store_true", help="Check existing archives and exit")
+    parser.add_argument("-y", "--yes", action="store_true", help="Do not ask for confirmation")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print(f"AUDIT RETENTION - keep {settings.AUDIT_RETENTION_MONTHS} months")
+    print("=" * 60)
+
+    if args.verify_archives:
+        problems = audit_retention.verify_archives()
+        for problem in problems:
+            print(f"   ❌ {problem['month']}: {problem['error']}")
+        print("\n✅ Archives valid" if not problems else f"\n❌ {len(problems)} archive problems")
+        sys.exit(1 if problems else 0)
+
+    if not args.yes and not args.dry_run:
+        response = input("\nContinue? (yes/no): ").strip().lower()
+        if response not in ['yes', 'y']:
+            print("Cancelled.")
+            return
+
+    start = time.time()
+    partitions = audit_retention.ensure_partitions()
+    results = audit_retention.apply(dry_run=args.dry_run)
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("RETENTION COMPLETE" if not args.dry_run else "DRY RUN")
+    print("=" * 60)
+    if partitions:
+        print(f"Partitions ensured: {', '.join(partitions)}")
+    for result in results:
+        detail = result.get("path") or result.get("reason") or ""
+        print(f"   {result['month'][:7]}: {result['status']} {result.get('records', '')} {detail}".rstrip())
+    if not results:
+        print("No expired months.")
+    print(f"Elapsed: {time.time() - start:.1f}s")
+    print("=" * 60)
+
+    sys.exit(1 if any(result["status"] == "blocked" for result in results) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Offline benchmark for the anomaly detector
+Generates labelled synthetic transaction streams (amounts from
+populate_demo_data.generate_transaction_amount), runs AnomalyDetector the way
+the post-commit pipeline does, and writes a JSON report with precision/recall,
+training time, scoring latency and peak memory for each scale
+"""
+import sys
+import os
+import argparse
+import json
+import random
+import platform
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models.user import UserConsumer
+from app.models.source import Source, SourceType as SourceSourceType
+from app.models.transaction import Transaction, PaymentChannel, SourceType, compute_duplicate_key
+from app.services.anomaly_service import AnomalyDetector, fit_isolation_forest
+from app.services.model_registry import ModelRegistry
+from app.services.pattern_engine import pattern_engine
+from populate_demo_data import generate_transaction_amount, CONSUMER_CATEGORIES, ANOMALY_RATE
+import logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logging.basicConfig(level=logging.WARNING)
+
+DEFAULT_SCALES = [1_000, 100_000, 1_000_000]
+HISTORY_DAYS = 90
+TRAIN_FRACTION = 0.8  # Oldest 80% is stored history, the newest 20% is scored
+SINGLE_SAMPLES = 200  # Transactions scored one at a time for latency percentiles
+
+# Share of injected anomalies by kind
+ANOMALY_KINDS = {"amount": 0.6, "duplicate": 0.2, "odd_hour": 0.2}
+
+PAYMENT_CHANNELS = [
+    PaymentChannel.UPI, PaymentChannel.UPI, PaymentChannel.UPI,
+    PaymentChannel.CARD, PaymentChannel.CARD,
+    PaymentChannel.CASH,
+    PaymentChannel.NETBANKING,
+    PaymentChannel.WALLET
+]
+
+
+def peak_rss_mb():
+    """Process high-water mark in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def generate_stream(n: int, anomaly_rate: float, now: datetime):
+    """
+    Synthetic transactions for one consumer, oldest first
+
+    Returns: List of dicts with Transaction columns plus "label" (None or anomaly kind)
+    """
+    seconds = np.sort(np.random.uniform(0, HISTORY_DAYS * 86400, n))
+    start = now - timedelta(days=HISTORY_DAYS)
+    kinds = list(ANOMALY_KINDS)
+    weights = list(ANOMALY_KINDS.values())
+    categories = list(CONSUMER_CATEGORIES)
+
+    rows = []
+    invoiced = []  # Indexes of earlier rows with an invoice number
+    for i in range(n):
+        label = random.choices(kinds, weights)[0] if random.random() < anomaly_rate else None
+        if label == "duplicate" and not invoiced:
+            label = "amount"
+
+        date = (start + timedelta(seconds=float(seconds[i]))).replace(
+            hour=random.randint(2, 5) if label == "odd_hour" else random.randint(8, 22)
+        )
+
+        if label == "duplicate":
+            original = rows[random.choice(invoiced)]
+            row = dict(original, date=date, label=label)
+        else:
+            category = random.choice(categories)
+            row = {
+                "category": category,
+                "merchant_name_raw": random.choice(CONSUMER_CATEGORIES[category]),
+                "amount": generate_transaction_amount(category, is_anomaly=label == "amount"),
+                "payment_channel": random.choice(PAYMENT_CHANNELS),
+                "invoice_no": f"INV{i:010d}" if random.random() > 0.3 else None,
+                "ocr_confidence": round(random.uniform(0.85, 1.0), 2),
+                "date": date,
+                "label": label
+            }
+            if row["invoice_no"]:
+                invoiced.append(i)
+        rows.append(row)
+
+    # Keep the stream in date order after the hour overrides
+    rows.sort(key=lambda row: row["date"])
+    return rows
+
+
+def insert_rows(db, user_id: int, source_id: int, rows):
+    """Bulk insert (ORM events do not fire, so the duplicate key is set here)"""
+    records = []
+    for row in rows:
+        records.append({
+            "user_consumer_id": user_id,
+            "user_type": "CONSUMER",
+            "source_id": source_id,
+            "source_type": SourceType.MANUAL,
+            "merchant_name_raw": row["merchant_name_raw"],
+            "amount": row["amount"],
+            "date": row["date"],
+            "invoice_no": row["invoice_no"],
+            "duplicate_key": compute_duplicate_key(user_id, None, row["invoice_no"], row["merchant_name_raw"], row["amount"]),
+            "payment_channel": row["payment_channel"],
+            "ocr_confidence": row["ocr_confidence"],
+            "category": row["category"],
+            "confirmed": True
+        })
+    db.execute(insert(Transaction), records)
+    db.commit()
+
+
+def ratio(numerator: int, denominator: int):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def quality(labels, predicted):
+    """Precision / recall / F1 for boolean predictions against anomaly labels"""
+    actual = np.array([label is not None for label in labels])
+    predicted = np.asarray(predicted, dtype=bool)
+    tp = int((actual & predicted).sum())
+    fp = int((~actual & predicted).sum())
+    fn = int((actual & ~predicted).sum())
+    precision = ratio(tp, tp + fp)
+    recall = ratio(tp, tp + fn)
+    f1 = round(2 * precision * recall / (precision + recall), 4) if precision and recall else None
+    return {"precision": precision, "recall": recall, "f1": f1, "tp": tp, "fp": fp, "fn": fn}
+
+
+def run_scale(session_factory, detector: AnomalyDetector, n: int, anomaly_rate: float, batch_size: int):
+    print(f"\n📊 Scale {n:,}")
+    rss_before = peak_rss_mb()
+    now = datetime.utcnow()
+
+    db = session_factory()
+    try:
+        user = UserConsumer(
+            name=f"Benchmark {n}",
+            email=f"benchmark.{n}.{int(time.time())}@lumen.app",
+            hashed_password="!"
+        )
+        db.add(user)
+        db.flush()
+        source = Source(user_consumer_id=user.id, source_type=SourceSourceType.MANUAL)
+        db.add(source)
+        db.commit()
+        user_id, source_id = user.id, source.id
+
+        started = time.perf_counter()
+        rows = generate_stream(n, anomaly_rate, now)
+        generate_seconds = time.perf_counter() - started
+        split = int(n * TRAIN_FRACTION)
+        history, scored = rows[:split], rows[split:]
+
+        # Stored history, patterns and model, as a user would have before scoring
+        started = time.perf_counter()
+        insert_rows(db, user_id, source_id, history)
+        insert_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pattern_engine.rebuild(db, user_id, "consumer", now=now)
+        db.commit()
+        pattern_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        frame = detector.load_feature_frame(db, user_id, "consumer")
+        features = detector._frame_features(frame)
+        load_seconds = time.perf_counter() - started
+        del frame
+
+        started = time.perf_counter()
+        model, scaler = fit_isolation_forest(features)
+        fit_seconds = time.perf_counter() - started
+        detector.install_model(f"consumer_{user_id}", model, scaler, metadata={"n_samples": len(features)})
+        del features
+        print(f"   ✓ History {len(history):,} rows, model fit in {fit_seconds:.2f}s")
+
+        # Newest transactions arrive in batches: insert, then score as the pipeline would
+        results = []
+        scoring_seconds = 0.0
+        for offset in range(0, len(scored), batch_size):
+            chunk = scored[offset:offset + batch_size]
+            last_id = db.query(Transaction.id).order_by(Transaction.id.desc()).limit(1).scalar() or 0
+            insert_rows(db, user_id, source_id, chunk)
+            ids = [row[0] for row in db.query(Transaction.id).filter(Transaction.id > last_id).all()]
+
+            started = time.perf_counter()
+            batch_frame = detector.load_feature_frame(db, user_id, "consumer", transaction_ids=ids)
+            results.extend(detector.detect_anomalies_batch(user_id, "consumer", db, frame=batch_frame))
+            scoring_seconds += time.perf_counter() - started
+
+        results.sort(key=lambda result: result["transaction_id"])
+        predicted = [result["is_anomaly"] for result in results]
+        labels = [row["label"] for row in scored]
+        print(f"   ✓ Scored {len(results):,} rows in {scoring_seconds:.2f}s")
+
+        # Per-call latency for single-transaction scoring
+        sample = random.sample([result["transaction_id"] for result in results], min(SINGLE_SAMPLES, len(results)))
+        latencies = []
+        for transaction_id in sample:
+            started = time.perf_counter()
+            one = detector.load_feature_frame(db, user_id, "consumer", transaction_ids=[transaction_id])
+            detector.detect_anomalies_batch(user_id, "consumer", db, frame=one)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        recall_by_kind = {}
+        for kind in ANOMALY_KINDS:
+            hits = [p for label, p in zip(labels, predicted) if label == kind]
+            recall_by_kind[kind] = ratio(sum(hits), len(hits))
+
+        report = {
+            "transactions": n,
+            "history": len(history),
+            "scored": len(results),
+            "anomalies": sum(label is not None for label in labels),
+            "generate_seconds": round(generate_seconds, 3),
+            "insert_seconds": round(insert_seconds, 3),
+            "pattern_rebuild_seconds": round(pattern_seconds, 3),
+            "training": {
+                "samples": len(history),
+                "feature_load_seconds": round(load_seconds, 3),
+                "fit_seconds": round(fit_seconds, 3),
+                "total_seconds": round(load_seconds + fit_seconds, 3)
+            },
+            "batch_scoring": {
+                "batch_size": batch_size,
+                "seconds": round(scoring_seconds, 3),
+                "per_transaction_ms": round(scoring_seconds * 1000 / max(1, len(results)), 4),
+                "transactions_per_second": round(len(results) / scoring_seconds, 1) if scoring_seconds else None
+            },
+            "single_scoring_ms": {
+                "samples": len(latencies),
+                "p50": round(float(np.percentile(latencies, 50)), 3),
+                "p95": round(float(np.percentile(latencies, 95)), 3),
+                "p99": round(float(np.percentile(latencies, 99)), 3)
+            },
+            "quality": {
+                **quality(labels, predicted),
+                "recall_by_kind": recall_by_kind,
+                "isolation_forest": quality(labels, [result["isolation_forest_outlier"] for result in results])
+            },
+            "memory": {
+                "rss_before_mb": rss_before,
+                "peak_rss_mb": peak_rss_mb()
+            }
+        }
+        q = report["quality"]
+        print(f"   ✓ Precision {q['precision']}, recall {q['recall']}, "
+              f"{report['batch_scoring']['per_transaction_ms']}ms/transaction")
+        return report
+
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark anomaly detection speed and quality")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Transaction counts to run")
+    parser.add_argument("--anomaly-rate", type=float, default=ANOMALY_RATE, help="Share of injected anomalies")
+    parser.add_argument("--batch-size", type=int, default=settings.ANOMALY_BATCH_SIZE, help="Scoring batch size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", help="SQLite file to use (default: a temporary file)")
+    parser.add_argument("--output", default="anomaly_benchmark.json", help="Report path ('-' for stdout only)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    print("=" * 60)
+    print("LUMEN Anomaly Detection Benchmark")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = args.database or os.path.join(workdir, "benchmark.db")
+        engine = create_engine(f"sqlite:///{database}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+
+        # Models go to a scratch registry, never the application's
+        detector = AnomalyDetector()
+        detector.registry = ModelRegistry(model_dir=os.path.join(workdir, "models"))
+
+        # Ascending order so each scale's peak RSS is attributable to it
+        scales = [run_scale(session_factory, detector, n, args.anomaly_rate, args.batch_size) for n in sorted(args.scales)]
+        engine.dispose()
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "seed": args.seed,
+        "anomaly_rate": args.anomaly_rate,
+        "anomaly_kinds": ANOMALY_KINDS,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "settings": {
+            "isolation_forest_contamination": settings.ISOLATION_FOREST_CONTAMINATION,
+            "sigma_threshold": settings.SIGMA_THRESHOLD,
+            "near_duplicate_window_hours": settings.NEAR_DUPLICATE_WINDOW_HOURS
+        },
+        "scales": scales
+    }
+
+    if args.output == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark for transaction list serialization
+Compares full ORM rows through jsonable_encoder with the column-projected
+listing query dumped by Pydantic, per page of rows, and writes a JSON report
+"""
+import sys
+import os
+import argparse
+import base64
+import json
+import random
+import platform
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import UserConsumer
+from app.models.source import Source, SourceType as SourceSourceType
+from app.models.transaction import Transaction, PaymentChannel, SourceType
+from app.schemas.transaction import TransactionListResponse
+from app.utils.pagination import LISTING_COLUMNS
+from populate_demo_data import generate_transaction_amount, CONSUMER_CATEGORIES
+import logging
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def random_blob(size: int) -> str:
+    return base64.b64encode(os.urandom(size)).decode()
+
+
+def load_user(session_factory, n: int) -> int:
+    """Insert one consumer with n transactions carrying realistic JSON blobs"""
+    db = session_factory()
+    try:
+        user = UserConsumer(name="Serialization Benchmark", email=f"serialize.{n}@lumen.app", hashed_password="!")
+        db.add(user)
+        db.flush()
+        source = Source(user_consumer_id=user.id, source_type=SourceSourceType.MANUAL)
+        db.add(source)
+        db.commit()
+
+        now = datetime.utcnow()
+        merchants = [(category, merchant) for category, names in CONSUMER_CATEGORIES.items() for merchant in names]
+        records = []
+        for i in range(n):
+            category, merchant = random.choice(merchants)
+            flagged = random.random() < 0.05
+            records.append({
+                "user_consumer_id": user.id,
+                "user_type": "CONSUMER",
+                "source_id": source.id,
+                "source_type": SourceType.MANUAL,
+                "merchant_name_raw": merchant,
+                "category": category,
+                "amount": generate_transaction_amount(category),
+                "date": now - timedelta(minutes=i * 7),
+                "payment_channel": random.choice(list(PaymentChannel)),
+                "invoice_no": f"INV-{i:06d}",
+                "flagged": flagged,
+                "anomaly_score": random.random() if flagged else None,
+                "parsed_fields": {
+                    "raw_text": random_blob(600),
+                    "line_items": [{"name": f"item {j}", "amount": random.randint(10, 500)} for j in range(6)],
+                    "ocr_boxes": [[random.randint(0, 1000) for _ in range(4)] for _ in range(12)]
+                },
+                "encrypted_data": {
+                    field: {"ciphertext": random_blob(96), "nonce": random_blob(12)}
+                    for field in ("merchant_name_raw", "invoice_no", "parsed_fields")
+                },
+                "wrapped_deks": {f"device-{d}": random_blob(256) for d in range(2)},
+                "anomaly_explanation": {"summary": "Amount stood out.", "factors": [], "rules": []} if flagged else None
+            })
+        db.execute(insert(Transaction), records)
+        db.commit()
+        return user.id
+
+    finally:
+        db.close()
+
+
+def full_orm(db, user_id: int, rows: int) -> bytes:
+    """Former listing path: whole Transaction objects through jsonable_encoder"""
+    transactions = db.query(Transaction).filter(
+        Transaction.user_consumer_id == user_id
+    ).order_by(Transaction.date.desc(), Transaction.id.desc()).limit(rows).all()
+    payload = {"transactions": transactions, "total": rows, "total_estimated": False,
+               "limit": rows, "offset": 0, "next_cursor": None}
+    return JSONResponse(content=jsonable_encoder(payload)).body
+
+
+def projected(db, user_id: int, rows: int) -> bytes:
+    """Current listing path: LISTING_COLUMNS rows dumped through the response model"""
+    transactions = db.query(*LISTING_COLUMNS).filter(
+        Transaction.user_consumer_id == user_id
+    ).order_by(Transaction.date.desc(), Transaction.id.desc()).limit(rows).all()
+    return TransactionListResponse(
+        transactions=transactions, total=rows, total_estimated=False,
+        limit=rows, offset=0, next_cursor=None
+    ).model_dump_json().encode()
+
+
+def time_path(session_factory, run, user_id: int, rows: int, repeat: int):
+    """Latency percentiles in ms for query + serialization (fresh session per run)"""
+    latencies = []
+    body = b""
+    for attempt in range(repeat + 1):
+        db = session_factory()
+        try:
+            started = time.perf_counter()
+            body = run(db, user_id, rows)
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            db.close()
+        if attempt:  # First run is warm-up
+            latencies.append(elapsed)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "payload_bytes": len(body),
+        "ms_per_1000_rows": round(float(np.percentile(latencies, 50)) * 1000 / rows, 3),
+        "bytes_per_1000_rows": int(len(body) * 1000 / rows)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transaction list serialization")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000], help="Rows per page")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per path")
+    parser.add_argument("--database", help="Database URL (default: a temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="serialization_benchmark.json", help="Report path ('-' for stdout only)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    print("=" * 60)
+    print("LUMEN List Serialization Benchmark")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = args.database or f"sqlite:///{os.path.join(workdir, 'serialization.db')}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+
+        user_id = load_user(session_factory, max(args.rows))
+
+        results = []
+        for rows in sorted(args.rows):
+            timings = {
+                "full_orm_jsonable_encoder": time_path(session_factory, full_orm, user_id, rows, args.repeat),
+                "projected_pydantic": time_path(session_factory, projected, user_id, rows, args.repeat),
+            }
+            results.append({"rows": rows, **timings})
+            print(f"\n📊 {rows} rows")
+            for name, t in timings.items():
+                print(f"   ✓ {name}: {t['p50_ms']}ms, {t['payload_bytes']:,} bytes")
+
+        dialect = engine.dialect.name
+        engine.dispose()
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "database": dialect,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+
+    if args.output == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
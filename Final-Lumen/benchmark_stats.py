@@ -0,0 +1,194 @@
+"""
+Benchmark for /transactions/stats query strategies
+Loads one synthetic user per scale and times the former multi-query stats,
+the single-pass live query and the daily rollups, writing a JSON report
+"""
+import sys
+import os
+import argparse
+import json
+import random
+import platform
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import UserConsumer
+from app.models.source import Source, SourceType as SourceSourceType
+from app.models.transaction import Transaction, PaymentChannel, SourceType
+from app.models.rollup import rebuild_rollups
+from app.services.stats_service import stats_service
+from populate_demo_data import generate_transaction_amount, CONSUMER_CATEGORIES
+import logging
+
+logging.basicConfig(level=logging.WARNING)
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+HISTORY_DAYS = 365
+INSERT_CHUNK = 50_000
+
+
+def load_user(session_factory, n: int) -> int:
+    """Insert one consumer with n transactions spread over HISTORY_DAYS"""
+    db = session_factory()
+    try:
+        user = UserConsumer(
+            name=f"Stats Benchmark {n}",
+            email=f"stats.{n}.{int(time.time())}@lumen.app",
+            hashed_password="!"
+        )
+        db.add(user)
+        db.flush()
+        source = Source(user_consumer_id=user.id, source_type=SourceSourceType.MANUAL)
+        db.add(source)
+        db.commit()
+
+        now = datetime.utcnow()
+        channels = list(PaymentChannel)
+        merchants = [(category, merchant) for category, names in CONSUMER_CATEGORIES.items() for merchant in names]
+        offsets = np.random.uniform(0, HISTORY_DAYS * 86400, n)
+
+        for start in range(0, n, INSERT_CHUNK):
+            records = []
+            for seconds in offsets[start:start + INSERT_CHUNK]:
+                category, merchant = random.choice(merchants)
+                records.append({
+                    "user_consumer_id": user.id,
+                    "user_type": "CONSUMER",
+                    "source_id": source.id,
+                    "source_type": SourceType.MANUAL,
+                    "merchant_name_raw": merchant,
+                    "category": category,
+                    "amount": generate_transaction_amount(category),
+                    "date": now - timedelta(seconds=float(seconds)),
+                    "payment_channel": random.choice(channels),
+                    "flagged": random.random() < 0.03,
+                    "confirmed": random.choice([None, True, True, False])
+                })
+            db.execute(insert(Transaction), records)
+            db.commit()
+
+        # Bulk inserts bypass the flush hook, so build this user's rollups directly
+        rebuild_rollups(db.connection(), "consumer", user.id)
+        db.commit()
+        return user.id
+
+    finally:
+        db.close()
+
+
+def multi_query_stats(db, user_id: int, days: int):
+    """The former /transactions/stats implementation: one query per aggregate"""
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    base_query = db.query(Transaction).filter(
+        Transaction.user_consumer_id == user_id,
+        Transaction.date >= cutoff_date
+    )
+    base_query.count()
+    base_query.with_entities(func.sum(Transaction.amount)).scalar()
+    base_query.with_entities(
+        Transaction.category, func.count(Transaction.id), func.sum(Transaction.amount)
+    ).group_by(Transaction.category).all()
+    base_query.with_entities(
+        Transaction.merchant_name_raw, func.count(Transaction.id), func.sum(Transaction.amount)
+    ).group_by(Transaction.merchant_name_raw).order_by(func.sum(Transaction.amount).desc()).limit(10).all()
+    base_query.filter(Transaction.flagged == True).count()
+    base_query.filter(Transaction.confirmed == True).count()
+    base_query.with_entities(
+        Transaction.payment_channel, func.count(Transaction.id)
+    ).group_by(Transaction.payment_channel).all()
+
+
+def time_strategy(session_factory, run, repeat: int):
+    """Latency percentiles in ms (first run discarded as warm-up)"""
+    db = session_factory()
+    try:
+        run(db)
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(db)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return {
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "mean_ms": round(float(np.mean(latencies)), 3)
+        }
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /transactions/stats query strategies")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Transactions per user")
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365], help="Stats windows to time")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per strategy")
+    parser.add_argument("--database", help="Database URL (default: a temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="stats_benchmark.json", help="Report path ('-' for stdout only)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    print("=" * 60)
+    print("LUMEN Stats Query Benchmark")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = args.database or f"sqlite:///{os.path.join(workdir, 'stats.db')}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+
+        results = []
+        for n in sorted(args.scales):
+            print(f"\n📊 {n:,} transactions")
+            started = time.perf_counter()
+            user_id = load_user(session_factory, n)
+            load_seconds = time.perf_counter() - started
+
+            for days in args.days:
+                strategies = {
+                    "multi_query": lambda db: multi_query_stats(db, user_id, days),
+                    "live_single_pass": lambda db: stats_service.live(db, user_id, "consumer", days),
+                    "rollup": lambda db: stats_service.from_rollups(db, user_id, "consumer", days),
+                }
+                timings = {name: time_strategy(session_factory, run, args.repeat) for name, run in strategies.items()}
+                results.append({"transactions": n, "days": days, "load_seconds": round(load_seconds, 2), **timings})
+                print(f"   ✓ {days}d: " + ", ".join(f"{name} {t['p50_ms']}ms" for name, t in timings.items()))
+
+        dialect = engine.dialect.name
+        engine.dispose()
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "database": dialect,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+
+    if args.output == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -66,7 +66,7 @@ try:
     
     # Import app components after database creation
     from app.core.database import engine, audit_engine, Base, AuditBase
-    from app.models import user, transaction, merchant, source, pattern, chat, rag, audit
+    from app.models import user, transaction, merchant, source, pattern, rollup, chat, rag, audit
     
     # Create tables in main database
     print("   Creating tables in main database...")
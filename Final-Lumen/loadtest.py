@@ -0,0 +1,168 @@
+"""
+HTTP load test for the dashboard endpoints
+Drives a running LUMEN server with concurrent clients and reports
+throughput and latency per endpoint as JSON; --compare prints the change
+between two reports (e.g. before and after a change)
+
+Start the server with RESPONSE_CACHE_ENABLED=false to measure the database
+path rather than cache hits.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import platform
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+DEFAULT_ENDPOINTS = [
+    "/api/v1/transactions/stats?source=live",
+    "/api/v1/transactions/stats",
+    "/api/v1/transactions/?limit=50",
+    "/api/v1/anomalies/flagged",
+    "/api/v1/users/me",
+]
+
+
+async def get_token(client: httpx.AsyncClient, args) -> str:
+    """Log in, registering the load-test user first if needed"""
+    credentials = {"email": args.email, "password": args.password, "user_type": "consumer"}
+    response = await client.post("/api/v1/auth/login", json=credentials)
+    if response.status_code == 401:
+        await client.post("/api/v1/auth/register", json={**credentials, "name": "Load Test"})
+        response = await client.post("/api/v1/auth/login", json=credentials)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(client: httpx.AsyncClient, endpoints, deadline: float, offset: int, samples, errors):
+    i = offset
+    while time.monotonic() < deadline:
+        endpoint = endpoints[i % len(endpoints)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(endpoint)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        if ok:
+            samples[endpoint].append(elapsed)
+        else:
+            errors[endpoint] += 1
+
+
+def summarize(latencies, errors: int, seconds: float):
+    if not latencies:
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2)
+    }
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        token = await get_token(client, args)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        # Warm up caches, pools and lazy imports
+        for endpoint in args.endpoints:
+            (await client.get(endpoint)).raise_for_status()
+
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            worker(client, args.endpoints, deadline, i, samples, errors)
+            for i in range(args.concurrency)
+        ))
+        seconds = time.monotonic() - started
+
+    everything = [latency for endpoint in args.endpoints for latency in samples[endpoint]]
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "label": args.label,
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_seconds": round(seconds, 2),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "overall": summarize(everything, sum(errors.values()), seconds),
+        "endpoints": {endpoint: summarize(samples[endpoint], errors[endpoint], seconds) for endpoint in args.endpoints}
+    }
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{'endpoint':<45} {'rps before':>11} {'rps after':>10} {'change':>8} {'p95 before':>11} {'p95 after':>10}")
+    rows = [("overall", before["overall"], after["overall"])]
+    rows += [(endpoint, before["endpoints"][endpoint], after["endpoints"][endpoint])
+             for endpoint in after["endpoints"] if endpoint in before["endpoints"]]
+    for name, b, a in rows:
+        change = f"{(a['rps'] / b['rps'] - 1) * 100:+.0f}%" if b["rps"] else "n/a"
+        print(f"{name:<45} {b['rps']:>11} {a['rps']:>10} {change:>8} {b.get('p95_ms', '-'):>11} {a.get('p95_ms', '-'):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test LUMEN dashboard endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="loadtest@lumen.app")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to run")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--endpoints", nargs="+", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--label", default="", help="Name stored in the report (e.g. before/after)")
+    parser.add_argument("--output", default="loadtest.json", help="Report path ('-' for stdout only)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    print("=" * 60)
+    print(f"LUMEN Load Test - {args.concurrency} clients for {args.duration:.0f}s against {args.base_url}")
+    print("=" * 60)
+
+    try:
+        report = asyncio.run(run(args))
+    except httpx.HTTPError as e:
+        print(f"❌ Load test failed: {e}")
+        sys.exit(1)
+
+    overall = report["overall"]
+    print(f"\n📊 {overall['requests']} requests, {overall['errors']} errors, {overall['rps']} req/s")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"   ✓ {endpoint}: {stats['rps']} req/s, p95 {stats.get('p95_ms', '-')}ms")
+
+    if args.output == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
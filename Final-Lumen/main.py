@@ -3,19 +3,26 @@ LUMEN - AI-Powered Financial Transaction Management System
 Main FastAPI Application Entry Point
 """
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import hmac
 import logging
 from datetime import datetime
 from pathlib import Path
 
 from app.core.config import settings
-from app.core.database import engine, audit_engine, Base, AuditBase
+from app.core.database import engine, audit_engine, async_engine, pool_metrics, Base, AuditBase
 from app.api.v1.router import api_router
 from app.core.logging_config import setup_logging
+from app.services.model_scheduler import model_scheduler
+from app.services.anomaly_pipeline import anomaly_pipeline
+from app.services.audit_writer import audit_writer
+from app.services.audit_retention import audit_retention
+from app.services.anomaly_explainer import anomaly_explainer
+from app.services.user_cache import last_active_tracker
 
 # Setup logging
 setup_logging()
@@ -45,10 +52,29 @@ async def lifespan(app: FastAPI):
         logger.error(f"  - {settings.DATABASE_URL.split('@')[1] if '@' in settings.DATABASE_URL else 'lumen_db'}")
         logger.error(f"  - {settings.DATABASE_AUDIT_URL.split('@')[1] if '@' in settings.DATABASE_AUDIT_URL else 'lumen_audit_db'}")
     
+    # Background anomaly scoring for ingested transactions, plus any left unscored
+    anomaly_pipeline.start()
+    try:
+        anomaly_pipeline.rescore_unscored()
+    except Exception as e:
+        logger.error(f"Could not re-queue unscored transactions: {e}")
+    
+    # Batched audit log writes, into monthly partitions created ahead of time
+    # (checked now and every AUDIT_PARTITION_CHECK_INTERVAL_SECONDS)
+    audit_retention.start()
+    audit_writer.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down LUMEN application...")
+    anomaly_pipeline.stop()
+    audit_writer.stop()  # After the pipeline, which writes audit records
+    audit_retention.stop()
+    anomaly_explainer.shutdown()
+    last_active_tracker.stop()
+    model_scheduler.shutdown()
+    await async_engine.dispose()
 
 
 # Initialize FastAPI app
@@ -70,6 +96,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # Lets the dashboard revalidate cached responses
 )
 
 
@@ -99,6 +126,24 @@ async def health_check():
     }
 
 
+def require_metrics_access(request: Request):
+    """Metrics are internal: require METRICS_TOKEN, or a loopback client when no token is set"""
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get("authorization", "")
+        if hmac.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+            return
+    elif request.client and request.client.host in ("127.0.0.1", "::1", "localhost"):
+        return
+    raise HTTPException(status_code=403, detail="Metrics are internal")
+
+
+# Connection pool metrics (per worker process)
+@app.get("/metrics/pools", dependencies=[Depends(require_metrics_access)])
+async def database_pool_metrics():
+    """Connection pool occupancy and checkout wait times for this worker"""
+    return pool_metrics()
+
+
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
@@ -117,7 +162,8 @@ async def root():
         "version": "1.0.0",
         "docs": "/docs",
         "redoc": "/redoc",
-        "health": "/health"
+        "health": "/health",
+        "pool_metrics": "/metrics/pools"
     }
 
 
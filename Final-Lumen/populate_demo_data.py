@@ -7,20 +7,9 @@ import sys
 import random
 from datetime import datetime, timedelta
 
-print("=" * 60)
-print("LUMEN Enhanced Demo Data Generator")
-print("=" * 60)
-
-try:
-    from faker import Faker
-except ImportError:
-    print("\n❌ Faker not installed. Installing...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "faker"])
-    from faker import Faker
-
-# Initialize
-fake = Faker('en_IN')  # Indian locale
+# Faker is loaded in main() so the amount generators can be imported
+# without it (see benchmark_anomaly.py)
+fake = None
 
 # Import app components
 from app.core.database import SessionLocal
@@ -250,8 +239,27 @@ def create_transactions(db, user, user_type, categories, num_transactions):
     print(f"   ✅ Created {len(transactions)} transactions ({anomaly_count} anomalies)")
     return transactions
 
+def load_faker():
+    """Import Faker, installing it if needed"""
+    global fake
+    try:
+        from faker import Faker
+    except ImportError:
+        print("\n❌ Faker not installed. Installing...")
+        import subprocess
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "faker"])
+        from faker import Faker
+    
+    fake = Faker('en_IN')  # Indian locale
+
 def main():
     """Generate all demo data"""
+    print("=" * 60)
+    print("LUMEN Enhanced Demo Data Generator")
+    print("=" * 60)
+    
+    load_faker()
+    
     try:
         db = SessionLocal()
         
@@ -0,0 +1,95 @@
+"""
+Rebuild learned spending patterns from transaction history
+Run this to backfill patterns for transactions created before incremental
+pattern updates, or to repair patterns after bulk edits
+"""
+import sys
+import os
+import argparse
+import time
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal
+from app.models.user import UserConsumer, UserBusiness
+from app.services.pattern_engine import pattern_engine
+import logging
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def rebuild_user_patterns(user_model, user_type: str, user_id: int = None, category: str = None):
+    """Rebuild patterns for all users of one type (or a single user)"""
+    db = SessionLocal()
+    try:
+        query = db.query(user_model)
+        if user_id is not None:
+            query = query.filter(user_model.id == user_id)
+        users = query.all()
+        print(f"\n📊 Found {len(users)} {user_type} users")
+
+        total_patterns = 0
+
+        for user in users:
+            try:
+                count = pattern_engine.rebuild(db, user.id, user_type, category=category)
+                # Commit after each user
+                db.commit()
+                print(f"   ✓ {user.email} (ID: {user.id}): {count} patterns")
+                total_patterns += count
+
+            except Exception as e:
+                logger.error(f"   Failed to rebuild patterns for user {user.id}: {e}")
+                db.rollback()
+
+        return total_patterns
+
+    finally:
+        db.close()
+
+def main():
+    """Main rebuild function"""
+    parser = argparse.ArgumentParser(description="Rebuild learned spending patterns")
+    parser.add_argument("--user-type", choices=["consumer", "business"], help="Only rebuild this user type")
+    parser.add_argument("--user-id", type=int, help="Only rebuild this user (requires --user-type)")
+    parser.add_argument("--category", help="Only rebuild this category")
+    parser.add_argument("-y", "--yes", action="store_true", help="Do not ask for confirmation")
+    args = parser.parse_args()
+
+    if args.user_id is not None and not args.user_type:
+        parser.error("--user-id requires --user-type")
+
+    print("\n" + "=" * 60)
+    print("PATTERN REBUILD - Spending Pattern Backfill")
+    print("=" * 60)
+    print(f"\nWindow: last {pattern_engine.window_days} days")
+
+    if not args.yes:
+        response = input("\nContinue? (yes/no): ").strip().lower()
+        if response not in ['yes', 'y']:
+            print("Cancelled.")
+            return
+
+    start = time.time()
+    consumer_count = 0
+    business_count = 0
+
+    if args.user_type in (None, "consumer"):
+        consumer_count = rebuild_user_patterns(UserConsumer, "consumer", args.user_id, args.category)
+
+    if args.user_type in (None, "business"):
+        business_count = rebuild_user_patterns(UserBusiness, "business", args.user_id, args.category)
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("REBUILD COMPLETE")
+    print("=" * 60)
+    print(f"Consumer patterns rebuilt: {consumer_count}")
+    print(f"Business patterns rebuilt: {business_count}")
+    print(f"Elapsed: {time.time() - start:.1f}s")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Rebuild daily transaction rollups used by /transactions/stats
+Run this after bulk imports or raw SQL edits that bypass the ORM, which
+keeps the rollups up to date on every flush
+"""
+import sys
+import os
+import argparse
+import time
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal
+from app.models.rollup import TransactionRollup, rebuild_rollups
+
+def main():
+    """Main rebuild function"""
+    parser = argparse.ArgumentParser(description="Rebuild daily transaction rollups")
+    parser.add_argument("--user-type", choices=["consumer", "business"], help="Only rebuild this user type")
+    parser.add_argument("--user-id", type=int, help="Only rebuild this user (requires --user-type)")
+    parser.add_argument("-y", "--yes", action="store_true", help="Do not ask for confirmation")
+    args = parser.parse_args()
+
+    if args.user_id is not None and not args.user_type:
+        parser.error("--user-id requires --user-type")
+
+    print("\n" + "=" * 60)
+    print("ROLLUP REBUILD - Daily Transaction Aggregates")
+    print("=" * 60)
+
+    if not args.yes:
+        response = input("\nContinue? (yes/no): ").strip().lower()
+        if response not in ['yes', 'y']:
+            print("Cancelled.")
+            return
+
+    start = time.time()
+    db = SessionLocal()
+    try:
+        # Delete and re-insert in one transaction so stats never see a partial state
+        rebuild_rollups(db.connection(), args.user_type, args.user_id)
+        db.commit()
+        rows = db.query(TransactionRollup).count()
+    except Exception as e:
+        db.rollback()
+        print(f"\n❌ Rebuild failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("REBUILD COMPLETE")
+    print("=" * 60)
+    print(f"Rollup rows: {rows}")
+    print(f"Elapsed: {time.time() - start:.1f}s")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Test the local intent classifier (conversational fast path)
+Runs offline: no server, database or Gemini key needed
+"""
+import sys
+import os
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.intent_classifier import intent_classifier
+
+# (query, expected kind, expected name, expected fast_path)
+CASES = [
+    ("hi", "greeting", None, True),
+    ("Hello there!", "greeting", None, True),
+    ("thanks a lot", "thanks", None, True),
+    ("bye", "goodbye", None, True),
+    ("my name is Asha", "introduction", "Asha", True),
+    ("call me ravi", "introduction", "Ravi", True),
+    ("I'm fine", "smalltalk", None, True),
+    ("i am doing good", "smalltalk", None, True),
+    # States are not names, and are not answered locally
+    ("i am hungry", None, None, False),
+    ("i'm broke", None, None, False),
+    ("im confused", None, None, False),
+    # A greeting followed by a real question goes to RAG/Gemini
+    ("hi there! how much did I spend last month?", "greeting", None, False),
+    ("how much did i spend on food", None, None, False),
+    ("did i pay the electricity bill", None, None, False),
+]
+
+
+def print_section(title):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+def test_classification():
+    """Kinds, captured names and fast-path decisions"""
+    print_section("Testing Classification")
+    failures = 0
+    for query, kind, name, fast_path in CASES:
+        result = intent_classifier.classify(query)
+        ok = result["kind"] == kind and result["name"] == name and result["fast_path"] == fast_path
+        if not ok:
+            failures += 1
+        print(f"{'✓' if ok else '✗'} {query!r}: kind={result['kind']} name={result['name']} "
+              f"fast_path={result['fast_path']} intent={result['intent']}")
+    return failures == 0
+
+
+def test_transaction_terms_never_fast_path():
+    """Anything mentioning money or transactions is escalated"""
+    print_section("Testing Transaction Terms")
+    queries = ["thanks, show me my payments", "hello what is my total", "bye, how many transactions today"]
+    ok = True
+    for query in queries:
+        result = intent_classifier.classify(query)
+        passed = result["has_transaction_terms"] and not result["fast_path"]
+        ok = ok and passed
+        print(f"{'✓' if passed else '✗'} {query!r}: intent={result['intent']}")
+    return ok
+
+
+def test_introduction_memory():
+    """Only an explicit introduction stores a name in session facts"""
+    print_section("Testing Introduction Memory")
+    intro = intent_classifier.respond(intent_classifier.classify("my name is Asha"))
+    smalltalk = intent_classifier.respond(intent_classifier.classify("I'm fine"))
+    greeting = intent_classifier.respond(intent_classifier.classify("hello"), {"user_name": "Asha"})
+    print(f"Introduction: {intro['response']}")
+    print(f"Greeting: {greeting['response']}")
+
+    ok = (
+        intro.get("memory_updates") == {"user_name": "Asha"}
+        and "memory_updates" not in smalltalk
+        and "Asha" in greeting["response"]
+    )
+    print("✓ PASSED" if ok else "✗ FAILED")
+    return ok
+
+
+def main():
+    """Run all tests"""
+    results = {
+        "Classification": test_classification(),
+        "Transaction Terms": test_transaction_terms_never_fast_path(),
+        "Introduction Memory": test_introduction_memory()
+    }
+
+    print_section("TEST SUMMARY")
+    for test_name, result in results.items():
+        status = "✓ PASSED" if result else "✗ FAILED"
+        print(f"{test_name}: {status}")
+
+    total_passed = sum(results.values())
+    print(f"\nTotal: {total_passed}/{len(results)} tests passed")
+    return total_passed == len(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,140 @@
+"""
+Test keyset pagination of transaction listings
+Runs offline against an in-memory SQLite database (settings still come from .env)
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.transaction import Transaction, PaymentChannel, SourceType, UserType
+from app.models.rollup import TransactionRollup
+from app.utils.pagination import encode_cursor, decode_cursor, paginate, LISTING_COLUMNS
+
+BASE_DATE = datetime(2024, 5, 1, 9, 30, 15, 123456)
+
+
+def print_section(title):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+def _session():
+    """In-memory database with 23 transactions for user 1 (many sharing a date) and 3 for user 2"""
+    engine = create_engine("sqlite://")
+    # Committing transactions also maintains the daily rollups
+    Transaction.__table__.create(engine)
+    TransactionRollup.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    for i in range(26):
+        db.add(Transaction(
+            user_consumer_id=1 if i < 23 else 2, user_type=UserType.CONSUMER, source_id=1,
+            merchant_name_raw=f"Merchant {i}", amount=10.0 + i,
+            date=BASE_DATE - timedelta(days=i // 4),  # Four rows per date: ties on date
+            payment_channel=PaymentChannel.UPI, source_type=SourceType.MANUAL
+        ))
+    db.commit()
+    return db
+
+
+def test_cursor_round_trip():
+    """Cursors are opaque, unpadded and keep microseconds"""
+    print_section("Testing Cursor Encoding")
+    transaction = Transaction(id=4242, date=BASE_DATE)
+    cursor = encode_cursor(transaction)
+    print(f"Cursor: {cursor}")
+
+    ok = decode_cursor(cursor) == (BASE_DATE, 4242) and "=" not in cursor
+    for malformed in ("", "not-a-cursor", encode_cursor(transaction)[:-4], "eyJkIjogMX0"):
+        try:
+            decode_cursor(malformed)
+            print(f"✗ Accepted malformed cursor {malformed!r}")
+            ok = False
+        except ValueError:
+            pass
+    print("✓ PASSED" if ok else "✗ FAILED")
+    return ok
+
+
+def _walk(db, limit: int, columns: bool):
+    query = db.query(*LISTING_COLUMNS) if columns else db.query(Transaction)
+    query = query.filter(Transaction.user_consumer_id == 1)
+    seen, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = paginate(query, limit, cursor=cursor)
+        seen.extend((row.date, row.id) for row in rows)
+        pages += 1
+        if cursor is None or pages > 50:
+            return seen, pages
+
+
+def test_pages_with_ties():
+    """Walking all pages returns every row once, newest first, across tied dates"""
+    print_section("Testing Page Walks")
+    db = _session()
+    try:
+        expected = sorted(
+            ((tx.date, tx.id) for tx in db.query(Transaction).filter(Transaction.user_consumer_id == 1)),
+            reverse=True
+        )
+        ok = True
+        for limit in (1, 3, 4, 5, 22, 23, 50):
+            for columns in (False, True):
+                seen, pages = _walk(db, limit, columns)
+                passed = seen == expected and pages == max(1, -(-len(expected) // limit))
+                ok = ok and passed
+                print(f"{'✓' if passed else '✗'} limit={limit} columns={columns}: {len(seen)} rows in {pages} page(s)")
+        return ok
+    finally:
+        db.close()
+
+
+def test_offset_fallback():
+    """Without a cursor, offset still works and hands out a cursor for the next page"""
+    print_section("Testing Offset Fallback")
+    db = _session()
+    try:
+        query = db.query(Transaction).filter(Transaction.user_consumer_id == 1)
+        first, cursor = paginate(query, 5)
+        by_offset, _ = paginate(query, 5, offset=5)
+        by_cursor, _ = paginate(query, 5, cursor=cursor)
+        last, last_cursor = paginate(query, 5, offset=20)
+
+        ok = (
+            [tx.id for tx in by_offset] == [tx.id for tx in by_cursor]
+            and len(last) == 3
+            and last_cursor is None
+        )
+        print("✓ PASSED" if ok else "✗ FAILED")
+        return ok
+    finally:
+        db.close()
+
+
+def main():
+    """Run all tests"""
+    results = {
+        "Cursor Encoding": test_cursor_round_trip(),
+        "Page Walks": test_pages_with_ties(),
+        "Offset Fallback": test_offset_fallback()
+    }
+
+    print_section("TEST SUMMARY")
+    for test_name, result in results.items():
+        status = "✓ PASSED" if result else "✗ FAILED"
+        print(f"{test_name}: {status}")
+
+    total_passed = sum(results.values())
+    print(f"\nTotal: {total_passed}/{len(results)} tests passed")
+    return total_passed == len(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
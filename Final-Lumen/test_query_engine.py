@@ -0,0 +1,134 @@
+"""
+Test the structured query engine used for aggregate chat questions
+Runs offline against an in-memory SQLite database (settings still come from .env)
+"""
+import sys
+import os
+from datetime import datetime
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.transaction import Transaction, PaymentChannel, SourceType, UserType
+from app.models.rollup import TransactionRollup
+from app.services.query_engine import query_engine
+
+NOW = datetime(2024, 5, 15, 10, 30)
+CATEGORIES = ["Food & Dining", "Groceries", "Transport", "Shopping"]
+
+# (question, expected (metric, category, merchant, period, start, end) or None for open-ended)
+PARSE_CASES = [
+    ("how much did I spend on food this month",
+     ("sum", "Food & Dining", None, "this month", datetime(2024, 5, 1), None)),
+    ("how many transactions last month",
+     ("count", None, None, "last month", datetime(2024, 4, 1), datetime(2024, 5, 1))),
+    ("total spent at swiggy in march",
+     ("sum", None, "swiggy", "March 2024", datetime(2024, 3, 1), datetime(2024, 4, 1))),
+    ("largest purchase from amazon in the last 30 days",
+     ("max", None, "amazon", "last 30 days", datetime(2024, 4, 15, 10, 30), None)),
+    ("average grocery bill",
+     ("avg", "Groceries", None, "all time", None, None)),
+    ("what is the total of my transport expenses yesterday",
+     ("sum", "Transport", None, "yesterday", datetime(2024, 5, 14), datetime(2024, 5, 15))),
+    # A month after the current one means last year
+    ("how much did i spend in december",
+     ("sum", None, None, "December 2023", datetime(2023, 12, 1), datetime(2024, 1, 1))),
+    # Month names are a period, not a merchant
+    ("total spent from january to march",
+     ("sum", None, None, "January to March 2024", datetime(2024, 1, 1), datetime(2024, 4, 1))),
+    # Aggregate words without a spending subject stay open-ended
+    ("how much is 2+2", None),
+    ("how many days until my birthday", None),
+    ("show me my last payment", None),
+]
+
+
+def print_section(title):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+def test_parse():
+    """Metric, filters and time range of each question"""
+    print_section("Testing Query Parsing")
+    failures = 0
+    for question, expected in PARSE_CASES:
+        plan = query_engine.parse(question, CATEGORIES, now=NOW)
+        actual = plan and (plan["metric"], plan["category"], plan["merchant"], plan["period"], plan["start"], plan["end"])
+        ok = actual == expected
+        if not ok:
+            failures += 1
+            print(f"✗ {question!r}: expected {expected}, got {actual}")
+        else:
+            print(f"✓ {question!r}")
+    return failures == 0
+
+
+def test_plan_key():
+    """Questions that embed alike but compute different aggregates get different keys"""
+    print_section("Testing Plan Keys")
+    this_month = query_engine.plan_key(query_engine.parse("how much did I spend this month", CATEGORIES, now=NOW))
+    last_month = query_engine.plan_key(query_engine.parse("how much did I spend last month", CATEGORIES, now=NOW))
+    again = query_engine.plan_key(query_engine.parse("total spending this month", CATEGORIES, now=NOW))
+    print(f"this month: {this_month}")
+    print(f"last month: {last_month}")
+
+    ok = this_month != last_month and this_month == again
+    print("✓ PASSED" if ok else "✗ FAILED")
+    return ok
+
+
+def test_merchant_like_escaping():
+    """% and _ in a merchant name match literally"""
+    print_section("Testing Merchant Filter Escaping")
+    engine = create_engine("sqlite://")
+    # Committing transactions also maintains the daily rollups
+    Transaction.__table__.create(engine)
+    TransactionRollup.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        for merchant, amount in (("100%_store", 100.0), ("100ab_store", 200.0), ("100%xstore", 400.0)):
+            db.add(Transaction(
+                user_consumer_id=1, user_type=UserType.CONSUMER, source_id=1,
+                merchant_name_raw=merchant, amount=amount, date=NOW,
+                payment_channel=PaymentChannel.UPI, source_type=SourceType.MANUAL
+            ))
+        db.commit()
+
+        plan = {"metric": "sum", "start": None, "end": None, "period": "all time",
+                "category": None, "merchant": "100%_store"}
+        result = query_engine.execute(plan, db, 1, "consumer")
+        print(f"Matched {result['transaction_count']} transaction(s), total ₹{result['total_amount']}")
+
+        ok = result["transaction_count"] == 1 and result["total_amount"] == 100.0
+        print("✓ PASSED" if ok else "✗ FAILED")
+        return ok
+    finally:
+        db.close()
+
+
+def main():
+    """Run all tests"""
+    results = {
+        "Query Parsing": test_parse(),
+        "Plan Keys": test_plan_key(),
+        "Merchant Escaping": test_merchant_like_escaping()
+    }
+
+    print_section("TEST SUMMARY")
+    for test_name, result in results.items():
+        status = "✓ PASSED" if result else "✗ FAILED"
+        print(f"{test_name}: {status}")
+
+    total_passed = sum(results.values())
+    print(f"\nTotal: {total_passed}/{len(results)} tests passed")
+    return total_passed == len(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,152 @@
+"""
+Test the sliding velocity windows against a brute-force reference
+Runs offline: no server or database needed (settings still come from .env)
+"""
+import sys
+import os
+import bisect
+import random
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.services.velocity_detector import SlidingWindows, WINDOWS
+
+HOUR = 3600
+
+
+def print_section(title):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+class Reference:
+    """The last `capacity` entries in time order, windows recomputed from scratch"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries = []
+
+    def add(self, timestamp: float, amount: float):
+        # Ties go after existing entries, like the ring buffer
+        position = bisect.bisect_right([t for t, _ in self.entries], timestamp)
+        self.entries.insert(position, (timestamp, amount))
+        del self.entries[:-self.capacity]
+
+    def snapshot_at(self, timestamp: float):
+        snapshot = {}
+        for label, seconds in WINDOWS.items():
+            window = [a for t, a in self.entries if timestamp - seconds < t <= timestamp]
+            snapshot[label] = {
+                "count": len(window),
+                "sum": round(sum(window), 2),
+                "small_count": sum(1 for a in window if a < settings.VELOCITY_SMALL_AMOUNT)
+            }
+        return snapshot
+
+    def snapshot(self):
+        return self.snapshot_at(self.entries[-1][0])
+
+
+def _same(actual, expected) -> bool:
+    return all(
+        actual[label]["count"] == expected[label]["count"]
+        and actual[label]["small_count"] == expected[label]["small_count"]
+        and abs(actual[label]["sum"] - expected[label]["sum"]) < 0.02
+        for label in WINDOWS
+    )
+
+
+def _random_amount(rng: random.Random) -> float:
+    small = rng.random() < 0.3
+    return round(rng.uniform(1, settings.VELOCITY_SMALL_AMOUNT) if small else rng.uniform(100, 5000), 2)
+
+
+def test_in_order_wraparound():
+    """In-order pushes through many ring-buffer wraparounds"""
+    print_section("Testing In-Order Pushes With Wraparound")
+    rng = random.Random(7)
+    windows, reference = SlidingWindows(capacity=16), Reference(capacity=16)
+    timestamp = 1_700_000_000.0
+    for step in range(500):
+        timestamp += rng.choice([0, 60, 600, 2 * HOUR, 20 * HOUR])  # Includes equal timestamps
+        amount = _random_amount(rng)
+        windows.push(timestamp, amount)
+        reference.add(timestamp, amount)
+        if not _same(windows.snapshot(), reference.snapshot()):
+            print(f"✗ Mismatch after push {step}: {windows.snapshot()} != {reference.snapshot()}")
+            return False
+    print("✓ 500 pushes match the reference")
+    return True
+
+
+def test_late_arrivals():
+    """Out-of-order inserts keep the windows and snapshot_at correct"""
+    print_section("Testing Late Arrivals")
+    rng = random.Random(11)
+    windows, reference = SlidingWindows(capacity=32), Reference(capacity=32)
+    newest = 1_700_000_000.0
+    for step in range(400):
+        if windows.last_timestamp() is not None and rng.random() < 0.4:
+            timestamp = newest - rng.uniform(0, 3 * 86400)  # A late arrival
+        else:
+            newest += rng.choice([0, 300, HOUR, 6 * HOUR])
+            timestamp = newest
+        amount = _random_amount(rng)
+
+        last = windows.last_timestamp()
+        if last is None or timestamp >= last:
+            windows.push(timestamp, amount)
+        else:
+            windows.insert(timestamp, amount)
+        reference.add(timestamp, amount)
+
+        if not _same(windows.snapshot(), reference.snapshot()):
+            print(f"✗ Windows mismatch after step {step}")
+            return False
+        if not _same(windows.snapshot_at(timestamp), reference.snapshot_at(timestamp)):
+            print(f"✗ snapshot_at mismatch after step {step}")
+            return False
+    print("✓ 400 mixed pushes and inserts match the reference")
+    return True
+
+
+def test_insert_older_than_full_buffer():
+    """A late arrival older than everything in a full buffer is dropped"""
+    print_section("Testing Insert Into A Full Buffer")
+    windows = SlidingWindows(capacity=4)
+    for i in range(4):
+        windows.push(1000.0 + i, 10.0)
+    windows.insert(500.0, 99.0)
+    windows.insert(1001.5, 20.0)  # Evicts 1000.0
+
+    snapshot = windows.snapshot()["1h"]
+    print(f"1h window: {snapshot}")
+    ok = snapshot["count"] == 4 and snapshot["sum"] == 50.0 and windows.last_timestamp() == 1003.0
+    print("✓ PASSED" if ok else "✗ FAILED")
+    return ok
+
+
+def main():
+    """Run all tests"""
+    results = {
+        "In-Order Wraparound": test_in_order_wraparound(),
+        "Late Arrivals": test_late_arrivals(),
+        "Full Buffer Insert": test_insert_older_than_full_buffer()
+    }
+
+    print_section("TEST SUMMARY")
+    for test_name, result in results.items():
+        status = "✓ PASSED" if result else "✗ FAILED"
+        print(f"{test_name}: {status}")
+
+    total_passed = sum(results.values())
+    print(f"\nTotal: {total_passed}/{len(results)} tests passed")
+    return total_passed == len(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,91 @@
+"""
+Verify the audit log hash chain
+Checks records added since the last signed checkpoint (or all records with
+--full) in parallel worker processes and writes new checkpoints
+
+Records written before hashed timestamps were stored always report
+hash_mismatch; accept them once with --anchor-legacy <last such record id>
+--approved-by <operator>, and checkpoints are written from there on
+"""
+import sys
+import os
+import argparse
+import json
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.audit_verifier import MAX_ERRORS, AuditChainVerifier
+
+def main():
+    """Main verification function"""
+    parser = argparse.ArgumentParser(description="Verify the audit log hash chain")
+    parser.add_argument("--full", action="store_true", help="Verify from the first record, ignoring checkpoints")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: AUDIT_VERIFY_WORKERS or CPU count)")
+    parser.add_argument("--no-checkpoints", action="store_true", help="Do not write checkpoints")
+    parser.add_argument("--database", help="Audit database URL (default: DATABASE_AUDIT_URL)")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    parser.add_argument("--anchor-legacy", type=int, metavar="RECORD_ID",
+                        help="Accept the records up to RECORD_ID as they are with a signed legacy anchor (once)")
+    parser.add_argument("--approved-by", help="Operator approving --anchor-legacy")
+    parser.add_argument("-y", "--yes", action="store_true", help="Do not ask for confirmation")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("AUDIT CHAIN VERIFICATION")
+    print("=" * 60)
+
+    verifier = AuditChainVerifier(args.database)
+
+    if args.anchor_legacy is not None:
+        if not args.approved_by:
+            parser.error("--anchor-legacy requires --approved-by")
+        print(f"\nRecords up to {args.anchor_legacy} will be accepted without hash checks, approved by {args.approved_by}.")
+        if not args.yes:
+            response = input("Continue? (yes/no): ").strip().lower()
+            if response not in ['yes', 'y']:
+                print("Cancelled.")
+                return
+        try:
+            anchor = verifier.anchor_legacy(args.anchor_legacy, args.approved_by)
+        except (ValueError, RuntimeError) as e:
+            print(f"\n❌ Legacy anchor not written: {e}")
+            sys.exit(2)
+        print(f"\n✅ Legacy anchor at record {anchor['record_id']} ({anchor['record_count']} records in chain)")
+    try:
+        report = verifier.verify(full=args.full, workers=args.workers, write_checkpoints=not args.no_checkpoints)
+    except Exception as e:
+        print(f"\n❌ Verification failed: {e}")
+        sys.exit(2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("CHAIN VALID" if report["valid"] else "CHAIN BROKEN")
+    print("=" * 60)
+    if report["from_legacy_anchor"]:
+        start = f"legacy anchor at record {report['from_checkpoint']}"
+    elif report["from_checkpoint"]:
+        start = f"checkpoint at record {report['from_checkpoint']}"
+    else:
+        start = "first record"
+    print(f"Verified from: {start}")
+    print(f"Records verified: {report['records_verified']} ({report['records_total']} in chain)")
+    print(f"Segments: {report['segments']} on {report['workers']} workers")
+    print(f"Checkpoints written: {report['checkpoints_written']}")
+    print(f"Elapsed: {report['seconds']:.1f}s")
+    for error in report["errors"][:20]:
+        print(f"   ❌ record {error['record_id']}: {error['error']}")
+    only_mismatches = all(error["error"] == "hash_mismatch" for error in report["errors"])
+    if report["errors"] and only_mismatches and len(report["errors"]) < MAX_ERRORS:
+        last = max(error["record_id"] for error in report["errors"])
+        print(f"Only hash mismatches: if these are legacy records, accept them with "
+              f"--anchor-legacy {last} --approved-by <operator>")
+    print("=" * 60)
+
+    sys.exit(0 if report["valid"] else 1)
+
+if __name__ == "__main__":
+    main()